@@ -0,0 +1,51 @@
+"""
+Cold-start time of the Flask app: importing terpsearch.website and running create_app() in a fresh interpreter.
+
+Every run is a new subprocess, so nothing (imports, boto3 handles, the in-process schema cache) carries over. Runs are
+repeated with schema verification (one cached describe_table per table) and in trusted-schema mode (no verification).
+Set SCHEMA_CACHE_REDIS_URL to see the effect of the shared Redis schema cache on every run after the first.
+
+Requires DynamoDB (DB_MODE / DYNAMODB_URL) and Redis (REDIS_URL) to be reachable, like the app itself.
+
+Usage:
+    python -m benchmarks.app_cold_start --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from benchmarks.bench_utils import summarize
+
+CHILD_SCRIPT = '''
+import json, time
+start_time = time.perf_counter()
+import terpsearch.website
+import_seconds = time.perf_counter() - start_time
+app = terpsearch.website.create_app()
+print(json.dumps(dict(app.config['STARTUP_TIMINGS'], imports=import_seconds,
+                      total=time.perf_counter() - start_time)))
+'''
+
+
+def run_once(trusted: bool):
+    env = dict(os.environ, TRUSTED_SCHEMA='true' if trusted else 'false')
+    output = subprocess.run([sys.executable, '-c', CHILD_SCRIPT], env=env, check=True, capture_output=True,
+                            text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for trusted in (False, True):
+        label = 'trusted schema' if trusted else 'verified schema'
+        runs = [run_once(trusted) for _ in range(args.runs)]
+        for step in ('imports', 'schema_bootstrap', 'create_app', 'total'):
+            summarize(f'{label}: {step}', [run[step] for run in runs])
+
+
+if __name__ == '__main__':
+    main()
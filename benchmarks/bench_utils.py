@@ -0,0 +1,68 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+SAMPLE_TEXTS = [
+    "The Lakers pulled off a huge comeback in the playoffs last night",
+    "Senate votes on the new climate bill next week",
+    "Just shipped a new version of our AI startup's app",
+    "Anyone else watching the new Netflix series? The trailer was great",
+    "Bitcoin is up again, my portfolio finally looks healthy",
+    "Booked a flight to Lisbon for vacation, any travel tips?",
+    "This meme is too relatable lol",
+    "Finals week at the university is brutal, so much homework",
+    "Wildfire season is getting worse every year because of global warming",
+    "Streetwear fit check before the runway show",
+    "Went to the doctor today, mental health matters",
+    "good morning everyone",
+]
+
+
+def make_posts(n: int, seed: int = 7, unique: bool = True):
+    """
+    Builds n synthetic Bluesky posts shaped like the output of TerpSearch.get_timeline_posts().
+
+    Args:
+        n (int): Number of posts to generate.
+        seed (int): Random seed so runs are comparable.
+        unique (bool): Whether to append a counter to every text so that no two posts are identical.
+
+    Returns:
+        List[Dict]: Synthetic posts.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    posts = []
+    for i in range(n):
+        text = rng.choice(SAMPLE_TEXTS)
+        if unique:
+            text = f'{text} #{i}'
+        timestamp = start + timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        posts.append({
+            'author': f'Author {i % 50}',
+            'handle': f'author{i % 50}.bsky.social',
+            'text': text,
+            'action': 'New Post',
+            'timestamp': timestamp.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        })
+    return posts
+
+
+def timed(fn, *args, **kwargs):
+    """
+    Runs fn and returns a (result, elapsed_seconds) tuple.
+    """
+    start_time = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start_time
+
+
+def summarize(label: str, samples):
+    """
+    Prints the mean / p50 / max of a list of latency samples in milliseconds.
+    """
+    ordered = sorted(samples)
+    mean = sum(ordered) / len(ordered)
+    p50 = ordered[len(ordered) // 2]
+    print(f'{label:<32} n={len(ordered):<4} mean={mean * 1000:9.1f}ms  p50={p50 * 1000:9.1f}ms  '
+          f'max={ordered[-1] * 1000:9.1f}ms')
@@ -0,0 +1,128 @@
+"""
+Bulk post writes against DynamoDB Local: boto3's single-threaded batch_writer (what TerpSearchDb.batch_write_items
+used before) versus terpsearch.dynamodb.BulkWriter at several concurrency levels.
+
+--unprocessed-rate makes every BatchWriteItem response hand back that fraction of its puts as UnprocessedItems, the
+way a throttled table does, to exercise the backoff / retry path and the adaptive concurrency. After every run the
+table is counted to check that every acknowledged write is really there.
+
+Requires DynamoDB Local (DB_MODE=DEV, DYNAMODB_URL, e.g. `docker run -p 8000:8000 amazon/dynamodb-local`). A scratch
+table is created and deleted.
+
+Usage:
+    python -m benchmarks.bulk_write --posts 5000 --workers 1 4 8 16 --unprocessed-rate 0.2
+"""
+import argparse
+import random
+from benchmarks.bench_utils import make_posts, timed, summarize
+from terpsearch.dynamodb.BulkWriter import BulkWriter
+from terpsearch.dynamodb.dynamodb_helpers import get_dynamodb_resource, stable_hash
+
+BENCH_TABLE_NAME = 'BENCH_BULK_WRITE'
+KEY_ATTRIBUTES = ['bskyUsername', 'bskyPostHash']
+
+
+class UnprocessedResource:
+    """
+    Wraps a DynamoDB resource so every batch_write_item call only writes part of its puts and returns the rest as
+    UnprocessedItems.
+    """
+
+    def __init__(self, dynamodb_resource, rate: float, seed: int = 5):
+        self.dynamodb_resource = dynamodb_resource
+        self.rate = rate
+        self.rng = random.Random(seed)
+
+    def batch_write_item(self, RequestItems):
+        processed, unprocessed = {}, {}
+        for table_name, write_requests in RequestItems.items():
+            for write_request in write_requests:
+                target = unprocessed if self.rng.random() < self.rate else processed
+                target.setdefault(table_name, []).append(write_request)
+        if processed:
+            self.dynamodb_resource.batch_write_item(RequestItems=processed)
+        return {'UnprocessedItems': unprocessed}
+
+
+def create_table(dynamodb_resource):
+    table = dynamodb_resource.create_table(
+        TableName=BENCH_TABLE_NAME,
+        KeySchema=[{'AttributeName': 'bskyUsername', 'KeyType': 'HASH'},
+                   {'AttributeName': 'bskyPostHash', 'KeyType': 'RANGE'}],
+        AttributeDefinitions=[{'AttributeName': 'bskyUsername', 'AttributeType': 'S'},
+                              {'AttributeName': 'bskyPostHash', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.wait_until_exists()
+    return table
+
+
+def count_items(table, bsky_username: str):
+    from boto3.dynamodb.conditions import Key
+    query_kwargs = {'KeyConditionExpression': Key('bskyUsername').eq(bsky_username), 'Select': 'COUNT'}
+    count = 0
+    while True:
+        response = table.query(**query_kwargs)
+        count += response['Count']
+        if 'LastEvaluatedKey' not in response:
+            return count
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def batch_writer_write(table, db_items):
+    with table.batch_writer(overwrite_by_pkeys=KEY_ATTRIBUTES) as batch:
+        for db_item in db_items:
+            batch.put_item(Item=db_item)
+    return len(db_items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--unprocessed-rate', type=float, default=0.0)
+    parser.add_argument('--db-mode', default='DEV')
+    args = parser.parse_args()
+
+    dynamodb_resource = get_dynamodb_resource(db_mode=args.db_mode)
+    table = create_table(dynamodb_resource)
+    posts = make_posts(args.posts)
+    try:
+        run = 0
+        samples = []
+        for _ in range(args.repeat):
+            run += 1
+            user = f'bench-{run}'
+            db_items = [dict(post, bskyUsername=user, bskyPostHash=stable_hash(input=post['text'])) for post in posts]
+            samples.append(timed(batch_writer_write, table, db_items)[1])
+            assert count_items(table, user) == len(db_items)
+        summarize('batch_writer (1 thread)', samples)
+
+        for workers in args.workers:
+            samples = []
+            for _ in range(args.repeat):
+                run += 1
+                user = f'bench-{run}'
+                db_items = [dict(post, bskyUsername=user, bskyPostHash=stable_hash(input=post['text']))
+                            for post in posts]
+                resource = dynamodb_resource
+                if args.unprocessed_rate > 0:
+                    resource = UnprocessedResource(dynamodb_resource, rate=args.unprocessed_rate)
+                writer = BulkWriter(dynamodb_resource=resource, table_name=BENCH_TABLE_NAME,
+                                    key_attributes=KEY_ATTRIBUTES, max_workers=workers, base_delay=0.005,
+                                    max_delay=0.5)
+                result, seconds = timed(writer.write, db_items)
+                samples.append(seconds)
+                stored = count_items(table, user)
+                assert stored == result['acknowledged'], (stored, result['acknowledged'])
+            summarize(f'BulkWriter ({workers} workers)', samples)
+            print(f'{"":<32} acknowledged={result["acknowledged"]} failed={len(result["failed_items"])} '
+                  f'requests={result["requests"]} retries={result["retries"]} '
+                  f'lowest_concurrency={result["lowest_concurrency"]}')
+    finally:
+        table.delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Per-task latency of categorize_texts_task's classification step, before and after the worker-level ModelManager.
+
+before: every task constructs a fresh Categorizer() (model load + category embeddings) and then classifies.
+after:  the Categorizer is warmed once per process and every task reuses it.
+
+Usage:
+    python -m benchmarks.categorizer_warm_start --tasks 5 --posts 200
+"""
+import argparse
+from benchmarks.bench_utils import make_posts, timed, summarize
+from fastapi_categorizer.categorizer import Categorizer
+from fastapi_categorizer.model_manager import ModelManager
+
+
+def run_cold(tasks: int, posts_per_task: int):
+    samples = []
+    for i in range(tasks):
+        posts = make_posts(posts_per_task, seed=i)
+        _, elapsed = timed(lambda: Categorizer().batch_categorize(posts))
+        samples.append(elapsed)
+    return samples
+
+
+def run_warm(tasks: int, posts_per_task: int):
+    manager = ModelManager()
+    _, boot_seconds = timed(manager.warm_up)
+    print(f'Worker boot warm-up took {boot_seconds:.2f}s (paid once per process)')
+    samples = []
+    for i in range(tasks):
+        posts = make_posts(posts_per_task, seed=i)
+        _, elapsed = timed(lambda: manager.get_categorizer().batch_categorize(posts))
+        samples.append(elapsed)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=5)
+    parser.add_argument('--posts', type=int, default=200)
+    args = parser.parse_args()
+
+    cold = run_cold(args.tasks, args.posts)
+    warm = run_warm(args.tasks, args.posts)
+    summarize('before (Categorizer per task)', cold)
+    summarize('after (warm ModelManager)', warm)
+
+
+if __name__ == '__main__':
+    main()
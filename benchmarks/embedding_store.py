@@ -0,0 +1,79 @@
+"""
+EmbeddingStore (fastapi_categorizer.embedding_store) on one user's embeddings, float16 versus int8 rows.
+
+Measures, per dtype:
+    - append throughput (posts appended in --batch sized calls, as the Celery worker does per task),
+    - on-disk size per post, against the ~1.5 KB of float32 (or ~0.8 KB float16) an in-item embedding costs,
+    - open() (memory-mapping, no copy) versus to_float32() (what the search index is built from),
+    - cosine error of the stored rows against the original vectors,
+    - compaction after every post was re-appended once (replace=True),
+    - push and pull of the user's files through a LocalObjectStore.
+
+Usage:
+    python -m benchmarks.embedding_store --posts 200000 --batch 500
+"""
+import argparse
+import os
+import tempfile
+import uuid
+import numpy as np
+from benchmarks.bench_utils import timed
+from benchmarks.semantic_search import synthetic_embeddings
+from fastapi_categorizer.embedding_store import EmbeddingStore, FLOAT16, INT8
+from fastapi_categorizer.embedding_sync import EmbeddingStoreSync, LocalObjectStore
+
+USER = 'bench.bsky.social'
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def run(dtype: str, post_hashes, vectors, batch: int, root: str):
+    store = EmbeddingStore(root=os.path.join(root, dtype), dtype=dtype)
+    n = len(post_hashes)
+
+    _, seconds = timed(lambda: [store.append(USER, post_hashes[i:i + batch], vectors[i:i + batch])
+                                for i in range(0, n, batch)])
+    size = directory_size(store.user_path(USER))
+    print(f'[{dtype}] append: {n / seconds:,.0f} posts/s, {size / n:.0f} bytes/post on disk '
+          f'({size / 1e6:.1f} MB)')
+
+    stored, open_seconds = timed(store.open, USER)
+    decoded, decode_seconds = timed(stored.to_float32)
+    print(f'[{dtype}] open (mmap): {open_seconds * 1000:.2f}ms, to_float32: {decode_seconds * 1000:.1f}ms')
+
+    cosine = np.sum(decoded * vectors, axis=1) / np.linalg.norm(decoded, axis=1)
+    print(f'[{dtype}] cosine vs original: mean {cosine.mean():.6f}, min {cosine.min():.6f}')
+
+    store.append(USER, post_hashes, vectors, replace=True)
+    (before, after), seconds = timed(store.compact, USER)
+    print(f'[{dtype}] compact {before} -> {after} rows: {seconds * 1000:.1f}ms')
+
+    sync = EmbeddingStoreSync(store=store, object_store=LocalObjectStore(os.path.join(root, f'bucket-{dtype}')))
+    _, push_seconds = timed(sync.push, USER)
+    reader = EmbeddingStore(root=os.path.join(root, f'reader-{dtype}'), dtype=dtype)
+    reader_sync = EmbeddingStoreSync(store=reader, object_store=sync.object_store)
+    pulled, pull_seconds = timed(reader_sync.pull, USER)
+    print(f'[{dtype}] push: {push_seconds * 1000:.1f}ms, pull: {pull_seconds * 1000:.1f}ms '
+          f'(pulled={pulled}, rows={len(reader.open(USER))})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=200000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--topics', type=int, default=500)
+    parser.add_argument('--dtypes', nargs='+', default=[FLOAT16, INT8], choices=[FLOAT16, INT8])
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.posts, args.topics)
+    post_hashes = [str(uuid.uuid5(uuid.NAMESPACE_URL, f'post-{i}')) for i in range(args.posts)]
+    print(f'{args.posts} posts, {vectors.shape[1]}-d: float32 would be {vectors.shape[1] * 4} bytes/post')
+    with tempfile.TemporaryDirectory() as root:
+        for dtype in args.dtypes:
+            run(dtype, post_hashes, vectors, args.batch, root)
+
+
+if __name__ == '__main__':
+    main()
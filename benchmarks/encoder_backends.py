@@ -0,0 +1,60 @@
+"""
+Accuracy parity and CPU throughput of the Categorizer's encoder backends.
+
+Every backend classifies the same synthetic timeline. Labels are compared against the fp32 PyTorch baseline and
+throughput is reported in posts/sec per core (the process is pinned to --threads CPUs before any backend loads).
+
+Usage:
+    python -m benchmarks.encoder_backends --posts 2000 --threads 1 --min-agreement 0.98
+"""
+import argparse
+import os
+import sys
+import torch
+from benchmarks.bench_utils import make_posts, timed
+from fastapi_categorizer import encoders
+from fastapi_categorizer.categorizer import Categorizer
+
+
+def classify(backend: str, posts):
+    categorizer = Categorizer(backend=backend)
+    texts = [post['text'] for post in posts]
+    categorizer.encode_texts(texts[:32])  # warm-up
+    copies = [dict(post) for post in posts]
+    _, elapsed = timed(categorizer.batch_categorize, copies)
+    return [post['category'] for post in copies], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--backends', nargs='+', default=list(encoders.BACKENDS))
+    parser.add_argument('--min-agreement', type=float, default=0.0,
+                        help='exit non-zero if any backend agrees with fp32 on fewer labels than this')
+    args = parser.parse_args()
+
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, set(range(args.threads)))
+    torch.set_num_threads(args.threads)
+    posts = make_posts(args.posts)
+
+    baseline, _ = classify(encoders.TORCH, posts)
+    failed = False
+    print(f'{"backend":<12} {"posts/sec/core":>15} {"agreement":>10}')
+    for backend in args.backends:
+        try:
+            labels, elapsed = classify(backend, posts)
+        except ImportError as e:
+            print(f'{backend:<12} skipped ({e})')
+            continue
+        agreement = sum(a == b for a, b in zip(labels, baseline)) / len(baseline)
+        throughput = len(posts) / elapsed / args.threads
+        print(f'{backend:<12} {throughput:>15.1f} {agreement:>10.2%}')
+        failed = failed or agreement < args.min_agreement
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Import-time budget for the Flask web tier.
+
+Runs `python -X importtime` in a fresh interpreter on the modules a Flask worker imports at boot, prints the slowest
+imports, and exits with status 1 if the total exceeds the budget or if a module that must stay lazy (Celery, atproto,
+the categorizer stack) was loaded. Use it as a regression check (`make import-budget`).
+
+Usage:
+    python -m benchmarks.import_budget --budget-ms 1000
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+WEB_MODULES = ['terpsearch.website', 'terpsearch.website.views', 'terpsearch.website.auth',
+               'terpsearch.website.trends']
+LAZY_MODULES = ['atproto', 'celery', 'fastapi_categorizer', 'sentence_transformers', 'torch']
+
+
+def measure_imports(modules):
+    """
+    Imports modules in a fresh interpreter with -X importtime.
+
+    Returns:
+        Tuple[List[Tuple[str, int, int]], set]: (module, self_us, cumulative_us) per imported module and the set of
+            top-level package names that ended up loaded.
+    """
+    code = f'import {", ".join(modules)}'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'))
+    if result.returncode != 0:
+        raise RuntimeError(f'Importing {modules} failed:\n{result.stderr}')
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # The name column starts with one space, then two more per nesting level
+        timings.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    loaded = {name.strip().split('.')[0] for name, _, _ in timings}
+    return timings, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('WEB_IMPORT_BUDGET_MS', '1000')))
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    timings, loaded = measure_imports(WEB_MODULES)
+    # Only top-level (unindented) web modules count, so interpreter startup imports such as `site` are excluded
+    total_ms = sum(cumulative for name, _, cumulative in timings if name in WEB_MODULES) / 1000
+
+    print('Slowest imports (cumulative):')
+    for name, _, cumulative in sorted(timings, key=lambda timing: timing[2], reverse=True)[:args.top]:
+        print(f'  {cumulative / 1000:8.1f}ms  {name.strip()}')
+    print(f'Total web tier import time: {total_ms:.1f}ms (budget {args.budget_ms:.0f}ms)')
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f'import time {total_ms:.1f}ms exceeds the {args.budget_ms:.0f}ms budget')
+    eager = sorted(loaded.intersection(LAZY_MODULES))
+    if eager:
+        failures.append(f'modules that must be imported lazily were loaded at boot: {", ".join(eager)}')
+
+    for failure in failures:
+        print(f'🚨 {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Keyword search against DynamoDB Local: the BM25 inverted index (terpsearch.dynamodb.PostTermIndex) versus reading the
+user's whole partition with an `Attr('text').contains(...)` filter.
+
+Posts are written in --batch sized batches, one index segment each, as TerpSearchDb.batch_write_items() does. For each
+query the index reports the postings it decoded and the scan the items DynamoDB had to read; the postings size is
+compared with an uncompressed (16-byte post key, frequency, length) encoding.
+
+Requires DynamoDB Local (DB_MODE=DEV, DYNAMODB_URL, e.g. `docker run -p 8000:8000 amazon/dynamodb-local`). Scratch
+tables are created and deleted.
+
+Usage:
+    python -m benchmarks.keyword_search --posts 20000 --batch 500 --repeat 5
+"""
+import argparse
+from boto3.dynamodb.conditions import Attr, Key
+from benchmarks.bench_utils import make_posts, timed, summarize
+from terpsearch.dynamodb.PostTermIndex import PostTermIndex, decode_postings
+from terpsearch.dynamodb.dynamodb_helpers import get_dynamodb_resource, stable_hash
+
+BENCH_POSTS_TABLE_NAME = 'BENCH_KEYWORD_POSTS'
+BENCH_TERMS_TABLE_NAME = 'BENCH_KEYWORD_TERMS'
+USER = 'bench.bsky.social'
+QUERIES = ['lakers', 'bitcoin portfolio', 'climate bill senate', '@author7.bsky.social', 'homework #417']
+
+
+def create_table(dynamodb_resource, table_name: str, sort_key: str):
+    table = dynamodb_resource.create_table(
+        TableName=table_name,
+        KeySchema=[{'AttributeName': 'bskyUsername', 'KeyType': 'HASH'},
+                   {'AttributeName': sort_key, 'KeyType': 'RANGE'}],
+        AttributeDefinitions=[{'AttributeName': 'bskyUsername', 'AttributeType': 'S'},
+                              {'AttributeName': sort_key, 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.wait_until_exists()
+    return table
+
+
+def scan_search(posts_table, query: str):
+    """
+    The baseline: every item of the user is read, and only those containing every word are returned.
+    """
+    condition = None
+    for word in query.lower().split():
+        word_condition = Attr('text_lower').contains(word) | Attr('handle_term').eq(word)
+        condition = word_condition if condition is None else condition & word_condition
+    query_kwargs = {'KeyConditionExpression': Key('bskyUsername').eq(USER), 'FilterExpression': condition}
+    matches = scanned = 0
+    while True:
+        response = posts_table.query(**query_kwargs)
+        matches += response['Count']
+        scanned += response['ScannedCount']
+        if 'LastEvaluatedKey' not in response:
+            return matches, scanned
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def postings_size(terms_table):
+    query_kwargs = {'KeyConditionExpression': Key('bskyUsername').eq(USER) & Key('segment').begins_with('t#')}
+    encoded_bytes = postings = 0
+    while True:
+        response = terms_table.query(**query_kwargs)
+        for item in response.get('Items', []):
+            encoded = bytes(item['postings'])
+            encoded_bytes += len(encoded)
+            postings += len(decode_postings(encoded)[0])
+        if 'LastEvaluatedKey' not in response:
+            return encoded_bytes, postings
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db-mode', default='DEV')
+    args = parser.parse_args()
+
+    dynamodb_resource = get_dynamodb_resource(db_mode=args.db_mode)
+    posts_table = create_table(dynamodb_resource, BENCH_POSTS_TABLE_NAME, 'bskyPostHash')
+    terms_table = create_table(dynamodb_resource, BENCH_TERMS_TABLE_NAME, 'segment')
+    try:
+        term_index = PostTermIndex(dynamodb_resource=dynamodb_resource, terms_table=terms_table)
+        posts = [dict(post, bskyUsername=USER, bskyPostHash=stable_hash(input=post['text']),
+                      text_lower=post['text'].lower(), handle_term=f'@{post["handle"]}')
+                 for post in make_posts(args.posts)]
+        with posts_table.batch_writer() as batch:
+            for post in posts:
+                batch.put_item(Item=post)
+
+        samples = []
+        for start in range(0, len(posts), args.batch):
+            samples.append(timed(term_index.add, USER, posts[start:start + args.batch])[1])
+        summarize(f'index {args.batch} posts', samples)
+        encoded_bytes, postings = postings_size(terms_table)
+        print(f'{postings} postings: {encoded_bytes / postings:.2f} bytes each (uncompressed: 24)')
+
+        for query in QUERIES:
+            index_samples, scan_samples = [], []
+            for _ in range(args.repeat):
+                (hits, postings_read), seconds = timed(term_index.search, USER, query, args.k)
+                index_samples.append(seconds)
+                (matches, scanned), seconds = timed(scan_search, posts_table, query)
+                scan_samples.append(seconds)
+            print(f'"{query}": index read {postings_read} postings ({len(hits)} hits), '
+                  f'scan read {scanned} items ({matches} matches)')
+            summarize('  bm25 index', index_samples)
+            summarize('  contains() scan', scan_samples)
+    finally:
+        posts_table.delete()
+        terms_table.delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Semantic search latency and recall: ExactIndex versus IVFIndex (fastapi_categorizer.vector_index) on one user's
+embeddings.
+
+Embeddings are synthetic by default: normalized 384-d vectors drawn around --topics random topic directions, which
+mimics the clustered structure of MiniLM post embeddings. With --model the texts of synthetic posts are embedded with
+the real categorizer model instead (slow to prepare, needs sentence-transformers).
+
+Queries are noisy copies of random posts. Recall@k is the share of the exact top-k that the IVF index returns.
+
+Usage:
+    python -m benchmarks.semantic_search --posts 200000 --queries 200 --k 10 --probes 4 8 16 32
+"""
+import argparse
+import time
+import numpy as np
+from benchmarks.bench_utils import make_posts, timed, summarize
+from fastapi_categorizer.vector_index import ExactIndex, IVFIndex
+
+DIM = 384
+
+
+def synthetic_embeddings(n: int, topics: int, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, DIM)).astype(np.float32)
+    vectors = centers[rng.integers(0, topics, size=n)] + 1.5 * rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def model_embeddings(n: int):
+    from fastapi_categorizer.categorizer import Categorizer
+    texts = [post['text'] for post in make_posts(n, unique=True)]
+    return Categorizer().encode_texts(texts).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--topics', type=int, default=500)
+    parser.add_argument('--probes', type=int, nargs='+', default=[4, 8, 16, 32])
+    parser.add_argument('--model', action='store_true')
+    args = parser.parse_args()
+
+    vectors = model_embeddings(args.posts) if args.model else synthetic_embeddings(args.posts, args.topics)
+    rng = np.random.default_rng(17)
+    queries = vectors[rng.integers(0, len(vectors), size=args.queries)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact, exact_build = timed(ExactIndex, vectors)
+    ivf, ivf_build = timed(IVFIndex, vectors)
+    print(f'{len(vectors)} posts: exact build {exact_build * 1000:.1f}ms, '
+          f'IVF build {ivf_build * 1000:.1f}ms ({ivf.n_lists} lists)')
+
+    truth = []
+    samples = []
+    for query in queries:
+        (rows, _), seconds = timed(exact.search, query, args.k)
+        truth.append(set(rows.tolist()))
+        samples.append(seconds)
+    summarize('exact', samples)
+
+    for n_probe in args.probes:
+        samples = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            start_time = time.perf_counter()
+            rows, _ = ivf.search(query, args.k, n_probe=n_probe)
+            samples.append(time.perf_counter() - start_time)
+            hits += len(expected & set(rows.tolist()))
+        summarize(f'ivf n_probe={n_probe}', samples)
+        print(f'{"":<32} recall@{args.k}={hits / (len(queries) * args.k):.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Category time-series trends over a synthetic post history: a per-post Python loop versus the NumPy binning in
+terpsearch.dynamodb.trends_series, from raw posts and from per-day rollups.
+
+naive:      parse every timestamp, compute its bin and update a Counter per (bin, category) in Python.
+vectorized: series_from_posts(), i.e. arrays of days / category codes binned with one np.bincount.
+rollups:    series_from_rollups() over the per-day rollup items the same posts produce (what trends reads when the
+            BSKY_CATEGORY_ROLLUPS table is populated).
+
+Usage:
+    python -m benchmarks.trends_series --posts 100000 --repeat 3
+"""
+import argparse
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from benchmarks.bench_utils import make_posts, timed, summarize
+from terpsearch.dynamodb.CategoryRollups import CategoryRollups
+from terpsearch.dynamodb.trends_series import GRANULARITIES, series_from_posts, series_from_rollups
+
+CATEGORIES = ['sports', 'politics', 'technology', 'entertainment', 'finance', 'travel', 'memes', 'education',
+              'climate', 'fashion', 'health', 'unclassified']
+START_DATE = '2025-01-01'
+END_DATE = '2025-12-31'
+
+
+def naive_series(posts, granularity: str):
+    counts = Counter()
+    for post in posts:
+        day = datetime.fromisoformat(post['timestamp'][:10])
+        if granularity == 'week':
+            day = day - timedelta(days=day.weekday())
+        elif granularity == 'month':
+            day = day.replace(day=1)
+        for category in post.get('category', []):
+            counts[(day.date().isoformat(), category)] += 1
+    return counts
+
+
+def to_rollup_items(posts):
+    days = CategoryRollups.aggregate(posts)
+    items = []
+    for day, (post_count, category_counts) in days.items():
+        item = {'day': day, CategoryRollups.POSTS: post_count}
+        item.update({f'{CategoryRollups.CATEGORY_PREFIX}{category}': count
+                     for category, count in category_counts.items()})
+        items.append(item)
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    posts = make_posts(args.posts)
+    for post in posts:
+        post['category'] = rng.sample(CATEGORIES, k=rng.choice([1, 1, 2]))
+    rollup_items = to_rollup_items(posts)
+    print(f'{len(posts)} posts, {len(rollup_items)} daily rollup items')
+
+    for granularity in GRANULARITIES:
+        naive = [timed(naive_series, posts, granularity)[1] for _ in range(args.repeat)]
+        vectorized = [timed(series_from_posts, posts, granularity, START_DATE, END_DATE)[1]
+                      for _ in range(args.repeat)]
+        rollups = [timed(series_from_rollups, rollup_items, granularity, START_DATE, END_DATE)[1]
+                   for _ in range(args.repeat)]
+        summarize(f'{granularity}: naive loop', naive)
+        summarize(f'{granularity}: vectorized posts', vectorized)
+        summarize(f'{granularity}: vectorized rollups', rollups)
+
+        # Both paths must agree
+        series = series_from_posts(posts, granularity, START_DATE, END_DATE)
+        expected = naive_series(posts, granularity)
+        for category, counts in zip(series['categories'], series['counts']):
+            for bin_start, count in zip(series['bins'], counts):
+                assert expected.get((bin_start, category), 0) == count, (granularity, bin_start, category)
+        assert series_from_rollups(rollup_items, granularity, START_DATE, END_DATE) == series
+
+
+if __name__ == '__main__':
+    main()
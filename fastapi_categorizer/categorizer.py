@@ -1,8 +1,15 @@
-from sentence_transformers import SentenceTransformer, util
-from typing import List, Dict, Any
+from sentence_transformers import util
+from typing import List, Dict, Any, Iterator, Tuple
+from fastapi_categorizer.embedding_cache import EmbeddingCache
+from fastapi_categorizer.keyword_matcher import KeywordMatcher
+from fastapi_categorizer import encoders
+import numpy as np
 import time
 
 class Categorizer:
+    MODEL_NAME = "all-MiniLM-L6-v2"
+    UNCLASSIFIED = "unclassified"
+
     CATEGORY_KEYS = [
         "sports", "politics", "tech", "entertainment", "finance",
         "health", "education", "climate", "travel", "memes", "fashion"
@@ -78,12 +85,17 @@ class Categorizer:
         ]
     }
 
-    def __init__(self, threshold: float = 0.18):
-        print("Loading model...")
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+    def __init__(self, threshold: float = 0.18, embedding_cache: EmbeddingCache = None,
+                 chunk_size: int = 256, backend: str = encoders.TORCH):
+        print(f"Loading model ({backend} backend)...")
+        self.backend = backend
+        self.model = encoders.load_encoder(Categorizer.MODEL_NAME, backend=backend)
         print("Model loaded!")
+        self.chunk_size = chunk_size
+        self.embedding_cache = embedding_cache
         self.clean_labels = Categorizer.CATEGORY_KEYS
         self.keyword_map = Categorizer.KEYWORDS
+        self.keyword_matcher = KeywordMatcher(self.keyword_map)
         self.threshold = threshold
         self.category_embeddings = self.model.encode(
             Categorizer.CATEGORY_DESCRIPTIONS,
@@ -110,35 +122,132 @@ class Categorizer:
 
         return [best_label]
 
-    def batch_categorize(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def batch_categorize(self, posts: List[Dict[str, Any]], keep_embeddings: bool = False) -> List[Dict[str, Any]]:
         start_time = time.time()
-        texts = [post['text'].strip() for post in posts if post.get('text')]
-        if not texts:
-            print("🚨 No valid texts to categorize.")
-            return [{'category': 'unclassified'}]
+        for _ in self.iter_batch_categorize(posts, keep_embeddings=keep_embeddings):
+            pass
 
-        embeddings = self.model.encode(texts, convert_to_tensor=True, normalize_embeddings=True)
-        cosine_scores = util.cos_sim(embeddings, self.category_embeddings)
+        print(f'batch_categorize() took {time.time() - start_time:.4f} seconds')
+        return posts
+
+    def iter_batch_categorize(self, posts: List[Dict[str, Any]], chunk_size: int = None,
+                              keep_embeddings: bool = False) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+        """
+        Streams the categorization of a timeline chunk by chunk so that peak memory stays bounded by the chunk size
+        rather than by the size of the timeline.
+
+        Texts are sorted by token length before being split into chunks, so every encoder batch holds posts of
+        similar length and padding is kept to a minimum. Each post's 'category' is set in place and every yielded
+        item carries the post's original index in `posts`. Posts without text are tagged as 'unclassified'.
 
-        for i, row in enumerate(cosine_scores):
-            best_idx = int(row.argmax())
-            best_score = float(row[best_idx])
-            best_label = self.clean_labels[best_idx]
+        Args:
+            posts (List[Dict]): Bluesky posts, each with a 'text' attribute.
+            chunk_size (int): Maximum number of posts encoded at once (defaults to the Categorizer's chunk size).
+            keep_embeddings (bool): Also set each post's 'embedding' to its normalized float32 embedding, so it can be
+                stored for semantic search (see EmbeddingStore).
 
-            if best_score >= self.threshold:
-                posts[i]['category'] = [best_label]
+        Yields:
+            List[Tuple[int, Dict]]: (original index, categorized post) pairs for one chunk.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        valid = []
+        empty = []
+        for i, post in enumerate(posts):
+            text = (post.get('text') or '').strip()
+            if text:
+                valid.append((i, text))
             else:
-                fallback = self._keyword_fallback(texts[i].lower())
-                posts[i]['category'] = fallback or [best_label]
+                post['category'] = [Categorizer.UNCLASSIFIED]
+                empty.append((i, post))
 
-        print(f'batch_categorize() took {time.time() - start_time:.4f} seconds')
-        return posts
+        if empty:
+            print(f"🚨 {len(empty)} posts have no valid text to categorize.")
+            yield empty
+
+        lengths = self._token_lengths([text for _, text in valid])
+        ordered = [valid[j] for j in np.argsort(lengths, kind='stable')]
+
+        for start in range(0, len(ordered), chunk_size):
+            chunk = ordered[start:start + chunk_size]
+            texts = [text for _, text in chunk]
+            embeddings = self.encode_texts(texts)
+            labels, _ = self._classify(texts, embeddings)
+            results = []
+            for j, ((i, _), label) in enumerate(zip(chunk, labels)):
+                posts[i]['category'] = label
+                if keep_embeddings:
+                    posts[i]['embedding'] = embeddings[j]
+                results.append((i, posts[i]))
+            yield results
+
+    def _classify(self, texts: List[str], embeddings) -> Tuple[List[List[str]], List[float]]:
+        cosine_scores = util.cos_sim(embeddings, self.category_embeddings)
+        best_scores, best_idxs = cosine_scores.max(dim=1)
+        labels = [[self.clean_labels[int(idx)]] for idx in best_idxs]
+
+        # Run the keyword engine once over every low-confidence text in the chunk
+        low_confidence = [i for i, score in enumerate(best_scores) if float(score) < self.threshold]
+        keyword_hits = self.keyword_matcher.batch_match([texts[i] for i in low_confidence])
+        for i, counts in zip(low_confidence, keyword_hits):
+            labels[i] = self.keyword_matcher.best_category(counts) or labels[i]
+        return labels, [float(score) for score in best_scores]
+
+    def score_texts(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Categorizes raw texts and returns each text's labels together with its best cosine similarity score.
+
+        Args:
+            texts (List[str]): Non-empty texts to categorize.
+
+        Returns:
+            List[Dict]: {'category': [...], 'score': float} for each text, in the same order as `texts`.
+        """
+        if not texts:
+            return []
+        labels, scores = self._classify(texts, self.encode_texts(texts))
+        return [{'category': label, 'score': score} for label, score in zip(labels, scores)]
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is None:
+            return [len(text) for text in texts]
+        encoded = tokenizer(texts, add_special_tokens=True, truncation=True, max_length=self.model.max_seq_length)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Encodes texts into normalized embeddings, only running the model for texts missing from the embedding cache.
+
+        Args:
+            texts (List[str]): The texts to encode.
+
+        Returns:
+            np.ndarray: A (len(texts), dim) float32 array of normalized embeddings.
+        """
+        if self.embedding_cache is None:
+            return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+
+        cached = self.embedding_cache.get_many(texts)
+        miss_idx = [i for i, vector in enumerate(cached) if vector is None]
+        if miss_idx:
+            miss_texts = [texts[i] for i in miss_idx]
+            encoded = self.model.encode(miss_texts, convert_to_numpy=True, normalize_embeddings=True)
+            self.embedding_cache.put_many(miss_texts, encoded)
+            # Round through float16 so cache hits and misses produce identical scores
+            encoded = encoded.astype(np.float16).astype(np.float32)
+            for i, vector in zip(miss_idx, encoded):
+                cached[i] = vector
+
+        print(f'Embedding cache: {len(texts) - len(miss_idx)}/{len(texts)} hits')
+        return np.vstack(cached)
 
     def _keyword_fallback(self, text: str) -> List[str]:
-        for cat, kwds in self.keyword_map.items():
-            if any(keyword in text for keyword in kwds):
-                return [cat]
-        return []
+        return self.keyword_matcher.best_category(self.keyword_matcher.match(text))
+
+    def keyword_hits(self, texts: List[str]) -> List[Dict[str, int]]:
+        return self.keyword_matcher.batch_match(texts)
 
     def categorize_with_scores(self, text: str) -> List[Dict[str, float]]:
         embedding = self.model.encode(text, convert_to_tensor=True, normalize_embeddings=True)
@@ -1,33 +1,206 @@
 import os
+from collections import Counter
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 import multiprocessing
+import redis
+from fastapi_categorizer.model_manager import model_manager
+from fastapi_categorizer import claim_check
+from fastapi_categorizer.semantic_search import SemanticSearch
+from fastapi_categorizer.embedding_store import EmbeddingStore
+from fastapi_categorizer.embedding_sync import EmbeddingStoreSync
 
 multiprocessing.set_start_method("spawn", force=True)
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")  # default fallback
+WARM_ON_BOOT = os.getenv("CATEGORIZER_WARM_ON_BOOT", "true").lower() == "true"
+DEDUP_BEFORE_CLASSIFY = os.getenv("DEDUP_BEFORE_CLASSIFY", "true").lower() == "true"
+SEARCH_EMBEDDINGS_ENABLED = os.getenv("SEARCH_EMBEDDINGS_ENABLED", "true").lower() == "true"
 celery_app = Celery("worker", broker=REDIS_URL, backend=REDIS_URL)
-# categorizer = Categorizer()
+celery_app.conf.result_expires = int(os.getenv("CELERY_RESULT_EXPIRES", "3600"))
+redis_client = redis.from_url(REDIS_URL)
+embedding_store = EmbeddingStore.from_env()
+# With a sync target, search indexes are invalidated once the new rows are uploaded rather than when they are written
+embedding_sync = EmbeddingStoreSync.from_env(
+    store=embedding_store, on_synced=lambda bsky_username: SemanticSearch.bump_generation(redis_client, bsky_username))
+
+
+@worker_process_init.connect
+def warm_up_categorizer(**kwargs):
+    """
+    Loads the model and category embeddings once when each worker process boots so that tasks never pay the
+    cold-start cost.
+    """
+    if WARM_ON_BOOT:
+        model_manager.warm_up()
+    if embedding_sync is not None:
+        embedding_sync.start()
+
+
+@worker_process_shutdown.connect
+def flush_embedding_sync(**kwargs):
+    if embedding_sync is not None:
+        embedding_sync.stop(flush=True)
+
+
+def store_embeddings(classified_posts, bsky_username):
+    """
+    Moves the embeddings kept by batch_categorize() off the posts and appends them to the user's EmbeddingStore.
+
+    Returns:
+        int: The number of embeddings appended.
+    """
+    import numpy as np
+    from terpsearch.dynamodb.dynamodb_helpers import stable_hash
+
+    post_hashes = []
+    vectors = []
+    for post in classified_posts:
+        embedding = post.pop('embedding', None)
+        if embedding is not None:
+            post_hashes.append(stable_hash(input=post['text']))
+            vectors.append(embedding)
+    if not vectors:
+        return 0
+
+    try:
+        if embedding_sync is not None:
+            # Appends on top of the newest uploaded rows, so a worker with a stale or empty disk never loses them
+            return embedding_sync.append(bsky_username, post_hashes, np.vstack(vectors))
+        return embedding_store.append(bsky_username, post_hashes, np.vstack(vectors))
+    except Exception as e:
+        print(f"⚠️ Failed to store embeddings of {bsky_username}: {str(e)}")
+        return 0
+
 
 @celery_app.task
-def categorize_texts_task(texts, bsky_username):
-    print('Entering celery worker...')
-    print(f'redis_url: {REDIS_URL}')
-    from fastapi_categorizer.categorizer import Categorizer
+def categorizer_status_task():
+    return model_manager.status()
+
+
+def classify_and_store(posts, bsky_username):
+    """
+    Categorizes posts with the warm categorizer and writes them to the BSKY_POSTS table.
+
+    Posts whose (bskyUsername, bskyPostHash) item is already stored, and repeats within the batch, are dropped before
+    classification so the model only embeds new posts. If the existing keys cannot be checked, every post is
+    classified as before.
+
+    Args:
+        posts (List[Dict]): Bluesky posts to categorize.
+        bsky_username (str): The Bluesky username that owns the posts.
+
+    Returns:
+        dict: A compact summary (post count, per-category counts, classified/written/skipped counts) instead of the
+            posts.
+    """
     from terpsearch.dynamodb.TerpSearchDb import TerpSearchDb
     from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+    from terpsearch.dynamodb.trends_cache import TrendsCache
+
+    bsky_dynamodb = TerpSearchDb(db_mode=DynamoDbConstants.DB_MODE)
+    new_posts = posts
+    already_stored = 0
+    duplicates = 0
+    known_new = False
+    if DEDUP_BEFORE_CLASSIFY and len(posts) > 0:
+        try:
+            new_posts, already_stored, duplicates = bsky_dynamodb.filter_new_posts(
+                items=posts, table_name=DynamoDbConstants.BSKY_POSTS_TABLE_NAME, user=bsky_username)
+            known_new = True
+        except Exception as e:
+            print(f"⚠️ Could not check for stored posts, classifying all {len(posts)}: {str(e)}")
+
+    classified_posts = []
+    if len(new_posts) > 0:
+        categorizer = model_manager.get_categorizer()
+        print(f'Using warm categorizer within celery worker and now entering batch_categorize() '
+              f'for {len(new_posts)}/{len(posts)} posts')
+        classified_posts = categorizer.batch_categorize(new_posts, keep_embeddings=SEARCH_EMBEDDINGS_ENABLED)
+        print(f"Finished classification: {[(post.get('text'), post['category']) for post in classified_posts[0:2]]}",
+              flush=True)
+    else:
+        print(f'⏭️ ({bsky_username}) -> All {len(posts)} posts are already stored, skipping classification')
 
-    categorizer = Categorizer()
-    print('Initialized categorizer within celery worker and now entering batch_categorize()')
-    classified_posts = categorizer.batch_categorize(texts)
-    print(f'Finished classification: {classified_posts[0:2]}', flush=True)
+    category_counts = Counter(cat for post in classified_posts for cat in post.get('category', []))
+    embeddings_stored = store_embeddings(classified_posts, bsky_username)
+    written = 0
 
     # Write results to DynamoDB
     if len(classified_posts) > 0:
         print(f'📝 Writing {len(classified_posts)} classified posts to DynamoDB for {bsky_username}')
-        bsky_dynamodb = TerpSearchDb(db_mode=DynamoDbConstants.DB_MODE)
         try:
-            bsky_dynamodb.batch_write_items(items=classified_posts,
-                                            table_name=DynamoDbConstants.BSKY_POSTS_TABLE_NAME,
-                                            user=bsky_username)
+            written = bsky_dynamodb.batch_write_items(items=classified_posts,
+                                                      table_name=DynamoDbConstants.BSKY_POSTS_TABLE_NAME,
+                                                      user=bsky_username, known_new=known_new)
             print("✅ Successfully wrote to DynamoDB!")
         except Exception as e:
             print(f"❌ Failed to write to DynamoDB: {str(e)}")
+
+    # New posts change this user's trends and search results, so drop every chart and index cached for them
+    if written > 0:
+        try:
+            TrendsCache(redis_client=redis_client).bump_generation(bsky_username)
+            if embedding_sync is None:
+                SemanticSearch.bump_generation(redis_client, bsky_username)
+        except Exception as e:
+            print(f"⚠️ Failed to invalidate cached trends and search index of {bsky_username}: {str(e)}")
+
+    return {
+        'bsky_username': bsky_username,
+        'posts': len(posts),
+        'categories': dict(category_counts),
+        'classified': len(classified_posts),
+        'embeddings_stored': embeddings_stored,
+        'already_stored': already_stored,
+        'duplicates': duplicates,
+        'written': written,
+        'skipped': len(posts) - written
+    }
+
+
+@celery_app.task
+def categorize_texts_task(texts, bsky_username):
+    print('Entering celery worker...')
+    print(f'redis_url: {REDIS_URL}')
+    return classify_and_store(posts=texts, bsky_username=bsky_username)
+
+
+@celery_app.task
+def categorize_claim_check_task(claim_key, bsky_username):
+    """
+    Categorizes the posts staged under a claim-check key, so that only the key travels through the broker.
+
+    The task is not retried, so the claim is released whether it succeeds or fails rather than lingering in Redis
+    until its TTL. An expired claim fails the task with ClaimCheckExpired.
+    """
+    print(f'Entering celery worker for claim-check {claim_key}...')
+    try:
+        posts = claim_check.load_posts(redis_client, claim_key)
+        return classify_and_store(posts=posts, bsky_username=bsky_username)
+    finally:
+        claim_check.release_posts(redis_client, claim_key)
+
+
+@celery_app.task
+def merge_shard_results(shard_summaries, bsky_username):
+    """
+    Chord callback that aggregates the summaries of every shard of a fanned-out timeline into one summary.
+    """
+    categories = Counter()
+    for summary in shard_summaries:
+        categories.update(summary.get('categories', {}))
+
+    merged = {
+        'bsky_username': bsky_username,
+        'shards': len(shard_summaries),
+        'posts': sum(summary.get('posts', 0) for summary in shard_summaries),
+        'categories': dict(categories),
+        'classified': sum(summary.get('classified', 0) for summary in shard_summaries),
+        'embeddings_stored': sum(summary.get('embeddings_stored', 0) for summary in shard_summaries),
+        'already_stored': sum(summary.get('already_stored', 0) for summary in shard_summaries),
+        'duplicates': sum(summary.get('duplicates', 0) for summary in shard_summaries),
+        'written': sum(summary.get('written', 0) for summary in shard_summaries),
+        'skipped': sum(summary.get('skipped', 0) for summary in shard_summaries)
+    }
+    print(f"🧩 ({bsky_username}) -> merged {merged['shards']} shards, {merged['written']} posts written")
+    return merged
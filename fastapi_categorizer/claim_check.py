@@ -0,0 +1,97 @@
+import json
+import os
+import uuid
+import zlib
+from typing import Any, Dict, List
+
+try:
+    import msgpack
+    import zstandard
+except ImportError:
+    msgpack = None
+    zstandard = None
+
+"""
+Claim-check staging for categorization payloads.
+
+Instead of JSON-serializing a whole timeline into a single broker message, FastAPI stages the posts once in Redis
+(compressed, under a key with a TTL) and only the key travels through the Celery broker. The worker loads the posts
+from the key, and deletes them once they have been processed.
+
+Payloads are encoded with msgpack + zstd when both packages are installed and fall back to JSON + zlib otherwise. The
+first byte of every payload records the codec so either side can decode whatever the other wrote.
+"""
+
+CLAIM_CHECK_PREFIX = 'claim:posts'
+CLAIM_CHECK_TTL = int(os.getenv('CLAIM_CHECK_TTL', '3600'))
+ZSTD_LEVEL = 3
+
+MSGPACK_ZSTD = b'z'
+JSON_ZLIB = b'j'
+
+
+class ClaimCheckExpired(Exception):
+    """
+    Raised when a claim-check payload is gone, typically because the task waited in the broker longer than its TTL.
+    """
+
+
+def encode_posts(posts: List[Dict[str, Any]]) -> bytes:
+    if msgpack is not None:
+        return MSGPACK_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(msgpack.packb(posts))
+    return JSON_ZLIB + zlib.compress(json.dumps(posts).encode())
+
+
+def decode_posts(payload: bytes) -> List[Dict[str, Any]]:
+    codec, body = payload[:1], payload[1:]
+    if codec == MSGPACK_ZSTD:
+        if msgpack is None:
+            raise RuntimeError('Claim-check payload was written with msgpack+zstd, which is not installed here')
+        return msgpack.unpackb(zstandard.ZstdDecompressor().decompress(body))
+    if codec == JSON_ZLIB:
+        return json.loads(zlib.decompress(body))
+    raise ValueError(f'Unknown claim-check codec {codec!r}')
+
+
+def stage_posts(redis_client, posts: List[Dict[str, Any]], ttl: int = CLAIM_CHECK_TTL) -> str:
+    """
+    Compresses posts and stores them in Redis under a fresh claim-check key.
+
+    Args:
+        redis_client (redis.Redis): The Redis client.
+        posts (List[Dict]): The posts to stage.
+        ttl (int): Seconds before Redis drops the staged payload if nobody claims it.
+
+    Returns:
+        str: The claim-check key to hand to the Celery task.
+    """
+    key = f'{CLAIM_CHECK_PREFIX}:{uuid.uuid4()}'
+    payload = encode_posts(posts)
+    redis_client.set(key, payload, ex=ttl)
+    print(f'📦 Staged {len(posts)} posts under {key} ({len(payload)} bytes)')
+    return key
+
+
+def load_posts(redis_client, key: str) -> List[Dict[str, Any]]:
+    """
+    Loads the posts staged under a claim-check key.
+
+    Args:
+        redis_client (redis.Redis): The Redis client.
+        key (str): The claim-check key.
+
+    Returns:
+        List[Dict]: The staged posts.
+
+    Raises:
+        ClaimCheckExpired: If the key has expired or never existed.
+    """
+    payload = redis_client.get(key)
+    if payload is None:
+        raise ClaimCheckExpired(f'Claim-check payload {key} has expired or does not exist; the task waited longer '
+                                f'than CLAIM_CHECK_TTL ({CLAIM_CHECK_TTL}s) or was already processed')
+    return decode_posts(payload)
+
+
+def release_posts(redis_client, key: str):
+    redis_client.delete(key)
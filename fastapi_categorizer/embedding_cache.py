@@ -0,0 +1,170 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+from terpsearch.dynamodb.dynamodb_helpers import stable_hash
+
+
+class EmbeddingCache:
+    """
+    A content-addressed, two-tier cache of sentence embeddings.
+
+    Reposts, overlapping timelines and re-ingestion after a cursor reset mean the same post text is categorized over
+    and over. Entries are keyed by the model name plus the same `stable_hash` used for `bskyPostHash` in DynamoDB, so
+    a text only has to be encoded once per model.
+
+    Tiers:
+    1) In-process LRU: an OrderedDict bounded by `max_entries`. The least recently used entry is evicted first.
+    2) Optional Redis tier: shared by every worker, bounded by a per-key TTL (and Redis' own maxmemory policy).
+
+    Vectors are stored as float16 to halve memory; callers always receive float32 rows.
+    """
+
+    KEY_PREFIX = 'emb'
+
+    def __init__(self, model_name: str, max_entries: int = 50000, redis_client=None, redis_ttl: int = 7 * 24 * 3600):
+        """
+        Initializes an EmbeddingCache.
+
+        Args:
+            model_name (str): Name of the embedding model. Part of every key so models never share vectors.
+            max_entries (int): Maximum number of vectors held in the in-process LRU.
+            redis_client (redis.Redis): Optional Redis client used as the shared second tier.
+            redis_ttl (int): Expiry (seconds) of vectors written to Redis.
+        """
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.redis_client = redis_client
+        self.redis_ttl = redis_ttl
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, model_name: str):
+        """
+        Builds an EmbeddingCache configured from environment variables.
+
+        - EMBEDDING_CACHE_SIZE: Maximum in-process entries (default 50000, 0 disables the cache).
+        - EMBEDDING_CACHE_REDIS_URL: Enables the Redis tier when set.
+        - EMBEDDING_CACHE_TTL: Redis tier expiry in seconds (default 7 days).
+
+        Returns:
+            EmbeddingCache or None: None if the cache is disabled.
+        """
+        max_entries = int(os.getenv('EMBEDDING_CACHE_SIZE', '50000'))
+        if max_entries <= 0:
+            return None
+
+        redis_client = None
+        redis_url = os.getenv('EMBEDDING_CACHE_REDIS_URL')
+        if redis_url:
+            import redis
+            redis_client = redis.from_url(redis_url)
+
+        return cls(model_name=model_name, max_entries=max_entries, redis_client=redis_client,
+                   redis_ttl=int(os.getenv('EMBEDDING_CACHE_TTL', str(7 * 24 * 3600))))
+
+    def key(self, text: str) -> str:
+        return f'{EmbeddingCache.KEY_PREFIX}:{self.model_name}:{stable_hash(input=text)}'
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Looks up the embeddings of several texts, checking the LRU first and then Redis.
+
+        Args:
+            texts (List[str]): The texts to look up.
+
+        Returns:
+            List[Optional[np.ndarray]]: A float32 vector per text, or None for a miss.
+        """
+        keys = [self.key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    results[i] = vector.astype(np.float32)
+                    self.hits += 1
+                else:
+                    missing.append(i)
+
+        if missing and self.redis_client is not None:
+            try:
+                raw_values = self.redis_client.mget([keys[i] for i in missing])
+            except Exception as e:
+                print(f'⚠️ Embedding cache Redis lookup failed: {e}')
+                raw_values = [None] * len(missing)
+
+            still_missing = []
+            for i, raw in zip(missing, raw_values):
+                if raw is None:
+                    still_missing.append(i)
+                    continue
+                vector = np.frombuffer(raw, dtype=np.float16)
+                self._store(keys[i], vector)
+                results[i] = vector.astype(np.float32)
+                self.redis_hits += 1
+            missing = still_missing
+
+        self.misses += len(missing)
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """
+        Stores freshly encoded vectors in every tier.
+
+        Args:
+            texts (List[str]): The encoded texts.
+            vectors (np.ndarray): A (len(texts), dim) array of embeddings.
+        """
+        half_vectors = np.asarray(vectors, dtype=np.float16)
+        keys = [self.key(text) for text in texts]
+        for key, vector in zip(keys, half_vectors):
+            self._store(key, vector)
+
+        if self.redis_client is not None:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key, vector in zip(keys, half_vectors):
+                    pipe.set(key, vector.tobytes(), ex=self.redis_ttl)
+                pipe.execute()
+            except Exception as e:
+                print(f'⚠️ Embedding cache Redis write failed: {e}')
+
+    def _store(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the hit/miss counters of the cache.
+
+        Returns:
+            dict: Memory hits, Redis hits, misses, evictions, current size and overall hit rate.
+        """
+        lookups = self.hits + self.redis_hits + self.misses
+        return {
+            'hits': self.hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._lru),
+            'max_entries': self.max_entries,
+            'hit_rate': (self.hits + self.redis_hits) / lookups if lookups else 0.0
+        }
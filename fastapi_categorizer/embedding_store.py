@@ -0,0 +1,324 @@
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+"""
+EmbeddingStore: an append-only, memory-mapped store of post embeddings, one directory per user.
+
+Keeping a 384-dim vector in every BSKY_POSTS item inflates item size and read cost, so embeddings live in flat files
+instead:
+
+    {root}/{user}/meta.json         {"format", "dim", "dtype", "rows", "generation", "version", "updated_at"}
+    {root}/{user}/keys-{g}.bin      16 bytes per row: the bskyPostHash UUID
+    {root}/{user}/vectors-{g}.bin   dim bytes (int8) or 2 * dim bytes (float16) per row
+    {root}/{user}/scales-{g}.bin    float32 per row, int8 rows only (row = int8 * scale)
+
+Row r of every file starts at byte offset r * row_size, so the files are the offset index: readers memory-map them
+straight into NumPy without copying or parsing, and a dict from bskyPostHash to row is built from the keys file.
+
+Writes take an exclusive flock on the user's directory (re-entrant within a thread), truncate anything past the committed row count (left by a
+crashed writer), append, fsync and only then commit the new row count by atomically replacing meta.json. Readers trust
+meta.json, so they never see a partial row. Compaction writes the live rows to the next generation's files and
+switches meta.json to them; readers that still map the old generation keep a valid view until they reopen.
+"""
+
+FORMAT_VERSION = 1
+FLOAT16 = 'float16'
+INT8 = 'int8'
+KEY_BYTES = 16
+
+
+def user_directory_name(bsky_username: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]', '_', bsky_username.strip().lower())
+
+
+def quantize_int8(vectors: np.ndarray):
+    """
+    Quantizes rows to int8 with one symmetric scale per row.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The int8 rows and their float32 scales.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class StoredEmbeddings:
+    """
+    A read-only, memory-mapped view of one user's rows at the time it was opened.
+    """
+
+    def __init__(self, keys: np.ndarray, vectors: np.ndarray, scales: Optional[np.ndarray], dtype: str):
+        self.keys = keys
+        self.vectors = vectors
+        self.scales = scales
+        self.dtype = dtype
+        self._rows_by_hash = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    def post_hashes(self, rows=None) -> List[str]:
+        keys = self.keys if rows is None else self.keys[rows]
+        return [str(uuid.UUID(bytes=key.tobytes())) for key in keys]
+
+    def row_of(self, post_hash: str) -> Optional[int]:
+        """
+        Returns the row holding a post's embedding (the latest one, if it was appended more than once).
+        """
+        if self._rows_by_hash is None:
+            self._rows_by_hash = {key.tobytes(): row for row, key in enumerate(self.keys)}
+        return self._rows_by_hash.get(uuid.UUID(post_hash).bytes)
+
+    def live_rows(self, live_hashes: Iterable[str] = None) -> np.ndarray:
+        """
+        Returns the newest row of every post (optionally only of `live_hashes`), in row order.
+        """
+        keys = np.asarray(self.keys).view(f'S{KEY_BYTES}').ravel()
+        if len(keys) == 0:
+            return np.array([], dtype=np.int64)
+        # np.unique keeps the first occurrence, so look at the keys newest first
+        _, newest_first = np.unique(keys[::-1], return_index=True)
+        rows = np.sort(len(keys) - 1 - newest_first)
+        if live_hashes is not None:
+            live = np.array([uuid.UUID(post_hash).bytes for post_hash in live_hashes], dtype=f'S{KEY_BYTES}')
+            rows = rows[np.isin(keys[rows], live)]
+        return rows
+
+    def to_float32(self, rows=None) -> np.ndarray:
+        """
+        Returns rows as a float32 array (every row by default), dequantizing int8 rows.
+        """
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if self.dtype == INT8:
+            scales = self.scales if rows is None else self.scales[rows]
+            return np.multiply(vectors, scales[:, None], dtype=np.float32)
+        return vectors.astype(np.float32)
+
+    def vectors_for(self, post_hashes: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Gathers the float32 embeddings of specific posts, e.g. to re-score search candidates.
+        """
+        found = {post_hash: self.row_of(post_hash) for post_hash in post_hashes}
+        found = {post_hash: row for post_hash, row in found.items() if row is not None}
+        vectors = self.to_float32(np.fromiter(found.values(), dtype=np.int64, count=len(found)))
+        return dict(zip(found, vectors))
+
+
+class EmbeddingStore:
+    def __init__(self, root: str, dtype: str = FLOAT16):
+        """
+        Initializes an EmbeddingStore.
+
+        Args:
+            root (str): Directory holding one sub-directory per user.
+            dtype (str): Row format of new user stores, 'float16' or 'int8'. Existing stores keep their format until
+                they are compacted to another one.
+        """
+        if dtype not in (FLOAT16, INT8):
+            raise ValueError(f'Unsupported embedding dtype {dtype!r}; expected {FLOAT16!r} or {INT8!r}')
+        self.root = root
+        self.dtype = dtype
+        self._held_locks = threading.local()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds an EmbeddingStore from EMBEDDING_STORE_DIR / EMBEDDING_STORE_DTYPE.
+        """
+        return cls(root=os.getenv('EMBEDDING_STORE_DIR', 'embedding_store'),
+                   dtype=os.getenv('EMBEDDING_STORE_DTYPE', FLOAT16))
+
+    def user_path(self, bsky_username: str) -> str:
+        return os.path.join(self.root, user_directory_name(bsky_username))
+
+    @staticmethod
+    def file_names(generation: int, dtype: str) -> List[str]:
+        names = [f'keys-{generation}.bin', f'vectors-{generation}.bin']
+        if dtype == INT8:
+            names.append(f'scales-{generation}.bin')
+        return names
+
+    def users(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, name, 'meta.json')))
+
+    def read_meta(self, bsky_username: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.user_path(bsky_username), 'meta.json')) as meta_file:
+                return json.load(meta_file)
+        except FileNotFoundError:
+            return None
+
+    def write_meta(self, user_path: str, meta: dict):
+        meta = dict(meta, updated_at=time.time())
+        tmp_path = os.path.join(user_path, f'meta.json.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as meta_file:
+            json.dump(meta, meta_file)
+            meta_file.flush()
+            os.fsync(meta_file.fileno())
+        os.replace(tmp_path, os.path.join(user_path, 'meta.json'))
+
+    @contextmanager
+    def lock(self, bsky_username: str):
+        """
+        Holds the exclusive write lock of a user's store (across processes sharing the directory). A thread that
+        already holds it can take it again, e.g. to append while syncing.
+        """
+        user_path = self.user_path(bsky_username)
+        held = self._held_locks.__dict__.setdefault('paths', set())
+        if user_path in held:
+            yield user_path
+            return
+
+        os.makedirs(user_path, exist_ok=True)
+        with open(os.path.join(user_path, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            held.add(user_path)
+            try:
+                yield user_path
+            finally:
+                held.discard(user_path)
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _row_sizes(meta: dict) -> List[int]:
+        vector_bytes = meta['dim'] * (1 if meta['dtype'] == INT8 else 2)
+        return [KEY_BYTES, vector_bytes] + ([4] if meta['dtype'] == INT8 else [])
+
+    def open(self, bsky_username: str) -> StoredEmbeddings:
+        """
+        Memory-maps a user's committed rows. Users without a store get an empty view.
+        """
+        meta = self.read_meta(bsky_username)
+        if meta is None or meta['rows'] == 0:
+            dim = meta['dim'] if meta else 0
+            dtype = meta['dtype'] if meta else self.dtype
+            return StoredEmbeddings(keys=np.zeros((0, KEY_BYTES), dtype=np.uint8),
+                                    vectors=np.zeros((0, dim), dtype=np.int8 if dtype == INT8 else np.float16),
+                                    scales=np.zeros(0, dtype=np.float32) if dtype == INT8 else None, dtype=dtype)
+
+        user_path = self.user_path(bsky_username)
+        rows = meta['rows']
+        paths = [os.path.join(user_path, name) for name in EmbeddingStore.file_names(meta['generation'],
+                                                                                      meta['dtype'])]
+        keys = np.memmap(paths[0], dtype=np.uint8, mode='r', shape=(rows, KEY_BYTES))
+        vectors = np.memmap(paths[1], dtype=np.int8 if meta['dtype'] == INT8 else np.float16, mode='r',
+                            shape=(rows, meta['dim']))
+        scales = np.memmap(paths[2], dtype=np.float32, mode='r', shape=(rows,)) if meta['dtype'] == INT8 else None
+        return StoredEmbeddings(keys=keys, vectors=vectors, scales=scales, dtype=meta['dtype'])
+
+    def append(self, bsky_username: str, post_hashes: List[str], vectors: np.ndarray, replace: bool = False) -> int:
+        """
+        Appends embeddings to a user's store.
+
+        Args:
+            bsky_username (str): The Bluesky username.
+            post_hashes (List[str]): The bskyPostHash of every row.
+            vectors (np.ndarray): A (len(post_hashes), dim) array of normalized embeddings.
+            replace (bool): Append rows for posts that are already stored too (e.g. after a model change); the newest
+                row wins and compact() drops the older one. By default those posts are skipped.
+
+        Returns:
+            int: The number of rows appended.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(post_hashes) != len(vectors):
+            raise ValueError(f'{len(post_hashes)} post hashes for {len(vectors)} vectors')
+        if len(vectors) == 0:
+            return 0
+
+        with self.lock(bsky_username) as user_path:
+            meta = self.read_meta(bsky_username) or {
+                'format': FORMAT_VERSION, 'dim': vectors.shape[1], 'dtype': self.dtype, 'rows': 0, 'generation': 0,
+                'version': 0
+            }
+            if vectors.shape[1] != meta['dim']:
+                raise ValueError(f'Embedding width {vectors.shape[1]} does not match the store width {meta["dim"]}')
+
+            # Skip repeats within the batch (the last one wins) and, unless replacing, posts already stored
+            selected = {uuid.UUID(post_hash).bytes: i for i, post_hash in enumerate(post_hashes)}
+            if not replace and meta['rows']:
+                batch_keys = np.array(list(selected), dtype=f'S{KEY_BYTES}')
+                stored = np.isin(batch_keys, self.open(bsky_username).keys.view(f'S{KEY_BYTES}').ravel())
+                for key in batch_keys[stored]:
+                    del selected[key.ljust(KEY_BYTES, b'\0')]
+            if not selected:
+                return 0
+
+            rows = np.fromiter(selected.values(), dtype=np.int64, count=len(selected))
+            keys = np.frombuffer(b''.join(selected), dtype=np.uint8).reshape(len(selected), KEY_BYTES)
+            if meta['dtype'] == INT8:
+                quantized, scales = quantize_int8(vectors[rows])
+                columns = [keys, quantized, scales]
+            else:
+                columns = [keys, vectors[rows].astype(np.float16)]
+
+            names = EmbeddingStore.file_names(meta['generation'], meta['dtype'])
+            for name, row_size, column in zip(names, EmbeddingStore._row_sizes(meta), columns):
+                path = os.path.join(user_path, name)
+                with open(path, 'ab') as data_file:
+                    # Drop bytes past the committed rows, left behind by a writer that crashed before committing
+                    data_file.truncate(meta['rows'] * row_size)
+                    data_file.write(np.ascontiguousarray(column).tobytes())
+                    data_file.flush()
+                    os.fsync(data_file.fileno())
+
+            self.write_meta(user_path, dict(meta, rows=meta['rows'] + len(selected), version=meta['version'] + 1))
+        return len(selected)
+
+    def compact(self, bsky_username: str, live_hashes: Iterable[str] = None, dtype: str = None):
+        """
+        Rewrites a user's store keeping only the newest row of every post, optionally only for `live_hashes` (e.g.
+        the posts still stored in BSKY_POSTS) and optionally converting the rows to another dtype.
+
+        Returns:
+            Tuple[int, int]: The number of rows before and after compaction.
+        """
+        with self.lock(bsky_username) as user_path:
+            meta = self.read_meta(bsky_username)
+            if meta is None:
+                return 0, 0
+            stored = self.open(bsky_username)
+            rows = stored.live_rows(live_hashes)
+
+            new_meta = dict(meta, dtype=dtype or meta['dtype'], rows=len(rows), generation=meta['generation'] + 1,
+                            version=meta['version'] + 1)
+            vectors = stored.to_float32(rows)
+            if new_meta['dtype'] == INT8:
+                quantized, scales = quantize_int8(vectors)
+                columns = [stored.keys[rows], quantized, scales]
+            else:
+                columns = [stored.keys[rows], vectors.astype(np.float16)]
+
+            new_names = EmbeddingStore.file_names(new_meta['generation'], new_meta['dtype'])
+            for name, column in zip(new_names, columns):
+                with open(os.path.join(user_path, name), 'wb') as data_file:
+                    data_file.write(np.ascontiguousarray(column).tobytes())
+                    data_file.flush()
+                    os.fsync(data_file.fileno())
+            self.write_meta(user_path, new_meta)
+
+            for name in EmbeddingStore.file_names(meta['generation'], meta['dtype']):
+                try:
+                    os.remove(os.path.join(user_path, name))
+                except FileNotFoundError:
+                    pass
+        print(f'🗜️ ({bsky_username}) -> Compacted embedding store from {meta["rows"]} to {len(rows)} rows')
+        return meta['rows'], len(rows)
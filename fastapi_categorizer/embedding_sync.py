@@ -0,0 +1,420 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Callable, Optional
+import numpy as np
+from fastapi_categorizer.embedding_store import EmbeddingStore
+
+"""
+Background sync of the EmbeddingStore to object storage.
+
+Celery workers append embeddings through EmbeddingStoreSync.append(), which first pulls the user's newest remote rows
+under the store lock, and mark the user dirty; a daemon thread uploads the dirty users every EMBEDDING_SYNC_INTERVAL
+seconds. Uploads snapshot the committed rows under the store lock and upload them after releasing it, so appends are
+not blocked by the transfer. Readers (the FastAPI search service) pull a user's files when the remote meta.json has moved on from the
+version they last synced.
+
+Remote layout, per user:
+    embeddings/{user}/meta.json         the local meta.json plus 'location'
+    embeddings/{user}/{location}/...    the data files of one upload, never overwritten
+
+An upload writes its data files under a fresh location and then swaps meta.json with a conditional write that only
+succeeds if meta.json is still the one the local store last synced. If another host uploaded in between, the local
+rows that were not uploaded yet are re-appended on top of the newer remote rows and the upload is retried, so every
+version has one set of rows and concurrent writers never overwrite each other. The previous upload's files are deleted
+once meta.json no longer points at them; a reader that was downloading them fails its pull and retries.
+
+Object stores:
+    - S3ObjectStore: `s3://bucket/prefix` (conditional writes with If-Match / If-None-Match).
+    - LocalObjectStore: `file:///path` (or a bare path), a directory standing in for a bucket in development and tests.
+"""
+
+EMBEDDING_SYNC_INTERVAL = float(os.getenv('EMBEDDING_SYNC_INTERVAL', '10'))
+
+
+class LocalObjectStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def upload(self, local_path: str, key: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        shutil.copyfile(local_path, tmp_path)
+        os.replace(tmp_path, path)
+
+    def download(self, key: str, local_path: str):
+        shutil.copyfile(self._path(key), local_path)
+
+    def read_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), 'rb') as object_file:
+                return object_file.read()
+        except FileNotFoundError:
+            return None
+
+    def read_versioned(self, key: str):
+        """
+        Returns an object's bytes and the token upload_if_match() expects ((None, None) if it does not exist).
+        """
+        data = self.read_bytes(key)
+        return data, data
+
+    def upload_if_match(self, local_path: str, key: str, token) -> bool:
+        """
+        Uploads a file only if the object still matches `token` (None: only if it does not exist).
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if self.read_bytes(key) != token:
+                    return False
+                self.upload(local_path, key)
+                return True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3ObjectStore:
+    def __init__(self, bucket: str, prefix: str = ''):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.s3_client = boto3.client('s3')
+
+    def _key(self, key: str) -> str:
+        return f'{self.prefix}/{key}' if self.prefix else key
+
+    def upload(self, local_path: str, key: str):
+        self.s3_client.upload_file(local_path, self.bucket, self._key(key))
+
+    def download(self, key: str, local_path: str):
+        self.s3_client.download_file(self.bucket, self._key(key), local_path)
+
+    def read_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            return self.s3_client.get_object(Bucket=self.bucket, Key=self._key(key))['Body'].read()
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+
+    def read_versioned(self, key: str):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except self.s3_client.exceptions.NoSuchKey:
+            return None, None
+        return response['Body'].read(), response['ETag']
+
+    def upload_if_match(self, local_path: str, key: str, token) -> bool:
+        condition = {'IfMatch': token} if token is not None else {'IfNoneMatch': '*'}
+        with open(local_path, 'rb') as local_file:
+            try:
+                self.s3_client.put_object(Bucket=self.bucket, Key=self._key(key), Body=local_file, **condition)
+            except self.s3_client.exceptions.ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                    return False
+                raise
+        return True
+
+    def delete(self, key: str):
+        self.s3_client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def object_store_from_url(url: str):
+    """
+    Returns the object store of an `s3://bucket/prefix` or `file:///path` URL (a bare path is a local directory).
+    """
+    if url.startswith('s3://'):
+        bucket, _, prefix = url[len('s3://'):].partition('/')
+        return S3ObjectStore(bucket=bucket, prefix=prefix)
+    if url.startswith('file://'):
+        url = url[len('file://'):]
+    return LocalObjectStore(root=url)
+
+
+class EmbeddingStoreSync:
+    def __init__(self, store: EmbeddingStore, object_store, interval: float = EMBEDDING_SYNC_INTERVAL,
+                 on_synced: Callable[[str], None] = None, max_push_attempts: int = 5):
+        """
+        Initializes an EmbeddingStoreSync.
+
+        Args:
+            store (EmbeddingStore): The local store.
+            object_store (LocalObjectStore or S3ObjectStore): Where user stores are uploaded to and pulled from.
+            interval (float): Seconds between two uploads of the dirty users.
+            on_synced (Callable[[str], None]): Called with the username after its files were uploaded.
+            max_push_attempts (int): How many times an upload is retried after losing a race with another writer.
+        """
+        self.store = store
+        self.object_store = object_store
+        self.interval = interval
+        self.on_synced = on_synced
+        self.max_push_attempts = max_push_attempts
+        self.uploads = 0
+        self.pulls = 0
+        self.errors = 0
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, store: EmbeddingStore, on_synced: Callable[[str], None] = None):
+        """
+        Builds an EmbeddingStoreSync from EMBEDDING_SYNC_URL / EMBEDDING_SYNC_INTERVAL, or returns None if unset.
+        """
+        url = os.getenv('EMBEDDING_SYNC_URL')
+        if not url:
+            return None
+        return cls(store=store, object_store=object_store_from_url(url), on_synced=on_synced)
+
+    @staticmethod
+    def remote_key(user_directory: str, name: str) -> str:
+        return f'embeddings/{user_directory}/{name}'
+
+    @staticmethod
+    def data_key(user_directory: str, remote_meta: dict, name: str) -> str:
+        # Stores uploaded before uploads had a location keep their files next to meta.json
+        location = remote_meta.get('location')
+        return EmbeddingStoreSync.remote_key(user_directory, f'{location}/{name}' if location else name)
+
+    @staticmethod
+    def synced_state(meta: dict) -> dict:
+        return {'version': meta['version'], 'rows': meta['rows'], 'generation': meta['generation']}
+
+    def _read_remote_meta(self, user_directory: str):
+        raw_meta, token = self.object_store.read_versioned(EmbeddingStoreSync.remote_key(user_directory, 'meta.json'))
+        return (json.loads(raw_meta) if raw_meta is not None else None), token
+
+    def append(self, bsky_username: str, post_hashes, vectors, replace: bool = False) -> int:
+        """
+        Appends embeddings to the local store on top of the user's newest remote rows, and marks the user dirty.
+        If the remote rows cannot be pulled, the rows are appended anyway and merged by the next upload.
+
+        Returns:
+            int: The number of rows appended (see EmbeddingStore.append()).
+        """
+        with self.store.lock(bsky_username) as user_path:
+            try:
+                remote_meta, _ = self._read_remote_meta(os.path.basename(user_path))
+                if self._sync_locked(bsky_username, user_path, remote_meta):
+                    self.pulls += 1
+            except Exception as e:
+                print(f'⚠️ ({bsky_username}) -> Could not pull embeddings before appending, the upload will merge '
+                      f'them: {e}')
+            appended = self.store.append(bsky_username, post_hashes, vectors, replace=replace)
+        if appended > 0:
+            self.mark_dirty(bsky_username)
+        return appended
+
+    def mark_dirty(self, bsky_username: str):
+        with self._lock:
+            self._dirty.add(bsky_username)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='embedding-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Uploads every dirty user now. Users whose upload fails stay dirty and are retried on the next round.
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        for bsky_username in dirty:
+            try:
+                self.push(bsky_username)
+            except Exception as e:
+                self.errors += 1
+                print(f'⚠️ ({bsky_username}) -> Embedding store upload failed, will retry: {e}')
+                self.mark_dirty(bsky_username)
+                continue
+            if self.on_synced is not None:
+                try:
+                    self.on_synced(bsky_username)
+                except Exception as e:
+                    print(f'⚠️ ({bsky_username}) -> Embedding sync callback failed: {e}')
+
+    def push(self, bsky_username: str):
+        """
+        Uploads a user's data files under a fresh location and swaps the remote meta.json to them if nobody else
+        uploaded since this store last synced. Otherwise the unsent rows are rebased onto the newer remote rows and
+        the upload is retried.
+
+        The store lock is only held to snapshot the committed rows and to swap meta.json, not during the upload, so
+        local appends for the user are not blocked by it. Rows appended meanwhile stay unsent until the next upload.
+
+        Raises:
+            RuntimeError: If every attempt lost the race against another writer.
+        """
+        user_directory = os.path.basename(self.store.user_path(bsky_username))
+        for _ in range(self.max_push_attempts):
+            with self.store.lock(bsky_username) as user_path:
+                remote_meta, token = self._read_remote_meta(user_directory)
+                if self._sync_locked(bsky_username, user_path, remote_meta):
+                    self.pulls += 1
+                meta = self.store.read_meta(bsky_username)
+                if meta is None or meta.get('synced', {}).get('version') == meta['version']:
+                    return
+                snapshot = self._snapshot_locked(user_path, meta)
+
+            uploaded_meta = {key: value for key, value in meta.items() if key != 'synced'}
+            uploaded_meta['location'] = uuid.uuid4().hex
+            try:
+                for name, snapshot_path in snapshot.items():
+                    self.object_store.upload(snapshot_path,
+                                             EmbeddingStoreSync.data_key(user_directory, uploaded_meta, name))
+            finally:
+                for snapshot_path in snapshot.values():
+                    os.remove(snapshot_path)
+
+            tmp_path = os.path.join(user_path, f'meta.upload.{os.getpid()}.{threading.get_ident()}.tmp')
+            with open(tmp_path, 'w') as meta_file:
+                json.dump(uploaded_meta, meta_file)
+            try:
+                with self.store.lock(bsky_username):
+                    swapped = self.object_store.upload_if_match(
+                        tmp_path, EmbeddingStoreSync.remote_key(user_directory, 'meta.json'), token)
+                    if swapped:
+                        # The store may have moved on since the snapshot; only the snapshot's rows count as synced
+                        current_meta = self.store.read_meta(bsky_username)
+                        self.store.write_meta(user_path,
+                                              dict(current_meta, synced=EmbeddingStoreSync.synced_state(meta)))
+                        self.uploads += 1
+            finally:
+                os.remove(tmp_path)
+
+            superseded = remote_meta if swapped else uploaded_meta
+            if superseded is not None:
+                for name in EmbeddingStore.file_names(superseded['generation'], superseded['dtype']):
+                    try:
+                        self.object_store.delete(EmbeddingStoreSync.data_key(user_directory, superseded, name))
+                    except Exception as e:
+                        print(f'⚠️ ({bsky_username}) -> Could not delete superseded embedding file {name}: {e}')
+            if swapped:
+                return
+        raise RuntimeError(f'Embedding store of {bsky_username} kept changing remotely, '
+                           f'gave up after {self.max_push_attempts} attempts')
+
+    @staticmethod
+    def _snapshot_locked(user_path: str, meta: dict) -> dict:
+        """
+        Hard-links the data files of `meta` so they can be uploaded after the store lock is released. A pull or
+        compaction replacing the files leaves the linked inodes intact, and appends only write past the committed rows:
+        those bytes may be uploaded too, but readers only map the rows of meta.json and the next append truncates
+        them. The caller holds the store lock.
+
+        Returns:
+            Dict[str, str]: The snapshot path of every data file, by file name.
+        """
+        snapshot = {}
+        try:
+            for name in EmbeddingStore.file_names(meta['generation'], meta['dtype']):
+                snapshot_path = os.path.join(user_path, f'{name}.push.{os.getpid()}.{threading.get_ident()}.tmp')
+                os.link(os.path.join(user_path, name), snapshot_path)
+                snapshot[name] = snapshot_path
+        except Exception:
+            for snapshot_path in snapshot.values():
+                os.remove(snapshot_path)
+            raise
+        return snapshot
+
+    def pull(self, bsky_username: str) -> bool:
+        """
+        Downloads a user's files if the remote meta.json changed since the local store last synced.
+
+        Returns:
+            bool: Whether anything was downloaded.
+        """
+        user_directory = os.path.basename(self.store.user_path(bsky_username))
+        remote_meta, _ = self._read_remote_meta(user_directory)
+        if remote_meta is None:
+            return False
+        local_meta = self.store.read_meta(bsky_username)
+        if local_meta is not None and local_meta.get('synced', {}).get('version') == remote_meta['version']:
+            return False
+
+        with self.store.lock(bsky_username) as user_path:
+            pulled = self._sync_locked(bsky_username, user_path, remote_meta)
+        if pulled:
+            self.pulls += 1
+        return pulled
+
+    def _sync_locked(self, bsky_username: str, user_path: str, remote_meta: Optional[dict]) -> bool:
+        """
+        Replaces the local store with the remote one if it changed since the last sync, re-appending the local rows
+        that were not uploaded yet. The caller holds the store lock.
+
+        Returns:
+            bool: Whether the remote files were downloaded.
+        """
+        local_meta = self.store.read_meta(bsky_username)
+        synced = (local_meta or {}).get('synced')
+        if remote_meta is None or (synced is not None and synced['version'] == remote_meta['version']):
+            return False
+
+        unsent = None
+        if local_meta is not None and local_meta['rows']:
+            stored = self.store.open(bsky_username)
+            if synced is not None and synced['generation'] == local_meta['generation']:
+                rows = np.arange(synced['rows'], len(stored))
+            else:
+                # Compacted (or never synced) since the last sync: offer every post, stored ones are skipped
+                rows = stored.live_rows()
+            if len(rows):
+                unsent = (stored.post_hashes(rows), stored.to_float32(rows))
+
+        user_directory = os.path.basename(user_path)
+        for name in EmbeddingStore.file_names(remote_meta['generation'], remote_meta['dtype']):
+            tmp_path = os.path.join(user_path, f'{name}.download.tmp')
+            self.object_store.download(EmbeddingStoreSync.data_key(user_directory, remote_meta, name), tmp_path)
+            os.replace(tmp_path, os.path.join(user_path, name))
+        meta = {key: value for key, value in remote_meta.items() if key != 'location'}
+        self.store.write_meta(user_path, dict(meta, synced=EmbeddingStoreSync.synced_state(meta)))
+        if local_meta is not None and local_meta['generation'] != remote_meta['generation']:
+            for name in EmbeddingStore.file_names(local_meta['generation'], local_meta['dtype']):
+                try:
+                    os.remove(os.path.join(user_path, name))
+                except FileNotFoundError:
+                    pass
+
+        if unsent is not None:
+            self.store.append(bsky_username, *unsent)
+        return True
+
+    def stats(self):
+        with self._lock:
+            dirty = len(self._dirty)
+        return {'uploads': self.uploads, 'pulls': self.pulls, 'errors': self.errors, 'dirty': dirty}
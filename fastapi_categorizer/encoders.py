@@ -0,0 +1,73 @@
+import os
+from sentence_transformers import SentenceTransformer
+
+"""
+Encoder backends for the Categorizer.
+
+Every backend is exposed through the same SentenceTransformer interface (encode(), tokenizer, max_seq_length), so
+the rest of the Categorizer does not care which one is running:
+    - torch: The default full-precision (fp32) PyTorch model.
+    - onnx: The exported ONNX Runtime graph of the same model.
+    - onnx-int8: A dynamically int8-quantized ONNX Runtime graph, the fastest option on CPU-only workers.
+
+The ONNX backends need the optional `sentence-transformers[onnx]` extra (optimum + onnxruntime).
+"""
+
+TORCH = 'torch'
+ONNX = 'onnx'
+ONNX_INT8 = 'onnx-int8'
+BACKENDS = (TORCH, ONNX, ONNX_INT8)
+
+# all-MiniLM-L6-v2 ships pre-exported graphs on the Hugging Face Hub; avx2 kernels run on every x86-64 CPU we deploy.
+# sentence-transformers quantizes avx2 graphs with QUInt8 weights, hence "quint8" in the file name
+DEFAULT_INT8_FILE = 'onnx/model_quint8_avx2.onnx'
+
+
+def get_backend_from_env() -> str:
+    """
+    Reads the encoder backend from the CATEGORIZER_BACKEND environment variable (default 'torch').
+    """
+    return os.getenv('CATEGORIZER_BACKEND', TORCH).lower()
+
+
+def model_key(model_name: str, backend: str) -> str:
+    """
+    Identifies a model + backend pair. Quantized backends produce slightly different vectors, so anything that caches
+    embeddings must key on this rather than on the model name alone.
+    """
+    return model_name if backend == TORCH else f'{model_name}-{backend}'
+
+
+def load_encoder(model_name: str, backend: str = TORCH, onnx_file: str = None) -> SentenceTransformer:
+    """
+    Loads a sentence embedding model with the requested inference backend.
+
+    Args:
+        model_name (str): Hugging Face model name (e.g. 'all-MiniLM-L6-v2').
+        backend (str): One of 'torch', 'onnx' or 'onnx-int8'.
+        onnx_file (str): ONNX graph to load for the int8 backend (defaults to CATEGORIZER_ONNX_FILE or the avx2 graph).
+
+    Returns:
+        SentenceTransformer: The loaded model.
+
+    Raises:
+        ValueError: If the backend is unknown.
+        ImportError: If an ONNX backend is requested without onnxruntime/optimum installed.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown categorizer backend {backend!r}; expected one of {BACKENDS}')
+
+    if backend == TORCH:
+        return SentenceTransformer(model_name)
+
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print(f'🚨 The {backend} backend requires `pip install sentence-transformers[onnx]`')
+        raise
+
+    if backend == ONNX:
+        return SentenceTransformer(model_name, backend='onnx')
+
+    onnx_file = onnx_file or os.getenv('CATEGORIZER_ONNX_FILE', DEFAULT_INT8_FILE)
+    return SentenceTransformer(model_name, backend='onnx', model_kwargs={'file_name': onnx_file})
@@ -0,0 +1,95 @@
+import os
+from typing import Any, Dict, List, Optional
+from celery import chord
+from celery.result import GroupResult
+from fastapi_categorizer.celery_worker import (categorize_texts_task, categorize_claim_check_task, merge_shard_results,
+                                               celery_app, redis_client)
+from fastapi_categorizer import claim_check
+
+"""
+Fan-out of large timelines into parallel Celery subtasks.
+
+A timeline larger than SHARD_SIZE posts is split into shards that are dispatched as a Celery chord: every shard is an
+independent categorization task (so shards of different users interleave on the workers instead of one heavy user
+blocking everyone else) and a `merge_shard_results` callback aggregates the per-shard write counts. The chord's
+callback id is what the caller polls; the id of the shard group is stored next to it so shard-level progress can be
+reported. Posts are deduplicated by their BSKY_POSTS key (the stable hash of the text) before sharding, so the same
+post is never classified by two shards at once.
+"""
+
+SHARD_SIZE = int(os.getenv("CATEGORIZE_SHARD_SIZE", "500"))
+CLAIM_CHECK_ENABLED = os.getenv("CLAIM_CHECK_ENABLED", "true").lower() == "true"
+SHARD_GROUP_PREFIX = 'shards'
+
+
+def _shard_signature(posts: List[Dict], bsky_username: str):
+    if CLAIM_CHECK_ENABLED:
+        # Stage the posts once and only send the claim-check key through the broker
+        claim_key = claim_check.stage_posts(redis_client, posts)
+        return categorize_claim_check_task.s(claim_key, bsky_username)
+    return categorize_texts_task.s(posts, bsky_username)
+
+
+def dispatch_categorization(posts: List[Dict], bsky_username: str, shard_size: int = SHARD_SIZE) -> Dict[str, Any]:
+    """
+    Dispatches a timeline for categorization, fanning it out into shards if it is larger than `shard_size`. Posts with
+    the same text share a BSKY_POSTS key, so only the last of them is dispatched.
+
+    Args:
+        posts (List[Dict]): Bluesky posts to categorize.
+        bsky_username (str): The Bluesky username that owns the posts.
+        shard_size (int): Maximum number of posts per Celery subtask.
+
+    Returns:
+        dict: The id of the task to poll and the number of shards it was split into.
+    """
+    from terpsearch.dynamodb.dynamodb_helpers import stable_hash
+
+    unique_posts = {}
+    for post in posts:
+        unique_posts[stable_hash(input=post['text'])] = post
+    posts = list(unique_posts.values())
+
+    shards = [posts[i:i + shard_size] for i in range(0, len(posts), shard_size)]
+    if len(shards) == 1:
+        task = _shard_signature(shards[0], bsky_username).delay()
+        return {"task_id": task.id, "shards": 1}
+
+    header = [_shard_signature(shard, bsky_username) for shard in shards]
+    result = chord(header)(merge_shard_results.s(bsky_username))
+
+    # Persist the shard group so /status/{task_id} can report per-shard progress
+    result.parent.save()
+    redis_client.set(f'{SHARD_GROUP_PREFIX}:{result.id}', result.parent.id, ex=celery_app.conf.result_expires)
+    print(f"🔀 ({bsky_username}) -> fanned out {len(posts)} posts into {len(shards)} shards")
+    return {"task_id": result.id, "shards": len(shards)}
+
+
+def get_shard_progress(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Reports how many shards of a fanned-out categorization have finished.
+
+    Args:
+        task_id (str): The id returned by dispatch_categorization().
+
+    Returns:
+        dict or None: Total/completed/failed shard counts and the completion percentage, or None if the task was not
+            fanned out.
+    """
+    group_id = redis_client.get(f'{SHARD_GROUP_PREFIX}:{task_id}')
+    if group_id is None:
+        return None
+
+    group_result = GroupResult.restore(group_id.decode(), app=celery_app)
+    if group_result is None:
+        return None
+
+    total = len(group_result.results)
+    done = sum(1 for result in group_result.results if result.ready())
+    failed = sum(1 for result in group_result.results if result.failed())
+    return {
+        'shards_total': total,
+        'shards_done': done,
+        'shards_failed': failed,
+        'percent_complete': round(100 * done / total, 1) if total else 100.0
+    }
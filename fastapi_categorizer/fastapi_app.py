@@ -1,16 +1,61 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, AnyStr
-from fastapi_categorizer.celery_worker import categorize_texts_task, celery_app
+from fastapi_categorizer.celery_worker import (categorizer_status_task, celery_app, redis_client, embedding_store,
+                                               embedding_sync)
+from fastapi_categorizer.fan_out import dispatch_categorization, get_shard_progress
+from fastapi_categorizer.micro_batcher import MicroBatcher
+from fastapi_categorizer.model_manager import model_manager
+from fastapi_categorizer.semantic_search import SemanticSearch, store_loader
 
 app = FastAPI()
 
+SYNC_MAX_POSTS = int(os.getenv("SYNC_MAX_POSTS", "100"))
+SEARCH_MAX_K = int(os.getenv("SEARCH_MAX_K", "50"))
+sync_batcher = MicroBatcher(process_fn=lambda texts: model_manager.get_categorizer().score_texts(texts),
+                            max_batch_size=int(os.getenv("SYNC_MAX_BATCH_SIZE", "64")),
+                            max_wait_ms=float(os.getenv("SYNC_MAX_WAIT_MS", "10")),
+                            warm_up_fn=model_manager.warm_up)
+# The Celery workers write the embeddings: search needs their directory (a shared volume) or a sync target to pull from
+EMBEDDING_STORE_SHARED = os.getenv("EMBEDDING_STORE_SHARED", "false").lower() == "true"
+SEARCH_STORE_ERROR = None if embedding_sync is not None or EMBEDDING_STORE_SHARED else (
+    "Semantic search has no embedding store: set EMBEDDING_SYNC_URL, or EMBEDDING_STORE_SHARED=true when "
+    "EMBEDDING_STORE_DIR is shared with the Celery workers.")
+if SEARCH_STORE_ERROR:
+    print(f"🚨 {SEARCH_STORE_ERROR}")
+# Only pulls from the sync target here; uploads are done by the Celery workers
+semantic_search = SemanticSearch(encode_fn=lambda texts: model_manager.get_categorizer().encode_texts(texts),
+                                 load_fn=store_loader(embedding_store, embedding_sync), redis_client=redis_client)
+
 
 class TextsRequest(BaseModel):
     bsky_posts: List[Dict]
     bsky_username: AnyStr
 
 
+class SyncTextsRequest(BaseModel):
+    texts: List[str]
+
+
+class SearchRequest(BaseModel):
+    bsky_username: str
+    query: str
+    k: int = 10
+
+
+@app.on_event("startup")
+def start_sync_batcher():
+    if os.getenv("SYNC_CATEGORIZER_ENABLED", "true").lower() == "true":
+        sync_batcher.start()
+
+
+@app.on_event("shutdown")
+def stop_sync_batcher():
+    sync_batcher.stop()
+
+
 @app.post("/categorize/")
 def categorize(payload: TextsRequest):
     print(f"🚀 Received {payload.bsky_username} payload of {len(payload.bsky_posts)} items")
@@ -21,18 +66,79 @@ def categorize(payload: TextsRequest):
     if not texts:
         return {"task_id": None, "error": "No valid texts provided."}
 
-    task = categorize_texts_task.delay(payload.bsky_posts, payload.bsky_username)
-    return {"task_id": task.id}
+    return dispatch_categorization(payload.bsky_posts, payload.bsky_username)
+
+
+@app.post("/categorize/sync")
+async def categorize_sync(payload: SyncTextsRequest):
+    """
+    Categorizes a handful of texts inline using the model resident in this process. Concurrent requests are
+    coalesced into micro-batches on the inference thread.
+    """
+    texts = [text.strip() for text in payload.texts]
+    if len(texts) > SYNC_MAX_POSTS:
+        raise HTTPException(status_code=413, detail=f"At most {SYNC_MAX_POSTS} texts per synchronous request.")
+    if not sync_batcher.is_running():
+        raise HTTPException(status_code=503, detail="Synchronous categorization is disabled.")
+
+    valid_idx = [i for i, text in enumerate(texts) if text]
+    results = [{"text": text, "category": ["unclassified"], "score": None} for text in texts]
+    if valid_idx:
+        scored = await asyncio.wrap_future(sync_batcher.submit([texts[i] for i in valid_idx]))
+        for i, result in zip(valid_idx, scored):
+            results[i].update(result)
+    return {"results": results}
+
+
+@app.get("/categorize/sync/metrics")
+def categorize_sync_metrics():
+    return {"batcher": sync_batcher.metrics(), "model": model_manager.status()}
+
+
+@app.post("/search")
+def search_posts(payload: SearchRequest):
+    """
+    Returns the user's stored posts closest in meaning to the query, with their cosine similarity scores.
+    """
+    query = payload.query.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="The query is empty.")
+    if not 1 <= payload.k <= SEARCH_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {SEARCH_MAX_K}.")
+    if SEARCH_STORE_ERROR:
+        raise HTTPException(status_code=503, detail=SEARCH_STORE_ERROR)
+    return semantic_search.search(bsky_username=payload.bsky_username, query=query, k=payload.k)
+
+
+@app.get("/search/metrics")
+def search_metrics():
+    return semantic_search.stats()
 
 
 @app.get("/status/{task_id}")
 def get_status(task_id: str):
     task = celery_app.AsyncResult(task_id)
     if task.state == "PENDING":
-        return {"status": "pending"}
+        status = {"status": "pending"}
     elif task.state == "SUCCESS":
-        return {"status": "success", "result": task.result}
+        status = {"status": "success", "result": task.result}
     elif task.state == "FAILURE":
-        return {"status": "failed", "error": str(task.result)}
+        status = {"status": "failed", "error": str(task.result)}
     else:
-        return {"status": task.state}
+        status = {"status": task.state}
+
+    progress = get_shard_progress(task_id)
+    if progress is not None:
+        status["progress"] = progress
+    return status
+
+
+@app.get("/categorizer/status")
+def get_categorizer_status():
+    """
+    Reports the warm-up/readiness state of the categorizer in whichever Celery worker process picks up the probe.
+    """
+    try:
+        return categorizer_status_task.delay().get(timeout=5)
+    except Exception as e:
+        return {"state": "unreachable", "ready": False, "error": str(e)}
@@ -0,0 +1,92 @@
+import re
+from bisect import bisect_right
+from collections import Counter
+from typing import Dict, List
+
+
+class KeywordMatcher:
+    """
+    Matches every category's keywords against a text in a single pass.
+
+    All keywords are compiled once into one case-insensitive alternation regex. Keywords are ordered longest first so
+    that multi-word phrases ("climate change") win over their prefixes ("climate"), and each keyword is wrapped in
+    word-boundary lookarounds so "app" no longer matches "happy". Lookarounds are used instead of \\b so that keywords
+    which start or end with a non-word character (emoji, "s&p") still match.
+    """
+
+    def __init__(self, keyword_map: Dict[str, List[str]]):
+        """
+        Compiles the keyword regex.
+
+        Args:
+            keyword_map (Dict[str, List[str]]): Category -> keywords, in category priority order.
+        """
+        self.categories = list(keyword_map.keys())
+        self.keyword_categories: Dict[str, List[str]] = {}
+        for category, keywords in keyword_map.items():
+            for keyword in keywords:
+                categories = self.keyword_categories.setdefault(keyword.lower(), [])
+                if category not in categories:
+                    categories.append(category)
+
+        alternation = '|'.join(re.escape(keyword) for keyword in sorted(self.keyword_categories, key=len, reverse=True))
+        self.pattern = re.compile(rf'(?<!\w)(?:{alternation})(?!\w)', re.IGNORECASE)
+
+    def match(self, text: str) -> Dict[str, int]:
+        """
+        Finds every category hit in a text.
+
+        Args:
+            text (str): The text to scan.
+
+        Returns:
+            Dict[str, int]: Category -> number of keyword hits. Categories without hits are omitted.
+        """
+        counts = Counter()
+        for found in self.pattern.finditer(text):
+            for category in self.keyword_categories[found.group(0).lower()]:
+                counts[category] += 1
+        return dict(counts)
+
+    def batch_match(self, texts: List[str]) -> List[Dict[str, int]]:
+        """
+        Finds the category hits of many texts with a single regex pass over all of them.
+
+        The texts are joined with newlines (which no keyword contains and which act as word boundaries) and each match
+        is mapped back to its text by offset.
+
+        Args:
+            texts (List[str]): The texts to scan.
+
+        Returns:
+            List[Dict[str, int]]: Category -> hit count for each text, in the same order as `texts`.
+        """
+        results = [Counter() for _ in texts]
+        if not texts:
+            return []
+
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + 1
+
+        for found in self.pattern.finditer('\n'.join(texts)):
+            text_idx = bisect_right(starts, found.start()) - 1
+            for category in self.keyword_categories[found.group(0).lower()]:
+                results[text_idx][category] += 1
+        return [dict(counts) for counts in results]
+
+    def best_category(self, counts: Dict[str, int]) -> List[str]:
+        """
+        Picks the category with the most keyword hits, breaking ties by category priority order.
+
+        Args:
+            counts (Dict[str, int]): The output of match() for one text.
+
+        Returns:
+            List[str]: A single-element list with the winning category, or [] if nothing matched.
+        """
+        if not counts:
+            return []
+        return [max(self.categories, key=lambda category: (counts.get(category, 0), -self.categories.index(category)))]
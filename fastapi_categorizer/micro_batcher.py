@@ -0,0 +1,193 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent categorization requests into micro-batches that run on a single dedicated inference thread.
+
+    Each request is a list of texts. The inference thread blocks until a request arrives, then keeps collecting
+    requests until either `max_batch_size` texts have been gathered or `max_wait_ms` has passed since the first one,
+    runs `process_fn` once over every gathered text and resolves each request's Future with its own slice of the
+    results. A request that would push the batch past `max_batch_size` is carried over to start the next batch, and
+    requests larger than `max_batch_size` run as a batch of their own.
+
+    Futures cancelled before their batch starts (e.g. the HTTP client went away) are skipped. Requests still queued
+    when the batcher stops fail with a RuntimeError.
+    """
+
+    HISTOGRAM_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+    def __init__(self, process_fn: Callable[[List[str]], List[Any]], max_batch_size: int = 64, max_wait_ms: float = 10,
+                 warm_up_fn: Callable[[], Any] = None):
+        """
+        Initializes a MicroBatcher. Call start() to launch the inference thread.
+
+        Args:
+            process_fn (Callable): Function mapping a list of texts to a list of results of the same length.
+            max_batch_size (int): Maximum number of texts per micro-batch.
+            max_wait_ms (float): Maximum time to hold the first request of a batch while waiting for more.
+            warm_up_fn (Callable): Optional function run on the inference thread before it starts serving.
+        """
+        self.process_fn = process_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.warm_up_fn = warm_up_fn
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.max_queue_depth = 0
+        self.batch_size_histogram = {bucket: 0 for bucket in MicroBatcher.HISTOGRAM_BUCKETS}
+        self.batch_size_histogram['+Inf'] = 0
+        self.total_inference_seconds = 0.0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='categorizer-inference', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stopped.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._fail_queued()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Queues a request for the next micro-batch.
+
+        Args:
+            texts (List[str]): Texts to process.
+
+        Returns:
+            Future: Resolves to the list of results for `texts`.
+        """
+        future = Future()
+        self._queue.put((texts, future))
+        with self._metrics_lock:
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def _run(self):
+        if self.warm_up_fn is not None:
+            try:
+                self.warm_up_fn()
+            except Exception as e:
+                print(f'🚨 Inference thread warm-up failed, will retry on first request: {e}')
+
+        carried = None
+        while not self._stopped.is_set():
+            if carried is not None:
+                first, carried = carried, None
+            else:
+                first = self._queue.get()
+                if first is None:
+                    break
+                if not first[1].set_running_or_notify_cancel():
+                    continue
+
+            batch = [first]
+            batch_texts = len(first[0])
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while batch_texts < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._stopped.set()
+                    break
+                if not request[1].set_running_or_notify_cancel():
+                    continue
+                if batch_texts + len(request[0]) > self.max_batch_size:
+                    carried = request
+                    break
+                batch.append(request)
+                batch_texts += len(request[0])
+
+            try:
+                self._process(batch)
+            except Exception as e:
+                print(f'🚨 Micro-batch of {len(batch)} requests failed: {e}')
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+        if carried is not None:
+            carried[1].set_exception(RuntimeError('MicroBatcher stopped'))
+        self._fail_queued()
+
+    def _fail_queued(self):
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None and request[1].set_running_or_notify_cancel():
+                request[1].set_exception(RuntimeError('MicroBatcher stopped'))
+
+    def _process(self, batch):
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        start_time = time.perf_counter()
+        try:
+            results = self.process_fn(texts)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start_time
+
+        offset = 0
+        for request_texts, future in batch:
+            future.set_result(results[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+        self._record(requests=len(batch), batch_size=len(texts), elapsed=elapsed)
+
+    def _record(self, requests: int, batch_size: int, elapsed: float):
+        with self._metrics_lock:
+            self.batches += 1
+            self.requests += requests
+            self.texts += batch_size
+            self.total_inference_seconds += elapsed
+            bucket = next((b for b in MicroBatcher.HISTOGRAM_BUCKETS if batch_size <= b), '+Inf')
+            self.batch_size_histogram[bucket] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Returns the queue depth and batch-size histogram of the batcher.
+
+        Returns:
+            dict: Current/max queue depth, batch counts, average batch size and the batch-size histogram
+                (upper bound -> number of batches).
+        """
+        with self._metrics_lock:
+            return {
+                'running': self.is_running(),
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'batches': self.batches,
+                'requests': self.requests,
+                'texts': self.texts,
+                'avg_batch_size': self.texts / self.batches if self.batches else 0.0,
+                'avg_inference_ms': 1000 * self.total_inference_seconds / self.batches if self.batches else 0.0,
+                'batch_size_histogram': {str(k): v for k, v in self.batch_size_histogram.items()}
+            }
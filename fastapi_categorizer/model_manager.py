@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class ModelManager:
+    """
+    Owns the lifecycle of the Categorizer within a single worker process.
+
+    Loading all-MiniLM-L6-v2 and encoding the CATEGORY_DESCRIPTIONS takes several seconds, so the manager loads the
+    Categorizer once (ideally when the worker process boots) and hands the same warm instance to every task that runs
+    in that process afterwards.
+
+    Readiness states:
+    - cold: Nothing has been loaded yet.
+    - loading: The model and category embeddings are currently being loaded.
+    - ready: The Categorizer is warm and can serve tasks.
+    - failed: The last load attempt raised an exception (see `last_error`).
+    """
+
+    COLD = 'cold'
+    LOADING = 'loading'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, threshold: float = 0.18):
+        """
+        Initializes an empty (cold) ModelManager.
+
+        Args:
+            threshold (float): Confidence threshold forwarded to the Categorizer.
+        """
+        self.threshold = threshold
+        self.state = ModelManager.COLD
+        self.last_error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.tasks_served = 0
+        self._categorizer = None
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """
+        Loads the Categorizer (model + category embeddings) if it has not been loaded yet.
+
+        Safe to call from several threads; only the first caller performs the load.
+
+        Returns:
+            Categorizer: The warm Categorizer instance.
+        """
+        if self._categorizer is not None:
+            return self._categorizer
+
+        with self._lock:
+            if self._categorizer is not None:
+                return self._categorizer
+
+            from fastapi_categorizer.categorizer import Categorizer
+            from fastapi_categorizer.embedding_cache import EmbeddingCache
+            from fastapi_categorizer import encoders
+
+            self.state = ModelManager.LOADING
+            start_time = time.time()
+            try:
+                backend = encoders.get_backend_from_env()
+                cache_key = encoders.model_key(Categorizer.MODEL_NAME, backend=backend)
+                categorizer = Categorizer(threshold=self.threshold,
+                                          embedding_cache=EmbeddingCache.from_env(model_name=cache_key),
+                                          backend=backend,
+                                          chunk_size=int(os.getenv('CATEGORIZER_CHUNK_SIZE', '256')))
+            except Exception as e:
+                self.state = ModelManager.FAILED
+                self.last_error = str(e)
+                print(f'🚨 Failed to warm up categorizer in pid={os.getpid()}: {e}')
+                raise
+
+            self.load_seconds = time.time() - start_time
+            self.loaded_at = time.time()
+            self.last_error = None
+            self._categorizer = categorizer
+            self.state = ModelManager.READY
+            print(f'🔥 Categorizer warmed up in pid={os.getpid()} ({self.load_seconds:.2f}s)')
+            return self._categorizer
+
+    def get_categorizer(self):
+        """
+        Returns the warm Categorizer, loading it on first use if the worker boot hook did not run
+        (e.g. when Celery is started with the solo or threads pool).
+
+        Returns:
+            Categorizer: The warm Categorizer instance.
+        """
+        categorizer = self.warm_up()
+        self.tasks_served += 1
+        return categorizer
+
+    def is_ready(self) -> bool:
+        return self.state == ModelManager.READY
+
+    def reset(self):
+        """
+        Drops the loaded Categorizer so that the next call to get_categorizer() reloads it.
+        """
+        with self._lock:
+            self._categorizer = None
+            self.state = ModelManager.COLD
+            self.load_seconds = None
+            self.loaded_at = None
+            self.tasks_served = 0
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Summarizes the readiness/warm-up state of this worker process.
+
+        Returns:
+            dict: The pid, state, load time, uptime, number of tasks served and embedding cache counters of this
+                process.
+        """
+        uptime: Optional[float] = time.time() - self.loaded_at if self.loaded_at else None
+        cache = self._categorizer.embedding_cache if self._categorizer is not None else None
+        return {
+            'pid': os.getpid(),
+            'state': self.state,
+            'ready': self.is_ready(),
+            'backend': self._categorizer.backend if self._categorizer is not None else None,
+            'load_seconds': self.load_seconds,
+            'uptime_seconds': uptime,
+            'tasks_served': self.tasks_served,
+            'last_error': self.last_error,
+            'embedding_cache': cache.stats() if cache is not None else None
+        }
+
+
+# One manager per worker process
+model_manager = ModelManager()
@@ -0,0 +1,230 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+from fastapi_categorizer.embedding_store import EmbeddingStore
+from fastapi_categorizer.embedding_sync import EmbeddingStoreSync
+from fastapi_categorizer.vector_index import build_index, SEARCH_EXACT_MAX_POSTS
+
+"""
+Semantic search over a user's stored posts.
+
+The Celery worker appends every post's MiniLM embedding to the user's EmbeddingStore at categorization time. The first
+query for a user memory-maps those rows and builds a vector index (see vector_index.py), which is kept in an
+in-process LRU so later queries only embed the query text once and scan the index. Post details (text, author, ...)
+are read from BSKY_POSTS for the hits only, and cached with the index.
+
+Freshness: the Celery worker bumps the user's search generation (`search:gen:{user}` in Redis) once new embeddings are
+available (written locally, or uploaded when the store is synced to object storage). A cached index built at an older
+generation is rebuilt on the next query, pulling the user's newer files first when a sync target is configured. When
+Redis is unavailable, cached indexes are reused for at most SEARCH_INDEX_MAX_AGE seconds.
+"""
+
+SEARCH_GENERATION_PREFIX = 'search:gen'
+SEARCH_INDEX_CACHE_SIZE = int(os.getenv('SEARCH_INDEX_CACHE_SIZE', '64'))
+SEARCH_INDEX_MAX_AGE = float(os.getenv('SEARCH_INDEX_MAX_AGE', '300'))
+SEARCH_RESULT_ATTRIBUTES = ('bskyPostHash', 'text', 'author', 'handle', 'timestamp', 'category')
+
+
+def store_loader(store: EmbeddingStore, sync: EmbeddingStoreSync = None):
+    """
+    Returns a load function reading a user's newest embedding rows from an EmbeddingStore, after pulling newer files
+    from object storage when a sync target is given.
+    """
+    def load(bsky_username: str):
+        if sync is not None:
+            try:
+                sync.pull(bsky_username)
+            except Exception as e:
+                print(f'⚠️ ({bsky_username}) -> Could not pull embeddings, using the local copy: {e}')
+        stored = store.open(bsky_username)
+        rows = stored.live_rows()
+        return stored.post_hashes(rows), stored.to_float32(rows)
+    return load
+
+
+def fetch_from_dynamodb(bsky_username: str, post_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Reads the details of specific posts of a user from BSKY_POSTS.
+    """
+    from terpsearch.dynamodb.TerpSearchDb import TerpSearchDb
+    from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+
+    bsky_dynamodb = TerpSearchDb(db_mode=DynamoDbConstants.DB_MODE)
+    items = bsky_dynamodb.batch_get_posts(user=bsky_username, post_hashes=post_hashes,
+                                          table_name=DynamoDbConstants.BSKY_POSTS_TABLE_NAME,
+                                          attributes=SEARCH_RESULT_ATTRIBUTES)
+    return {item['bskyPostHash']: item for item in items}
+
+
+class UserIndex:
+    def __init__(self, post_hashes: List[str], index, generation, build_seconds: float):
+        self.post_hashes = post_hashes
+        self.index = index
+        self.generation = generation
+        self.build_seconds = build_seconds
+        self.built_at = time.monotonic()
+        # Details of posts already returned as hits, keyed by bskyPostHash
+        self.posts = {}
+
+
+class SemanticSearch:
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 load_fn: Callable[[str], Tuple[List[str], np.ndarray]],
+                 fetch_fn: Callable[[str, List[str]], Dict[str, Dict]] = fetch_from_dynamodb, redis_client=None,
+                 max_users: int = SEARCH_INDEX_CACHE_SIZE, exact_max_posts: int = SEARCH_EXACT_MAX_POSTS,
+                 max_age: float = SEARCH_INDEX_MAX_AGE):
+        """
+        Initializes a SemanticSearch.
+
+        Args:
+            encode_fn (Callable): Encodes texts into normalized embeddings (Categorizer.encode_texts).
+            load_fn (Callable): Returns a user's post hashes and their (n, dim) embeddings (see store_loader()).
+            fetch_fn (Callable): Returns the details of a user's posts by bskyPostHash.
+            redis_client (redis.Redis): Holds the per-user search generations.
+            max_users (int): Maximum number of user indexes kept in memory.
+            exact_max_posts (int): Largest index searched exactly; bigger ones use an IVF index.
+            max_age (float): Seconds a cached index is trusted when its generation cannot be checked.
+        """
+        self.encode_fn = encode_fn
+        self.load_fn = load_fn
+        self.fetch_fn = fetch_fn
+        self.redis_client = redis_client
+        self.max_users = max_users
+        self.exact_max_posts = exact_max_posts
+        self.max_age = max_age
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self.builds = 0
+        self.hits = 0
+
+    @staticmethod
+    def generation_key(bsky_username: str) -> str:
+        return f'{SEARCH_GENERATION_PREFIX}:{bsky_username.strip().lower()}'
+
+    @staticmethod
+    def bump_generation(redis_client, bsky_username: str) -> int:
+        """
+        Marks every cached index of a user as stale, in every process.
+        """
+        return redis_client.incr(SemanticSearch.generation_key(bsky_username))
+
+    def _generation(self, bsky_username: str):
+        if self.redis_client is None:
+            return None
+        try:
+            return int(self.redis_client.get(SemanticSearch.generation_key(bsky_username)) or 0)
+        except Exception as e:
+            print(f'⚠️ Search generation unavailable: {e}')
+            return None
+
+    def _is_fresh(self, user_index: UserIndex, generation) -> bool:
+        if generation is None:
+            return time.monotonic() - user_index.built_at < self.max_age
+        return user_index.generation == generation
+
+    def index_for(self, bsky_username: str) -> UserIndex:
+        """
+        Returns a user's index, building it if it is missing or stale. Concurrent queries of the same user wait for a
+        single build.
+        """
+        generation = self._generation(bsky_username)
+        with self._lock:
+            user_index = self._indexes.get(bsky_username)
+            if user_index is not None and self._is_fresh(user_index, generation):
+                self._indexes.move_to_end(bsky_username)
+                self.hits += 1
+                return user_index
+            build_lock = self._build_locks.setdefault(bsky_username, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                user_index = self._indexes.get(bsky_username)
+                if user_index is not None and self._is_fresh(user_index, generation):
+                    self.hits += 1
+                    return user_index
+
+            start_time = time.perf_counter()
+            post_hashes, vectors = self.load_fn(bsky_username)
+            index = build_index(vectors, exact_max_rows=self.exact_max_posts) if len(post_hashes) else None
+            user_index = UserIndex(post_hashes=post_hashes, index=index, generation=generation,
+                                   build_seconds=time.perf_counter() - start_time)
+            print(f'🔎 ({bsky_username}) -> Built {index.KIND if index else "empty"} search index over '
+                  f'{len(post_hashes)} posts in {user_index.build_seconds:.3f}s')
+
+            with self._lock:
+                self.builds += 1
+                self._indexes[bsky_username] = user_index
+                self._indexes.move_to_end(bsky_username)
+                while len(self._indexes) > self.max_users:
+                    evicted, _ = self._indexes.popitem(last=False)
+                    self._build_locks.pop(evicted, None)
+            return user_index
+
+    def search(self, bsky_username: str, query: str, k: int = 10) -> Dict[str, Any]:
+        """
+        Finds a user's stored posts closest in meaning to a query.
+
+        Args:
+            bsky_username (str): The Bluesky username whose posts are searched.
+            query (str): Free-text query; it is embedded once.
+            k (int): Number of posts to return.
+
+        Returns:
+            dict: 'results' (posts with a cosine 'score', best first), 'index' ('exact', 'ivf' or None), 'indexed_posts'
+                and 'timings_ms' (index lookup or build, query embedding, search and post details).
+        """
+        start_time = time.perf_counter()
+        user_index = self.index_for(bsky_username)
+        index_time = time.perf_counter()
+
+        results = []
+        fetch_time = None
+        if user_index.index is not None:
+            query_vector = np.asarray(self.encode_fn([query])[0], dtype=np.float32)
+            encode_time = time.perf_counter()
+            # A few extra candidates make up for embeddings whose post is missing from BSKY_POSTS
+            rows, scores = user_index.index.search(query_vector, k + max(k // 2, 5))
+            search_time = time.perf_counter()
+
+            hits = [(user_index.post_hashes[row], float(score)) for row, score in zip(rows, scores)]
+            missing = [post_hash for post_hash, _ in hits if post_hash not in user_index.posts]
+            if missing:
+                user_index.posts.update(self.fetch_fn(bsky_username, missing))
+            for post_hash, score in hits:
+                post = user_index.posts.get(post_hash)
+                if post is not None:
+                    results.append(dict(post, score=round(score, 4)))
+                    if len(results) == k:
+                        break
+            fetch_time = time.perf_counter()
+        else:
+            encode_time = search_time = index_time
+        end_time = fetch_time or search_time
+
+        return {
+            'bsky_username': bsky_username,
+            'query': query,
+            'results': results,
+            'index': user_index.index.KIND if user_index.index is not None else None,
+            'indexed_posts': len(user_index.post_hashes),
+            'timings_ms': {
+                'index': round((index_time - start_time) * 1000, 3),
+                'embed': round((encode_time - index_time) * 1000, 3),
+                'search': round((search_time - encode_time) * 1000, 3),
+                'fetch': round((end_time - search_time) * 1000, 3)
+            }
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'users': len(self._indexes),
+                'max_users': self.max_users,
+                'builds': self.builds,
+                'hits': self.hits,
+                'indexed_posts': sum(len(user_index.post_hashes) for user_index in self._indexes.values())
+            }
@@ -0,0 +1,139 @@
+import math
+import os
+import numpy as np
+
+"""
+Per-user vector indexes over normalized post embeddings (cosine similarity == dot product).
+
+- ExactIndex: one matrix-vector product over every row. Exact, and only a few milliseconds for the timeline sizes
+  most users have.
+- IVFIndex: an inverted-file index. A spherical k-means coarse quantizer splits the rows into `n_lists` clusters, rows
+  are stored grouped by cluster, and a query only scores the rows of the `n_probe` clusters whose centroids are
+  closest to it. Approximate: recall against ExactIndex is measured by benchmarks/semantic_search.py.
+
+build_index() picks ExactIndex up to SEARCH_EXACT_MAX_POSTS rows and IVFIndex above that.
+"""
+
+SEARCH_EXACT_MAX_POSTS = int(os.getenv('SEARCH_EXACT_MAX_POSTS', '50000'))
+SEARCH_IVF_NPROBE = int(os.getenv('SEARCH_IVF_NPROBE', '0'))
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the indices of the k largest scores, best first.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class ExactIndex:
+    KIND = 'exact'
+
+    def __init__(self, vectors: np.ndarray):
+        """
+        Initializes an ExactIndex.
+
+        Args:
+            vectors (np.ndarray): A (n, dim) array of normalized embeddings.
+        """
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, query: np.ndarray, k: int):
+        """
+        Finds the rows most similar to a normalized query vector.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Row numbers and their scores, best first.
+        """
+        scores = self.vectors @ np.asarray(query, dtype=np.float32)
+        rows = top_k(scores, k)
+        return rows, scores[rows]
+
+
+class IVFIndex:
+    KIND = 'ivf'
+
+    def __init__(self, vectors: np.ndarray, n_lists: int = None, n_probe: int = None, iterations: int = 8,
+                 train_per_list: int = 64, seed: int = 0):
+        """
+        Trains the coarse quantizer and groups the rows by cluster.
+
+        Args:
+            vectors (np.ndarray): A (n, dim) array of normalized embeddings.
+            n_lists (int): Number of clusters (defaults to about sqrt(n)).
+            n_probe (int): Clusters scanned per query (defaults to SEARCH_IVF_NPROBE, or n_lists / 16 if unset).
+            iterations (int): k-means iterations.
+            train_per_list (int): The quantizer is trained on a sample of up to this many rows per cluster.
+            seed (int): Random seed of the training sample and the initial centroids.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n_rows = len(vectors)
+        self.n_lists = max(1, min(n_rows, n_lists or int(round(math.sqrt(n_rows)))))
+        self.n_probe = max(1, min(self.n_lists, n_probe or SEARCH_IVF_NPROBE or -(-self.n_lists // 16)))
+
+        rng = np.random.default_rng(seed)
+        train = vectors[rng.choice(n_rows, size=min(train_per_list * self.n_lists, n_rows), replace=False)]
+        self.centroids = IVFIndex._train(train, self.n_lists, iterations, rng)
+
+        assignments = self._assign(vectors)
+        order = np.argsort(assignments, kind='stable')
+        # Rows of cluster c are self.vectors[self.offsets[c]:self.offsets[c + 1]]; self.rows maps them back
+        self.rows = order
+        self.vectors = np.ascontiguousarray(vectors[order])
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=self.n_lists))])
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @staticmethod
+    def _train(train: np.ndarray, n_lists: int, iterations: int, rng) -> np.ndarray:
+        # Spherical k-means: assign by largest dot product, re-center on the normalized mean
+        centroids = train[rng.choice(len(train), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(train @ centroids.T, axis=1)
+            order = np.argsort(assignments, kind='stable')
+            clusters, starts = np.unique(assignments[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[clusters] = np.add.reduceat(train[order], starts, axis=0)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        return centroids.astype(np.float32)
+
+    def _assign(self, vectors: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        assignments = [np.argmax(vectors[start:start + batch_size] @ self.centroids.T, axis=1)
+                       for start in range(0, len(vectors), batch_size)]
+        return np.concatenate(assignments) if assignments else np.array([], dtype=np.int64)
+
+    def search(self, query: np.ndarray, k: int, n_probe: int = None):
+        """
+        Finds the rows most similar to a normalized query vector among the rows of the closest clusters.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Row numbers and their scores, best first.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        probed = top_k(self.centroids @ query, n_probe or self.n_probe)
+        slices = [slice(self.offsets[c], self.offsets[c + 1]) for c in probed]
+        candidates = np.concatenate([np.arange(s.start, s.stop) for s in slices])
+        scores = np.concatenate([self.vectors[s] @ query for s in slices])
+        best = top_k(scores, k)
+        return self.rows[candidates[best]], scores[best]
+
+
+def build_index(vectors: np.ndarray, exact_max_rows: int = SEARCH_EXACT_MAX_POSTS):
+    """
+    Builds an ExactIndex for up to `exact_max_rows` rows and an IVFIndex above that.
+    """
+    if len(vectors) <= exact_max_rows:
+        return ExactIndex(vectors)
+    return IVFIndex(vectors)
@@ -4,6 +4,8 @@ import os
 class DynamoDbConstants:
     BSKY_POSTS_TABLE_NAME = 'BSKY_POSTS'
     BSKY_USERS_TABLE_NAME = 'BSKY_USERS'
+    BSKY_CATEGORY_ROLLUPS_TABLE_NAME = 'BSKY_CATEGORY_ROLLUPS'
+    BSKY_POST_TERMS_TABLE_NAME = 'BSKY_POST_TERMS'
     TERPSEARCH_LOGIN_TABLE_NAME = 'LOGIN'
     DYNAMODB_REGION = 'us-east-1'
     AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
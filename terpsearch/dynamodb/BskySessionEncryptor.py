@@ -1,9 +1,21 @@
 import os
 import json
+from functools import lru_cache
 from cryptography.fernet import Fernet
 from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
 
 
+@lru_cache(maxsize=4)
+def _build_cipher(secret: str) -> Fernet:
+    """
+    Parses the FERNET_KEY secret and builds its Fernet cipher. Cached so that every BskySessionEncryptor in the process
+    shares one cipher instead of re-parsing the JSON secret each time; a rotated secret simply gets a new entry.
+    """
+    parsed_secret = json.loads(secret)
+    key = parsed_secret[DynamoDbConstants.FERNET_KEY]
+    return Fernet(key.encode())
+
+
 class BskySessionEncryptor:
     """
     A utility class to handle encryption and decryption of messages using the Fernet symmetric encryption.
@@ -24,9 +36,7 @@ class BskySessionEncryptor:
         """
         try:
             secret = os.getenv(DynamoDbConstants.FERNET_KEY)
-            parsed_secret = json.loads(secret)
-            key = parsed_secret[DynamoDbConstants.FERNET_KEY]
-            cipher = Fernet(key.encode())
+            cipher = _build_cipher(secret)
             return cipher
         except AttributeError as e:
             print('Could not find BskySessionEncrytor() key')
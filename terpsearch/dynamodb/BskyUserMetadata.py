@@ -0,0 +1,154 @@
+import time
+from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+
+
+class BskyUserMetadata:
+    """
+    A single-read, single-write view of a user's row in the BSKY_USERS table.
+
+    The whole row is loaded once with a strongly consistent `get_item`, so the session token and the timeline cursor
+    are served from memory instead of one `query` each. Changes are staged with set()/remove() and written back in a
+    single `update_item` by save(); save(attributes=...) writes only some of them, e.g. a new session token that must
+    not be lost if the rest of the run is abandoned.
+    """
+
+    BATCH_GET_LIMIT = 100
+
+    def __init__(self, users_table, bsky_username: str, item: dict = None):
+        """
+        Initializes a BskyUserMetadata instance from an already-loaded item.
+
+        Args:
+            users_table (boto3.dynamodb.Table): The BSKY_USERS table.
+            bsky_username (str): The Bluesky username (partition key).
+            item (dict): The user's row, or None if the user does not have one yet.
+        """
+        self.users_table = users_table
+        self.bsky_username = bsky_username
+        self.item = dict(item or {})
+        self._pending_sets = {}
+        self._pending_removes = set()
+
+    @classmethod
+    def load(cls, users_table, bsky_username: str):
+        """
+        Loads a user's row with one consistent get_item.
+
+        Args:
+            users_table (boto3.dynamodb.Table): The BSKY_USERS table.
+            bsky_username (str): The Bluesky username.
+
+        Returns:
+            BskyUserMetadata: The user's metadata (empty if the user has no row yet).
+        """
+        response = users_table.get_item(Key={'bskyUsername': bsky_username}, ConsistentRead=True)
+        return cls(users_table=users_table, bsky_username=bsky_username, item=response.get('Item'))
+
+    @classmethod
+    def load_many(cls, dynamodb_resource, users_table, bsky_usernames, max_retries: int = 5):
+        """
+        Loads many users' rows with chunked `batch_get_item` calls, retrying unprocessed keys with backoff.
+
+        Args:
+            dynamodb_resource (boto3.resource): The DynamoDB resource.
+            users_table (boto3.dynamodb.Table): The BSKY_USERS table.
+            bsky_usernames (List[str]): The Bluesky usernames to load.
+            max_retries (int): How many times unprocessed keys are retried.
+
+        Returns:
+            Dict[str, BskyUserMetadata]: Metadata per username (empty metadata for users without a row).
+        """
+        table_name = users_table.name
+        items = {}
+        unique_usernames = list(dict.fromkeys(bsky_usernames))
+
+        for start in range(0, len(unique_usernames), BskyUserMetadata.BATCH_GET_LIMIT):
+            chunk = unique_usernames[start:start + BskyUserMetadata.BATCH_GET_LIMIT]
+            request_items = {table_name: {'Keys': [{'bskyUsername': name} for name in chunk],
+                                          'ConsistentRead': True}}
+            attempt = 0
+            while request_items:
+                response = dynamodb_resource.batch_get_item(RequestItems=request_items)
+                for item in response.get('Responses', {}).get(table_name, []):
+                    items[item['bskyUsername']] = item
+                request_items = response.get('UnprocessedKeys') or {}
+                if request_items:
+                    attempt += 1
+                    if attempt > max_retries:
+                        print(f'🚨 Gave up loading {len(request_items[table_name]["Keys"])} users from '
+                              f'{DynamoDbConstants.BSKY_USERS_TABLE_NAME}')
+                        break
+                    time.sleep(min(0.05 * 2 ** attempt, 2))
+
+        return {name: cls(users_table=users_table, bsky_username=name, item=items.get(name))
+                for name in unique_usernames}
+
+    def get(self, attribute: str, default=None):
+        return self.item.get(attribute, default)
+
+    def set(self, attribute: str, value):
+        """
+        Stages an attribute update (applied locally right away, persisted by save()).
+        """
+        self.item[attribute] = value
+        self._pending_sets[attribute] = value
+        self._pending_removes.discard(attribute)
+
+    def remove(self, attribute: str):
+        """
+        Stages the removal of an attribute (applied locally right away, persisted by save()).
+        """
+        self.item.pop(attribute, None)
+        self._pending_sets.pop(attribute, None)
+        self._pending_removes.add(attribute)
+
+    def has_pending_changes(self) -> bool:
+        return bool(self._pending_sets or self._pending_removes)
+
+    def save(self, attributes=None):
+        """
+        Writes staged changes back in a single update_item. Does nothing if nothing changed.
+
+        Args:
+            attributes (Iterable[str]): Only write the staged changes of these attributes (default: every change).
+        """
+        if attributes is None:
+            pending_sets, pending_removes = dict(self._pending_sets), set(self._pending_removes)
+        else:
+            attributes = set(attributes)
+            pending_sets = {attribute: value for attribute, value in self._pending_sets.items()
+                            if attribute in attributes}
+            pending_removes = self._pending_removes & attributes
+        if not pending_sets and not pending_removes:
+            return
+
+        names = {}
+        values = {}
+        set_clauses = []
+        for i, (attribute, value) in enumerate(pending_sets.items()):
+            names[f'#s{i}'] = attribute
+            values[f':s{i}'] = value
+            set_clauses.append(f'#s{i} = :s{i}')
+        remove_clauses = []
+        for i, attribute in enumerate(pending_removes):
+            names[f'#r{i}'] = attribute
+            remove_clauses.append(f'#r{i}')
+
+        update_expression = ''
+        if set_clauses:
+            update_expression += 'SET ' + ', '.join(set_clauses)
+        if remove_clauses:
+            update_expression += ' REMOVE ' + ', '.join(remove_clauses)
+
+        update_kwargs = {
+            'Key': {'bskyUsername': self.bsky_username},
+            'UpdateExpression': update_expression.strip(),
+            'ExpressionAttributeNames': names
+        }
+        if values:
+            update_kwargs['ExpressionAttributeValues'] = values
+        self.users_table.update_item(**update_kwargs)
+
+        for attribute in pending_sets:
+            self._pending_sets.pop(attribute, None)
+        self._pending_removes -= pending_removes
@@ -0,0 +1,201 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+
+BULK_WRITE_WORKERS = int(os.getenv('BULK_WRITE_WORKERS', '8'))
+BULK_WRITE_MAX_RETRIES = int(os.getenv('BULK_WRITE_MAX_RETRIES', '8'))
+BULK_WRITE_ADAPTIVE = os.getenv('BULK_WRITE_ADAPTIVE', 'true').lower() == 'true'
+BATCH_WRITE_LIMIT = 25
+THROTTLING_ERRORS = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds the number of in-flight BatchWriteItem calls.
+
+    When adaptive, the limit follows AIMD: it is halved when a call is throttled (at most once per `cooldown` seconds,
+    so a burst of throttled calls only counts once) and grows by one after `increase_after` calls in a row go through
+    without throttling, up to `max_limit`.
+    """
+
+    def __init__(self, max_limit: int, adaptive: bool = True, increase_after: int = 4, cooldown: float = 0.1):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.lowest_limit = self.max_limit
+        self.adaptive = adaptive
+        self.increase_after = increase_after
+        self.cooldown = cooldown
+        self._in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def on_throttle(self):
+        if not self.adaptive:
+            return
+        with self._condition:
+            self._successes = 0
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(1, self.limit // 2)
+                self.lowest_limit = min(self.lowest_limit, self.limit)
+                self._last_decrease = now
+
+    def on_success(self):
+        if not self.adaptive:
+            return
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify()
+
+
+class BulkWriter:
+    """
+    Writes many items to one DynamoDB table with BatchWriteItem calls issued from a thread pool.
+
+    Items are split into requests of up to 25 puts. Unlike boto3's batch_writer, every request is checked when it
+    returns: `UnprocessedItems` and throttling errors are retried with exponential backoff and full jitter, and only
+    puts DynamoDB acknowledged are counted as written. Items that still fail after `max_retries` are returned to the
+    caller instead of being silently dropped.
+    """
+
+    def __init__(self, dynamodb_resource, table_name: str, key_attributes, max_workers: int = BULK_WRITE_WORKERS,
+                 max_retries: int = BULK_WRITE_MAX_RETRIES, adaptive: bool = BULK_WRITE_ADAPTIVE,
+                 base_delay: float = 0.05, max_delay: float = 5.0):
+        """
+        Initializes a BulkWriter.
+
+        Args:
+            dynamodb_resource (boto3.resource): The DynamoDB resource.
+            table_name (str): The table to write to.
+            key_attributes (Sequence[str]): The table's key attributes. Items with the same key are collapsed into the
+                last one, since BatchWriteItem rejects requests that contain a key twice.
+            max_workers (int): Maximum number of concurrent BatchWriteItem calls.
+            max_retries (int): How many times a request is retried after throttling or unprocessed items.
+            adaptive (bool): Whether to lower the concurrency while DynamoDB throttles (see ConcurrencyLimiter).
+            base_delay (float): Backoff base, in seconds.
+            max_delay (float): Backoff cap, in seconds.
+        """
+        self.dynamodb_resource = dynamodb_resource
+        self.table_name = table_name
+        self.key_attributes = tuple(key_attributes)
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.adaptive = adaptive
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Returns the delay before retry number `attempt` (full jitter: uniform between 0 and the exponential cap).
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def write(self, items):
+        """
+        Puts items into the table.
+
+        Args:
+            items (Iterable[Dict]): The items to put.
+
+        Returns:
+            dict: 'requested' (items passed in), 'unique' (items after collapsing repeated keys), 'acknowledged'
+                (puts DynamoDB confirmed), 'failed_items' (items that could not be written), 'requests' (BatchWriteItem
+                calls), 'retries', 'throttled' (throttling errors and responses with unprocessed items) and
+                'lowest_concurrency'.
+        """
+        requested = 0
+        unique_items = {}
+        for item in items:
+            requested += 1
+            unique_items[tuple(item[attribute] for attribute in self.key_attributes)] = item
+        unique_items = list(unique_items.values())
+        chunks = [unique_items[start:start + BATCH_WRITE_LIMIT]
+                  for start in range(0, len(unique_items), BATCH_WRITE_LIMIT)]
+
+        limiter = ConcurrencyLimiter(max_limit=min(self.max_workers, max(len(chunks), 1)), adaptive=self.adaptive)
+        result = {
+            'requested': requested,
+            'unique': len(unique_items),
+            'acknowledged': 0,
+            'failed_items': [],
+            'requests': 0,
+            'retries': 0,
+            'throttled': 0
+        }
+
+        def write_chunk(chunk):
+            return self._write_chunk(chunk, limiter)
+
+        if len(chunks) <= 1:
+            chunk_results = [write_chunk(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=limiter.max_limit, thread_name_prefix='bulk-write') as pool:
+                chunk_results = list(pool.map(write_chunk, chunks))
+
+        for chunk_result in chunk_results:
+            for name in ('acknowledged', 'requests', 'retries', 'throttled'):
+                result[name] += chunk_result[name]
+            result['failed_items'].extend(chunk_result['failed_items'])
+        result['lowest_concurrency'] = limiter.lowest_limit
+        return result
+
+    def _write_chunk(self, chunk, limiter: ConcurrencyLimiter):
+        """
+        Writes up to 25 items, retrying unprocessed items and throttling errors until they are acknowledged or the
+        retries run out.
+        """
+        result = {'acknowledged': 0, 'failed_items': [], 'requests': 0, 'retries': 0, 'throttled': 0}
+        write_requests = [{'PutRequest': {'Item': item}} for item in chunk]
+        attempt = 0
+        while write_requests:
+            try:
+                with limiter:
+                    result['requests'] += 1
+                    response = self.dynamodb_resource.batch_write_item(
+                        RequestItems={self.table_name: write_requests})
+            except ClientError as e:
+                error_code = e.response.get('Error', {}).get('Code')
+                if error_code not in THROTTLING_ERRORS or attempt >= self.max_retries:
+                    print(f'🚨 Failed to write {len(write_requests)} items to {self.table_name}: {e}')
+                    break
+                result['throttled'] += 1
+                limiter.on_throttle()
+            else:
+                unprocessed = response.get('UnprocessedItems', {}).get(self.table_name, [])
+                result['acknowledged'] += len(write_requests) - len(unprocessed)
+                write_requests = unprocessed
+                if not unprocessed:
+                    limiter.on_success()
+                    break
+                result['throttled'] += 1
+                limiter.on_throttle()
+                if attempt >= self.max_retries:
+                    print(f'🚨 {len(unprocessed)} items were still unprocessed by {self.table_name} after '
+                          f'{attempt} retries')
+                    break
+
+            attempt += 1
+            result['retries'] += 1
+            time.sleep(self.backoff(attempt))
+
+        result['failed_items'] = [write_request['PutRequest']['Item'] for write_request in write_requests]
+        return result
@@ -0,0 +1,224 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from boto3.dynamodb.conditions import Key
+import botocore.exceptions
+
+
+class CategoryRollups:
+    """
+    Per-day category counts of each user's timeline, stored in the BSKY_CATEGORY_ROLLUPS table.
+
+    Counters are maintained at write time: TerpSearchDb.batch_write_items() increments the rollup of every day that
+    received new posts with one atomic `ADD` update per day, so trends read at most one small item per day in the range
+    instead of every post. Only posts that did not exist yet are counted, so re-ingested duplicates never double count.
+
+    Days are the 'YYYY-MM-DD' prefix of the post timestamp (UTC for Bluesky timestamps), matching the string comparison
+    used by the UserTimestampIndex range queries.
+
+    Rollups only count posts stored after they were enabled (or rebuilt), so each user also has a coverage item
+    (day='coverage', which never falls inside a 'YYYY-MM-DD' range) whose 'complete_since' is the first day the rollups
+    are known to be complete from. Readers serve earlier days from the posts instead. The first increment of a user
+    records the next day (any post timestamped from then on is stored, and counted, after the marker exists), and
+    rebuild() lowers it to ALL_DAYS.
+    """
+
+    CATEGORY_PREFIX = 'category:'
+    POSTS = 'posts'
+    COVERAGE_DAY = 'coverage'
+    COMPLETE_SINCE = 'complete_since'
+    ALL_DAYS = '0000-00-00'
+
+    # Users known to have a coverage item, shared by the instances of a process to skip the conditional put
+    _covered_users = set()
+
+    def __init__(self, rollups_table):
+        """
+        Initializes a CategoryRollups instance.
+
+        Args:
+            rollups_table (boto3.dynamodb.Table): The BSKY_CATEGORY_ROLLUPS table.
+        """
+        self.rollups_table = rollups_table
+
+    @staticmethod
+    def day_of(timestamp: str) -> str:
+        return timestamp[:10]
+
+    @staticmethod
+    def aggregate(posts, days: dict = None):
+        """
+        Groups posts by day.
+
+        Args:
+            posts (List[Dict]): Posts with a 'timestamp' and a 'category' list.
+            days (dict): An earlier aggregate() result to add the posts to.
+
+        Returns:
+            Dict[str, Tuple[int, Counter]]: The number of posts and the per-category counts of every day.
+        """
+        days = {} if days is None else days
+        for post in posts:
+            day = CategoryRollups.day_of(post['timestamp'])
+            post_count, category_counts = days.get(day, (0, Counter()))
+            category_counts.update(post.get('category', []))
+            days[day] = (post_count + 1, category_counts)
+        return days
+
+    def increment(self, bsky_username: str, posts):
+        """
+        Adds new posts to the rollups of their days with one atomic ADD update per day.
+
+        Args:
+            bsky_username (str): The Bluesky username.
+            posts (List[Dict]): Posts that were not stored before (duplicates must be filtered out by the caller).
+
+        Returns:
+            int: The number of rollup items updated.
+        """
+        days = CategoryRollups.aggregate(posts)
+        if days:
+            self.start_coverage(bsky_username)
+        for day, (post_count, category_counts) in days.items():
+            names = {'#posts': CategoryRollups.POSTS}
+            values = {':posts': post_count}
+            add_clauses = ['#posts :posts']
+            for i, (category, count) in enumerate(category_counts.items()):
+                names[f'#c{i}'] = f'{CategoryRollups.CATEGORY_PREFIX}{category}'
+                values[f':c{i}'] = count
+                add_clauses.append(f'#c{i} :c{i}')
+
+            self.rollups_table.update_item(
+                Key={'bskyUsername': bsky_username, 'day': day},
+                UpdateExpression='ADD ' + ', '.join(add_clauses),
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+        return len(days)
+
+    def start_coverage(self, bsky_username: str):
+        """
+        Records that a user's rollups are complete from the next UTC day on, unless the user already has a coverage item.
+        """
+        if bsky_username in CategoryRollups._covered_users:
+            return
+        next_day = (datetime.now(timezone.utc) + timedelta(days=1)).strftime('%Y-%m-%d')
+        try:
+            self.rollups_table.put_item(
+                Item={'bskyUsername': bsky_username, 'day': CategoryRollups.COVERAGE_DAY,
+                      CategoryRollups.COMPLETE_SINCE: next_day},
+                ConditionExpression='attribute_not_exists(bskyUsername)'
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        CategoryRollups._covered_users.add(bsky_username)
+
+    def complete_since(self, bsky_username: str):
+        """
+        Returns the first day ('YYYY-MM-DD') from which a user's rollups count every stored post, or None if the user
+        has no rollups yet.
+        """
+        response = self.rollups_table.get_item(Key={'bskyUsername': bsky_username, 'day': CategoryRollups.COVERAGE_DAY},
+                                               ConsistentRead=True)
+        return response.get('Item', {}).get(CategoryRollups.COMPLETE_SINCE)
+
+    def split_range(self, bsky_username: str, start_date: str, end_date: str):
+        """
+        Splits a date range into the part to read from the posts and the part covered by the rollups.
+
+        Returns:
+            Tuple[Optional[Tuple[str, str]], Optional[Tuple[str, str]]]: The (start, end) days to query from the posts
+                and the (start, end) days to read from the rollups; either is None when empty.
+        """
+        since = self.complete_since(bsky_username)
+        if since is None or since > end_date:
+            return (start_date, end_date), None
+        if since <= start_date:
+            return None, (start_date, end_date)
+        day_before = (datetime.strptime(since, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+        return (start_date, day_before), (since, end_date)
+
+    def read(self, bsky_username: str, start_date: str, end_date: str):
+        """
+        Sums the rollups of every day between two dates.
+
+        Args:
+            bsky_username (str): The Bluesky username.
+            start_date (str): Inclusive start day ('YYYY-MM-DD').
+            end_date (str): Inclusive end day ('YYYY-MM-DD').
+
+        Returns:
+            Tuple[Counter, int, int]: The per-category counts, the number of posts and the number of days read.
+        """
+        category_counts = Counter()
+        post_count = 0
+        days_read = 0
+        for item in self.iter_days(bsky_username, start_date, end_date):
+            days_read += 1
+            post_count += int(item.get(CategoryRollups.POSTS, 0))
+            category_counts.update(CategoryRollups.category_counts(item))
+        return category_counts, post_count, days_read
+
+    def iter_days(self, bsky_username: str, start_date: str, end_date: str):
+        """
+        Yields the rollup item of every day between two dates that has posts, oldest first.
+        """
+        query_kwargs = {
+            'KeyConditionExpression': Key('bskyUsername').eq(bsky_username) & Key('day').between(start_date, end_date)
+        }
+        while True:
+            response = self.rollups_table.query(**query_kwargs)
+            yield from response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                return
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    @staticmethod
+    def category_counts(item) -> Counter:
+        prefix = CategoryRollups.CATEGORY_PREFIX
+        return Counter({attribute[len(prefix):]: int(count) for attribute, count in item.items()
+                        if attribute.startswith(prefix)})
+
+    def rebuild(self, posts_table, bsky_username: str):
+        """
+        Recomputes a user's rollups from the posts stored in BSKY_POSTS, replacing the existing ones, and marks them
+        complete for every day. Used to backfill rollups for data written before rollups existed, or to repair them.
+
+        Args:
+            posts_table (boto3.dynamodb.Table): The BSKY_POSTS table.
+            bsky_username (str): The Bluesky username.
+
+        Returns:
+            Tuple[int, int]: The number of posts read and the number of days written.
+        """
+        days = {}
+        post_count = 0
+        query_kwargs = {
+            'KeyConditionExpression': Key('bskyUsername').eq(bsky_username),
+            'ProjectionExpression': '#c, #ts',
+            'ExpressionAttributeNames': {'#c': 'category', '#ts': 'timestamp'}
+        }
+        while True:
+            response = posts_table.query(**query_kwargs)
+            posts = [item for item in response.get('Items', []) if item.get('timestamp')]
+            CategoryRollups.aggregate(posts, days=days)
+            post_count += len(posts)
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        stale_days = [item['day'] for item in self.iter_days(bsky_username, '0000-00-00', '9999-99-99')
+                      if item['day'] not in days]
+
+        with self.rollups_table.batch_writer(overwrite_by_pkeys=['bskyUsername', 'day']) as batch:
+            for day in stale_days:
+                batch.delete_item(Key={'bskyUsername': bsky_username, 'day': day})
+            for day, (day_post_count, category_counts) in days.items():
+                item = {'bskyUsername': bsky_username, 'day': day, CategoryRollups.POSTS: day_post_count}
+                item.update({f'{CategoryRollups.CATEGORY_PREFIX}{category}': count
+                             for category, count in category_counts.items()})
+                batch.put_item(Item=item)
+            batch.put_item(Item={'bskyUsername': bsky_username, 'day': CategoryRollups.COVERAGE_DAY,
+                                 CategoryRollups.COMPLETE_SINCE: CategoryRollups.ALL_DAYS})
+        CategoryRollups._covered_users.add(bsky_username)
+        return post_count, len(days)
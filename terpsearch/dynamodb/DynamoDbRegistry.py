@@ -0,0 +1,138 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+
+"""
+DynamoDbRegistry: A process-wide, thread-safe registry of boto3 DynamoDB handles keyed by db_mode.
+
+Every module asks the registry (through get_dynamodb_resource / get_dynamodb_client / get_dynamodb_table) instead of
+building its own boto3 session, so a process resolves credentials once and shares a single HTTP connection pool per
+db_mode:
+    - The low-level client is the resource's own `meta.client`, so resource and client calls share one pool.
+    - Clients use a tuned botocore Config: a larger connection pool, TCP keepalive and adaptive retries.
+    - Table handles are cached per (db_mode, table name).
+    - Everything is dropped in forked children (gunicorn / Celery prefork), which rebuild their own handles on first
+      use instead of sharing the parent's sockets.
+"""
+
+
+def build_botocore_config():
+    """
+    Returns the botocore Config shared by every DynamoDB client, tunable through environment variables.
+    """
+    return Config(
+        max_pool_connections=int(os.getenv('DYNAMODB_MAX_POOL_CONNECTIONS', '50')),
+        tcp_keepalive=True,
+        connect_timeout=float(os.getenv('DYNAMODB_CONNECT_TIMEOUT', '5')),
+        read_timeout=float(os.getenv('DYNAMODB_READ_TIMEOUT', '30')),
+        retries={
+            'mode': 'adaptive',
+            'max_attempts': int(os.getenv('DYNAMODB_MAX_ATTEMPTS', '10'))
+        }
+    )
+
+
+class DynamoDbRegistry:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._resources = {}
+        self._tables = {}
+        self._resource_modes = {}
+
+    @staticmethod
+    def _session_kwargs(db_mode: str):
+        if db_mode == 'PROD':
+            return {
+                'region_name': DynamoDbConstants.DYNAMODB_REGION,
+                'aws_access_key_id': DynamoDbConstants.AWS_ACCESS_KEY_ID,
+                'aws_secret_access_key': DynamoDbConstants.AWS_SECRET_ACCESS_KEY_ID
+            }
+        elif db_mode == 'DEV':
+            return {
+                'region_name': DynamoDbConstants.DYNAMODB_REGION,
+                'aws_access_key_id': 'dummy',
+                'aws_secret_access_key': 'dummy'
+            }
+        return None
+
+    def resource(self, db_mode: str):
+        """
+        Returns the shared DynamoDB resource of a deployment mode, creating it on first use.
+
+        Args:
+            db_mode (str): Deployment mode ('PROD' or 'DEV').
+
+        Returns:
+            boto3.resources.factory.dynamodb.ServiceResource: The shared resource, or None for an unknown mode.
+        """
+        db_mode = db_mode.upper()
+        resource = self._resources.get(db_mode)
+        if resource is not None:
+            return resource
+
+        with self._lock:
+            resource = self._resources.get(db_mode)
+            if resource is None:
+                session_kwargs = DynamoDbRegistry._session_kwargs(db_mode)
+                if session_kwargs is None:
+                    return None
+                # boto3 sessions are not thread-safe; each one is only used here, under the lock
+                session = boto3.session.Session(**session_kwargs)
+                resource_kwargs = {'config': build_botocore_config()}
+                if db_mode == 'DEV':
+                    resource_kwargs['endpoint_url'] = DynamoDbConstants.DYNAMODB_URL
+                resource = session.resource('dynamodb', **resource_kwargs)
+                self._resources[db_mode] = resource
+                self._resource_modes[id(resource)] = db_mode
+            return resource
+
+    def client(self, db_mode: str):
+        """
+        Returns the low-level client behind the shared resource of a deployment mode.
+        """
+        resource = self.resource(db_mode)
+        return resource.meta.client if resource is not None else None
+
+    def table(self, dynamodb_resource, table_name: str):
+        """
+        Returns a cached Table handle. Handles of resources not created by the registry are not cached.
+
+        Args:
+            dynamodb_resource (boto3.resource): The DynamoDB resource the table belongs to.
+            table_name (str): The name of the table.
+
+        Returns:
+            boto3.dynamodb.Table: The table handle.
+        """
+        db_mode = self._resource_modes.get(id(dynamodb_resource))
+        if db_mode is None or self._resources.get(db_mode) is not dynamodb_resource:
+            return dynamodb_resource.Table(table_name)
+
+        key = (db_mode, table_name)
+        table = self._tables.get(key)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(key)
+                if table is None:
+                    table = dynamodb_resource.Table(table_name)
+                    self._tables[key] = table
+        return table
+
+    def reset(self):
+        """
+        Drops every cached handle; the next call rebuilds them.
+        """
+        # A fork can happen while another thread holds the lock, so the child starts over with a fresh one
+        self._lock = threading.RLock()
+        self._resources = {}
+        self._tables = {}
+        self._resource_modes = {}
+
+
+# One registry per process
+dynamodb_registry = DynamoDbRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=dynamodb_registry.reset)
@@ -0,0 +1,319 @@
+import math
+import os
+import re
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key
+import numpy as np
+from terpsearch.dynamodb.BulkWriter import BulkWriter
+
+"""
+Keyword search over each user's stored posts: an inverted index in the BSKY_POST_TERMS table, ranked with BM25.
+
+Indexing happens at write time: TerpSearchDb.batch_write_items() hands the posts that were new and acknowledged to
+PostTermIndex.add(), which numbers them with one atomic ADD on the user's 'stats' item and writes one immutable segment
+per write batch:
+    - 't#<term>#<base>': the postings of a term, as varint-encoded (document delta, term frequency, length norm)
+      triples sorted by document. The length norm (the post length in terms, capped at 255) travels with the postings
+      so that scoring needs no per-document reads;
+    - 'd#<base>': the 16-byte bskyPostHash UUID of every document of the batch, in document order.
+Which posts are new is decided by TerpSearchDb.claim_new_posts(), which conditionally puts one 'p#<bskyPostHash>' claim
+marker per post in the same table, so a post written by two concurrent batches is indexed once.
+A query reads the 'stats' item, one Query (begins_with 't#<term>#') per query term and the 'd#' segments of the top
+hits only, so its cost follows the size of the query terms' postings rather than the number of posts.
+
+Tokens use the categorizer keywords' normalization (KeywordMatcher): lower-cased and split on the same \\w word
+boundaries, with '.' and '&' kept inside words ("s&p", "bsky.social"). Mentions also keep '-', which is valid in
+handles ("@alice-bob.bsky.social"). A post's author is indexed as '@<handle>', tokenized like a mention of that handle in
+a text, so both are found by the same query.
+"""
+
+TERMS_QUERY_WORKERS = int(os.getenv('TERMS_QUERY_WORKERS', '8'))
+TOKEN_PATTERN = re.compile(r'(?<!\w)(?:@\w(?:[\w.-]*\w)?|\w+(?:[.&]\w+)*)')
+MAX_TERM_LENGTH = 64
+STATS = 'stats'
+CLAIM_PREFIX = 'p#'
+
+
+def tokenize(text: str):
+    """
+    Splits a text into index terms (see the module docstring).
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if len(token) <= MAX_TERM_LENGTH]
+
+
+def encode_postings(documents, frequencies, lengths) -> bytes:
+    """
+    Encodes sorted document numbers (as deltas), term frequencies and length norms as LEB128 varints.
+    """
+    encoded = bytearray()
+    previous = 0
+    for document, frequency, length in zip(documents, frequencies, lengths):
+        for value in (document - previous, frequency, min(length, 255)):
+            while value >= 0x80:
+                encoded.append((value & 0x7F) | 0x80)
+                value >>= 7
+            encoded.append(value)
+        previous = document
+    return bytes(encoded)
+
+
+def decode_postings(encoded: bytes):
+    """
+    Decodes encode_postings() output.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Document numbers, term frequencies and length norms.
+    """
+    values = []
+    value = shift = 0
+    for byte in encoded:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = shift = 0
+    triples = np.array(values, dtype=np.int64).reshape(-1, 3)
+    return np.cumsum(triples[:, 0]), triples[:, 1], triples[:, 2]
+
+
+class PostTermIndex:
+    """
+    The BM25 keyword index of each user's posts, stored in the BSKY_POST_TERMS table.
+    """
+
+    def __init__(self, dynamodb_resource, terms_table, k1: float = 1.2, b: float = 0.75,
+                 max_workers: int = TERMS_QUERY_WORKERS):
+        """
+        Initializes a PostTermIndex instance.
+
+        Args:
+            dynamodb_resource (boto3.resource): The DynamoDB resource, used for batched reads and writes.
+            terms_table (boto3.dynamodb.Table): The BSKY_POST_TERMS table.
+            k1 (float): BM25 term frequency saturation.
+            b (float): BM25 length normalization.
+            max_workers (int): Maximum number of query terms whose postings are read concurrently.
+        """
+        self.dynamodb_resource = dynamodb_resource
+        self.terms_table = terms_table
+        self.k1 = k1
+        self.b = b
+        self.max_workers = max_workers
+
+    @staticmethod
+    def post_terms(post) -> Counter:
+        terms = Counter(tokenize(post.get('text', '')))
+        if post.get('handle'):
+            terms.update(tokenize(f'@{post["handle"]}'))
+        return terms
+
+    @staticmethod
+    def base_of(segment: str) -> int:
+        return int(segment.rsplit('#', 1)[1])
+
+    def add(self, bsky_username: str, posts):
+        """
+        Indexes new posts as one segment.
+
+        Args:
+            bsky_username (str): The Bluesky username.
+            posts (List[Dict]): Stored posts (with 'bskyPostHash') that were not indexed before; duplicates must be
+                filtered out by the caller.
+
+        Returns:
+            int: The number of distinct terms written.
+        """
+        if not posts:
+            return 0
+        base = int(self.terms_table.update_item(
+            Key={'bskyUsername': bsky_username, 'segment': STATS},
+            UpdateExpression='ADD next_document :n',
+            ExpressionAttributeValues={':n': len(posts)},
+            ReturnValues='UPDATED_NEW'
+        )['Attributes']['next_document']) - len(posts)
+
+        postings = {}
+        total_length = 0
+        for document, post in enumerate(posts):
+            terms = PostTermIndex.post_terms(post)
+            length = sum(terms.values())
+            total_length += length
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append((document, frequency, length))
+
+        segment_items = [{
+            'bskyUsername': bsky_username,
+            'segment': f'd#{base:012d}',
+            'keys': b''.join(uuid.UUID(post['bskyPostHash']).bytes for post in posts)
+        }]
+        for term, term_postings in postings.items():
+            documents, frequencies, lengths = zip(*term_postings)
+            segment_items.append({
+                'bskyUsername': bsky_username,
+                'segment': f't#{term}#{base:012d}',
+                'postings': encode_postings(documents, frequencies, lengths)
+            })
+        result = BulkWriter(dynamodb_resource=self.dynamodb_resource, table_name=self.terms_table.name,
+                            key_attributes=['bskyUsername', 'segment']).write(segment_items)
+        if result['failed_items']:
+            raise RuntimeError(f'{len(result["failed_items"])} index segments of {bsky_username} were not written')
+
+        # Posts only count towards the BM25 statistics once their segments are stored
+        self.terms_table.update_item(
+            Key={'bskyUsername': bsky_username, 'segment': STATS},
+            UpdateExpression='ADD documents :n, total_length :length',
+            ExpressionAttributeValues={':n': len(posts), ':length': total_length}
+        )
+        return len(postings)
+
+    def mark_claimed(self, bsky_username: str, post_hashes):
+        """
+        Writes the 'p#' claim markers of posts that are already counted and indexed, unconditionally.
+        """
+        result = BulkWriter(dynamodb_resource=self.dynamodb_resource, table_name=self.terms_table.name,
+                            key_attributes=['bskyUsername', 'segment']).write(
+            {'bskyUsername': bsky_username, 'segment': f'{CLAIM_PREFIX}{post_hash}'} for post_hash in post_hashes)
+        if result['failed_items']:
+            raise RuntimeError(f'{len(result["failed_items"])} claim markers of {bsky_username} were not written')
+
+    def _read_postings(self, bsky_username: str, term: str):
+        query_kwargs = {
+            'KeyConditionExpression': Key('bskyUsername').eq(bsky_username) & Key('segment').begins_with(f't#{term}#')
+        }
+        segments = []
+        while True:
+            response = self.terms_table.query(**query_kwargs)
+            segments.extend((PostTermIndex.base_of(item['segment']), bytes(item['postings']))
+                            for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return segments
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def search(self, bsky_username: str, query: str, k: int = 10):
+        """
+        Ranks a user's posts against a query with BM25.
+
+        Args:
+            bsky_username (str): The Bluesky username.
+            query (str): The query; it is tokenized like the posts, and repeated terms count once.
+            k (int): Number of posts to return.
+
+        Returns:
+            Tuple[List[Tuple[str, float]], int]: (bskyPostHash, score) pairs, best first, and the number of postings
+                read.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        stats = self.terms_table.get_item(Key={'bskyUsername': bsky_username, 'segment': STATS}).get('Item', {})
+        document_count = int(stats.get('documents', 0))
+        if not terms or document_count == 0:
+            return [], 0
+        average_length = max(float(stats['total_length']) / document_count, 1.0)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(terms))),
+                                thread_name_prefix='terms-query') as pool:
+            term_segments = list(pool.map(lambda term: self._read_postings(bsky_username, term), terms))
+
+        documents, bases, scores = [], [], []
+        for segments in term_segments:
+            decoded = [(base, decode_postings(encoded)) for base, encoded in segments]
+            document_frequency = sum(len(term_documents) for _, (term_documents, _, _) in decoded)
+            if document_frequency == 0:
+                continue
+            idf = math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            for base, (term_documents, frequencies, lengths) in decoded:
+                norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+                documents.append(base + term_documents)
+                bases.append(np.full(len(term_documents), base, dtype=np.int64))
+                scores.append(idf * frequencies * (self.k1 + 1) / (frequencies + norms))
+        if not documents:
+            return [], 0
+
+        documents = np.concatenate(documents)
+        unique_documents, first, positions = np.unique(documents, return_index=True, return_inverse=True)
+        totals = np.bincount(positions, weights=np.concatenate(scores))
+        count = min(k, len(totals))
+        best = np.argpartition(-totals, count - 1)[:count] if count < len(totals) else np.arange(len(totals))
+        best = best[np.argsort(-totals[best], kind='stable')]
+        hits = self._post_hashes(bsky_username, documents=unique_documents[best],
+                                 bases=np.concatenate(bases)[first[best]], scores=totals[best])
+        return hits, len(documents)
+
+    def _post_hashes(self, bsky_username: str, documents, bases, scores, max_retries: int = 5):
+        # Maps document numbers back to post hashes by reading only the 'd#' segments of the hits
+        table_name = self.terms_table.name
+        request_items = {table_name: {'Keys': [{'bskyUsername': bsky_username, 'segment': f'd#{base:012d}'}
+                                               for base in set(bases.tolist())]}}
+        keys = {}
+        attempt = 0
+        while request_items:
+            response = self.dynamodb_resource.batch_get_item(RequestItems=request_items)
+            keys.update({PostTermIndex.base_of(item['segment']): bytes(item['keys'])
+                         for item in response.get('Responses', {}).get(table_name, [])})
+            request_items = response.get('UnprocessedKeys') or {}
+            if request_items:
+                attempt += 1
+                if attempt > max_retries:
+                    raise RuntimeError(f'Could not read the document segments of {bsky_username}')
+                time.sleep(min(0.05 * 2 ** attempt, 2))
+
+        hits = []
+        for document, base, score in zip(documents.tolist(), bases.tolist(), scores.tolist()):
+            if base in keys:
+                offset = (document - base) * 16
+                hits.append((str(uuid.UUID(bytes=keys[base][offset:offset + 16])), round(score, 4)))
+        return hits
+
+    def rebuild(self, posts_table, bsky_username: str, batch_size: int = 1000):
+        """
+        Re-indexes a user's posts from BSKY_POSTS, replacing the existing index. Used to index posts written before the
+        keyword index existed, or to repair it. The 'p#' claim markers (see TerpSearchDb.claim_new_posts()) are kept,
+        and every re-indexed post is marked as claimed.
+
+        Args:
+            posts_table (boto3.dynamodb.Table): The BSKY_POSTS table.
+            bsky_username (str): The Bluesky username.
+            batch_size (int): Posts per index segment.
+
+        Returns:
+            Tuple[int, int]: The number of posts indexed and the number of segments written.
+        """
+        stale = []
+        query_kwargs = {
+            'KeyConditionExpression': Key('bskyUsername').eq(bsky_username),
+            'ProjectionExpression': '#segment',
+            'ExpressionAttributeNames': {'#segment': 'segment'}
+        }
+        while True:
+            response = self.terms_table.query(**query_kwargs)
+            stale.extend(item['segment'] for item in response.get('Items', [])
+                         if not item['segment'].startswith(CLAIM_PREFIX))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        with self.terms_table.batch_writer() as batch:
+            for segment in stale:
+                batch.delete_item(Key={'bskyUsername': bsky_username, 'segment': segment})
+
+        post_count = segment_count = 0
+        query_kwargs = {
+            'KeyConditionExpression': Key('bskyUsername').eq(bsky_username),
+            'ProjectionExpression': 'bskyPostHash, #text, handle',
+            'ExpressionAttributeNames': {'#text': 'text'}
+        }
+        posts = []
+        while True:
+            response = posts_table.query(**query_kwargs)
+            posts.extend(response.get('Items', []))
+            last_page = 'LastEvaluatedKey' not in response
+            while len(posts) >= batch_size or (last_page and posts):
+                self.add(bsky_username, posts[:batch_size])
+                self.mark_claimed(bsky_username, [post['bskyPostHash'] for post in posts[:batch_size]])
+                post_count += len(posts[:batch_size])
+                segment_count += 1
+                posts = posts[batch_size:]
+            if last_page:
+                return post_count, segment_count
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
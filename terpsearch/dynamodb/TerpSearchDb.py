@@ -3,9 +3,20 @@ from terpsearch.dynamodb.dynamodb_helpers import *
 from terpsearch.dynamodb.tables.BskyPostsTable import BskyPostsTable
 from terpsearch.dynamodb.tables.BskyUsersTable import BskyUsersTable
 from terpsearch.dynamodb.tables.AppLoginTable import LoginTable
+from terpsearch.dynamodb.tables.BskyCategoryRollupsTable import BskyCategoryRollupsTable
+from terpsearch.dynamodb.tables.BskyPostTermsTable import BskyPostTermsTable
+from terpsearch.dynamodb.CategoryRollups import CategoryRollups
+from terpsearch.dynamodb.PostTermIndex import PostTermIndex, CLAIM_PREFIX
+from terpsearch.dynamodb.BulkWriter import BulkWriter, THROTTLING_ERRORS
+from terpsearch.dynamodb.schema_cache import bootstrap_tables
 from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
-from terpsearch.search.bskySearch import TerpSearch
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+DEDUP_PROBE_WORKERS = int(os.getenv('DEDUP_PROBE_WORKERS', '8'))
+TRANSACT_WRITE_LIMIT = 100
 
 
 class TerpSearchDb:
@@ -43,6 +54,56 @@ class TerpSearchDb:
         cursor_table = BskyUsersTable(db_mode=self.db_mode)
         cursor_table.create_table()
 
+    def create_category_rollups_table(self):
+        """
+        Creates the BSKY_CATEGORY_ROLLUPS table in DynamoDB using the configured DynamoDB resource.
+        """
+        rollups_table = BskyCategoryRollupsTable(db_mode=self.db_mode)
+        rollups_table.create_table()
+
+    def create_post_terms_table(self):
+        """
+        Creates the BSKY_POST_TERMS table in DynamoDB using the configured DynamoDB resource.
+        """
+        terms_table = BskyPostTermsTable(db_mode=self.db_mode)
+        terms_table.create_table()
+
+    def bootstrap_schema(self, trusted: bool = None):
+        """
+        Verifies that the LOGIN, BSKY_POSTS, BSKY_USERS, BSKY_CATEGORY_ROLLUPS and BSKY_POST_TERMS tables exist (one
+        cached describe_table each) and creates the missing ones. Verification is skipped entirely in trusted-schema
+        mode.
+
+        Args:
+            trusted (bool): Skip verification (defaults to the TRUSTED_SCHEMA environment variable).
+
+        Returns:
+            dict: Seconds spent verifying each table and in total.
+        """
+        return bootstrap_tables(client=self.client, trusted=trusted, table_creators={
+            DynamoDbConstants.TERPSEARCH_LOGIN_TABLE_NAME: self.create_login_table,
+            DynamoDbConstants.BSKY_POSTS_TABLE_NAME: self.create_bsky_posts_table,
+            DynamoDbConstants.BSKY_USERS_TABLE_NAME: self.create_users_table,
+            DynamoDbConstants.BSKY_CATEGORY_ROLLUPS_TABLE_NAME: self.create_category_rollups_table,
+            DynamoDbConstants.BSKY_POST_TERMS_TABLE_NAME: self.create_post_terms_table
+        })
+
+    def get_category_rollups(self):
+        """
+        Returns a CategoryRollups instance over the BSKY_CATEGORY_ROLLUPS table.
+        """
+        rollups_table = get_dynamodb_table(dynamodb_resource=self.dynamodb_resource,
+                                           table_name=DynamoDbConstants.BSKY_CATEGORY_ROLLUPS_TABLE_NAME)
+        return CategoryRollups(rollups_table=rollups_table)
+
+    def get_post_term_index(self):
+        """
+        Returns a PostTermIndex instance over the BSKY_POST_TERMS table.
+        """
+        terms_table = get_dynamodb_table(dynamodb_resource=self.dynamodb_resource,
+                                         table_name=DynamoDbConstants.BSKY_POST_TERMS_TABLE_NAME)
+        return PostTermIndex(dynamodb_resource=self.dynamodb_resource, terms_table=terms_table)
+
     def __create_db_item(self, bsky_username: str, item: dict):
         """
         Formats a Bluesky post into a TerpSearch DynamoDB-compatible item by attaching the required keys (bskyUsername
@@ -102,24 +163,253 @@ class TerpSearchDb:
             # else:
             #     print("Item already exists. Skipping insertion.")
 
-    def batch_write_items(self, items: list, table_name: str, user: str):
+    def batch_get_posts(self, user: str, post_hashes, table_name: str, attributes=('bskyPostHash',),
+                        max_retries: int = 5, max_workers: int = DEDUP_PROBE_WORKERS):
         """
-        Batch writes multiple post items to DynamoDB, skipping any duplicates based on conditional checks.
+        Reads posts of a user by bskyPostHash with `batch_get_item` calls of up to 100 keys that run in parallel and
+        retry unprocessed keys with backoff. Hashes that are not stored are simply missing from the result.
 
         Args:
-            items (List[Dict]): List of Bluesky post dictionaries.
-            table_name (str): DynamoDB table name.
             user (str): The associated Bluesky username.
+            post_hashes (Iterable[str]): The bskyPostHash values to read.
+            table_name (str): DynamoDB table name.
+            attributes (Sequence[str]): The attributes to project.
+            max_retries (int): How many times unprocessed keys are retried.
+            max_workers (int): Maximum number of concurrent batch_get_item calls.
+
+        Returns:
+            List[Dict]: The items found, in no particular order.
+        """
+        unique_hashes = list(dict.fromkeys(post_hashes))
+        chunks = [unique_hashes[start:start + 100] for start in range(0, len(unique_hashes), 100)]
+        names = {f'#a{i}': attribute for i, attribute in enumerate(attributes)}
+
+        def read_chunk(chunk):
+            found = []
+            request_items = {table_name: {
+                'Keys': [{'bskyUsername': user, 'bskyPostHash': post_hash} for post_hash in chunk],
+                'ProjectionExpression': ', '.join(names),
+                'ExpressionAttributeNames': names
+            }}
+            attempt = 0
+            while request_items:
+                response = self.dynamodb_resource.batch_get_item(RequestItems=request_items)
+                found.extend(response.get('Responses', {}).get(table_name, []))
+                request_items = response.get('UnprocessedKeys') or {}
+                if request_items:
+                    attempt += 1
+                    if attempt > max_retries:
+                        raise RuntimeError(f'Could not read {len(request_items[table_name]["Keys"])} post keys '
+                                           f'in {table_name} for user={user}')
+                    time.sleep(min(0.05 * 2 ** attempt, 2))
+            return found
+
+        if len(chunks) <= 1:
+            return read_chunk(chunks[0]) if chunks else []
+        items = []
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)), thread_name_prefix='batch-get') as pool:
+            for found in pool.map(read_chunk, chunks):
+                items.extend(found)
+        return items
+
+    def find_existing_post_hashes(self, user: str, post_hashes, table_name: str, max_retries: int = 5,
+                                  max_workers: int = DEDUP_PROBE_WORKERS):
+        """
+        Returns the post hashes that are already stored for a user, using keys-only batch_get_posts() lookups.
+
+        Returns:
+            set: The hashes that already exist.
+        """
+        return {item['bskyPostHash'] for item in self.batch_get_posts(user=user, post_hashes=post_hashes,
+                                                                       table_name=table_name, max_retries=max_retries,
+                                                                       max_workers=max_workers)}
+
+    def claim_new_posts(self, user: str, post_hashes, max_retries: int = 5, max_workers: int = DEDUP_PROBE_WORKERS):
+        """
+        Claims posts for the category rollups and the keyword index: a 'p#<bskyPostHash>' marker is put in
+        BSKY_POST_TERMS only if it does not exist yet, so every post is counted and indexed by exactly one writer, even
+        when shards or pipelined batches carry the same post concurrently.
+
+        The markers are written with TransactWriteItems calls of up to 100 conditional puts (run in parallel); when a
+        call is cancelled because some markers already exist, it is retried without them.
+
+        Returns:
+            set: The hashes this call claimed.
+
+        Raises:
+            RuntimeError: If a call keeps failing after `max_retries` retries.
         """
-        posts_table = get_dynamodb_table(dynamodb_resource=self.dynamodb_resource, table_name=table_name)
+        table_name = DynamoDbConstants.BSKY_POST_TERMS_TABLE_NAME
+        unique_hashes = list(dict.fromkeys(post_hashes))
+        chunks = [unique_hashes[start:start + TRANSACT_WRITE_LIMIT]
+                  for start in range(0, len(unique_hashes), TRANSACT_WRITE_LIMIT)]
 
-        with posts_table.batch_writer(overwrite_by_pkeys=['bskyUsername', 'bskyPostHash']) as batch:
-            success_writes = 0
-            for item in items:
+        def claim_chunk(chunk):
+            pending = list(chunk)
+            attempt = 0
+            while pending:
                 try:
-                    db_item = self.__create_db_item(bsky_username=user, item=item)
-                    batch.put_item(Item=db_item)
-                    success_writes = success_writes + 1
+                    self.client.transact_write_items(TransactItems=[{'Put': {
+                        'TableName': table_name,
+                        'Item': {'bskyUsername': user, 'segment': f'{CLAIM_PREFIX}{post_hash}'},
+                        'ConditionExpression': 'attribute_not_exists(bskyUsername)'
+                    }} for post_hash in pending])
+                    return pending
                 except ClientError as e:
-                    print(f"Failed to write item {item} for user={user}: {e}")
-        print(f'({user}) -> {success_writes}/{len(items)} items were written to the BSKY_POSTS')
+                    error_code = e.response.get('Error', {}).get('Code')
+                    reasons = e.response.get('CancellationReasons', [])
+                    taken = {post_hash for post_hash, reason in zip(pending, reasons)
+                             if reason.get('Code') == 'ConditionalCheckFailed'}
+                    if error_code == 'TransactionCanceledException' and taken:
+                        pending = [post_hash for post_hash in pending if post_hash not in taken]
+                        continue
+                    if error_code not in THROTTLING_ERRORS | {'TransactionCanceledException',
+                                                              'TransactionConflictException'}:
+                        raise
+                    attempt += 1
+                    if attempt > max_retries:
+                        raise RuntimeError(f'Could not claim {len(pending)} posts of {user}: {e}')
+                    time.sleep(min(0.05 * 2 ** attempt, 2))
+            return []
+
+        if len(chunks) <= 1:
+            return set(claim_chunk(chunks[0])) if chunks else set()
+        claimed = set()
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)), thread_name_prefix='claim') as pool:
+            for chunk_claimed in pool.map(claim_chunk, chunks):
+                claimed.update(chunk_claimed)
+        return claimed
+
+    def filter_new_posts(self, items: list, table_name: str, user: str):
+        """
+        Drops posts whose (bskyUsername, bskyPostHash) item already exists, and posts repeated within the batch, so
+        only new posts are classified and written.
+
+        Args:
+            items (List[Dict]): List of Bluesky post dictionaries.
+            table_name (str): DynamoDB table name.
+            user (str): The associated Bluesky username.
+
+        Returns:
+            Tuple[List[Dict], int, int]: The new posts, the number of posts already stored and the number of repeats
+                within the batch.
+        """
+        unique_posts = {}
+        for item in items:
+            unique_posts[stable_hash(input=item['text'])] = item
+        existing_hashes = self.find_existing_post_hashes(user=user, post_hashes=unique_posts.keys(),
+                                                         table_name=table_name)
+        new_posts = [item for post_hash, item in unique_posts.items() if post_hash not in existing_hashes]
+        print(f'({user}) -> {len(new_posts)}/{len(items)} posts are new ({len(existing_hashes)} already stored, '
+              f'{len(items) - len(unique_posts)} repeated in the batch)')
+        return new_posts, len(existing_hashes), len(items) - len(unique_posts)
+
+    def batch_write_items(self, items: list, table_name: str, user: str, update_rollups: bool = True,
+                          known_new: bool = False, update_term_index: bool = True):
+        """
+        Batch writes multiple post items to DynamoDB with parallel, retrying BatchWriteItem calls (see BulkWriter).
+        Posts with the same text share a key, so only the last one is written.
+
+        When writing to BSKY_POSTS, the per-day category rollups are incremented and the keyword search index is
+        extended for the posts whose write was acknowledged and that this call claimed (see claim_new_posts()), so
+        re-ingested posts and posts written concurrently by other shards are never counted or indexed twice.
+
+        Args:
+            items (List[Dict]): List of Bluesky post dictionaries.
+            table_name (str): DynamoDB table name.
+            user (str): The associated Bluesky username.
+            update_rollups (bool): Whether to maintain the BSKY_CATEGORY_ROLLUPS counters.
+            update_term_index (bool): Whether to maintain the BSKY_POST_TERMS keyword index.
+            known_new (bool): The caller already filtered out stored posts (see filter_new_posts()), so existing keys
+                are not looked up again before claiming.
+
+        Returns:
+            int: The number of items DynamoDB acknowledged.
+        """
+        db_items = {}
+        for item in items:
+            db_item = self.__create_db_item(bsky_username=user, item=item)
+            db_items[db_item['bskyPostHash']] = db_item
+
+        is_posts_table = table_name == DynamoDbConstants.BSKY_POSTS_TABLE_NAME
+        update_rollups = update_rollups and is_posts_table
+        update_term_index = update_term_index and is_posts_table
+        existing_hashes = set()
+        if (update_rollups or update_term_index) and not known_new:
+            try:
+                existing_hashes = self.find_existing_post_hashes(user=user, post_hashes=db_items.keys(),
+                                                                 table_name=table_name)
+            except (ClientError, RuntimeError) as e:
+                # The claims below still tell new posts apart, the read only saves claims for stored posts
+                print(f'⚠️ ({user}) -> Could not check for existing posts, claiming all of them: {e}')
+
+        result = BulkWriter(dynamodb_resource=self.dynamodb_resource, table_name=table_name,
+                            key_attributes=['bskyUsername', 'bskyPostHash']).write(db_items.values())
+        success_writes = result['acknowledged']
+        print(f'({user}) -> {success_writes}/{len(items)} items were written to the {table_name} '
+              f'({result["requests"]} requests, {result["retries"]} retries, {len(result["failed_items"])} failed)')
+
+        failed_hashes = {db_item['bskyPostHash'] for db_item in result['failed_items']}
+        new_posts = []
+        if update_rollups or update_term_index:
+            candidates = [post_hash for post_hash in db_items
+                          if post_hash not in existing_hashes and post_hash not in failed_hashes]
+            try:
+                claimed = self.claim_new_posts(user=user, post_hashes=candidates)
+                new_posts = [db_items[post_hash] for post_hash in candidates if post_hash in claimed]
+            except (ClientError, RuntimeError) as e:
+                print(f'🚨 ({user}) -> Could not claim new posts, rollups and the keyword index will not be '
+                      f'updated: {e}')
+                update_rollups = update_term_index = False
+        if update_rollups:
+            dated_posts = [db_item for db_item in new_posts if db_item.get('timestamp')]
+            try:
+                days = self.get_category_rollups().increment(bsky_username=user, posts=dated_posts)
+                print(f'({user}) -> Added {len(dated_posts)} new posts to {days} daily category rollups')
+            except ClientError as e:
+                print(f'🚨 ({user}) -> Failed to update category rollups: {e}')
+        if update_term_index:
+            try:
+                terms = self.get_post_term_index().add(bsky_username=user, posts=new_posts)
+                print(f'({user}) -> Indexed {len(new_posts)} new posts under {terms} keyword search terms')
+            except (ClientError, RuntimeError) as e:
+                print(f'🚨 ({user}) -> Failed to update the keyword search index: {e}')
+        return success_writes
+
+    def keyword_search(self, user: str, query: str, k: int = 10):
+        """
+        Finds a user's stored posts matching the terms of a query, ranked with BM25 (see PostTermIndex). Only the
+        postings of the query terms and the details of the hits are read.
+
+        Args:
+            user (str): The associated Bluesky username.
+            query (str): Words and @handles to look for.
+            k (int): Number of posts to return.
+
+        Returns:
+            dict: 'results' (posts with a BM25 'score', best first), 'postings_read' and 'timings_ms' (index lookup and
+                post details).
+        """
+        start_time = time.perf_counter()
+        hits, postings_read = self.get_post_term_index().search(bsky_username=user, query=query, k=k)
+        index_time = time.perf_counter()
+
+        posts = {}
+        if hits:
+            items = self.batch_get_posts(user=user, post_hashes=[post_hash for post_hash, _ in hits],
+                                         table_name=DynamoDbConstants.BSKY_POSTS_TABLE_NAME,
+                                         attributes=('bskyPostHash', 'text', 'author', 'handle', 'timestamp',
+                                                     'category'))
+            posts = {item['bskyPostHash']: item for item in items}
+        end_time = time.perf_counter()
+
+        return {
+            'bsky_username': user,
+            'query': query,
+            'results': [dict(posts[post_hash], score=score) for post_hash, score in hits if post_hash in posts],
+            'postings_read': postings_read,
+            'timings_ms': {
+                'index': round((index_time - start_time) * 1000, 3),
+                'fetch': round((end_time - index_time) * 1000, 3)
+            }
+        }
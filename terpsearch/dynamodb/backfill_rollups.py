@@ -0,0 +1,72 @@
+import argparse
+import time
+from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+from terpsearch.dynamodb.TerpSearchDb import TerpSearchDb
+from terpsearch.dynamodb.dynamodb_helpers import get_dynamodb_table
+from terpsearch.dynamodb.trends_cache import TrendsCache
+
+"""
+Builds (or repairs) the BSKY_CATEGORY_ROLLUPS per-day counters from the posts already stored in BSKY_POSTS.
+
+New posts are rolled up at write time; this command is only needed for data written before rollups existed, or to
+recompute them after a failed rollup update. Each user's rollups are recomputed from scratch and replace the existing
+ones, so the command is safe to run repeatedly. Once a user is rebuilt, the rollups are marked complete for every day
+(until then trends count the days before write-time rollups started from the posts) and the user's cached charts are
+invalidated. Posts written for a user while that user is being rebuilt may be missed
+by the rebuild; run it again for that user if ingestion was active.
+
+Usage:
+    python -m terpsearch.dynamodb.backfill_rollups [usernames ...]
+"""
+
+
+def list_usernames(users_table):
+    usernames = []
+    scan_kwargs = {'ProjectionExpression': 'bskyUsername'}
+    while True:
+        response = users_table.scan(**scan_kwargs)
+        usernames.extend(item['bskyUsername'] for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return usernames
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def backfill_rollups(db_mode: str, bsky_usernames=None):
+    """
+    Rebuilds the category rollups of the given users (default: every user in BSKY_USERS).
+
+    Returns:
+        Dict[str, Tuple[int, int]]: The number of posts read and days written per user.
+    """
+    bsky_dynamodb = TerpSearchDb(db_mode=db_mode)
+    bsky_dynamodb.create_category_rollups_table()
+    rollups = bsky_dynamodb.get_category_rollups()
+    posts_table = get_dynamodb_table(dynamodb_resource=bsky_dynamodb.dynamodb_resource,
+                                     table_name=DynamoDbConstants.BSKY_POSTS_TABLE_NAME)
+    if not bsky_usernames:
+        users_table = get_dynamodb_table(dynamodb_resource=bsky_dynamodb.dynamodb_resource,
+                                         table_name=DynamoDbConstants.BSKY_USERS_TABLE_NAME)
+        bsky_usernames = list_usernames(users_table)
+
+    trends_cache = TrendsCache.from_env()
+
+    results = {}
+    for bsky_username in bsky_usernames:
+        start_time = time.time()
+        results[bsky_username] = rollups.rebuild(posts_table=posts_table, bsky_username=bsky_username)
+        post_count, day_count = results[bsky_username]
+        print(f'✅ ({bsky_username}) -> Rolled up {post_count} posts into {day_count} days '
+              f'in {time.time() - start_time:.2f}s')
+        if trends_cache:
+            try:
+                trends_cache.bump_generation(bsky_username)
+            except Exception as e:
+                print(f'⚠️ ({bsky_username}) -> Failed to invalidate cached trends: {e}')
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build per-day category rollups for posts already in BSKY_POSTS.')
+    parser.add_argument('usernames', nargs='*', help='Bluesky usernames to backfill (default: every user)')
+    args = parser.parse_args()
+    backfill_rollups(db_mode=DynamoDbConstants.DB_MODE, bsky_usernames=args.usernames)
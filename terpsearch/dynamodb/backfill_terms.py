@@ -0,0 +1,52 @@
+import argparse
+import time
+from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+from terpsearch.dynamodb.TerpSearchDb import TerpSearchDb
+from terpsearch.dynamodb.backfill_rollups import list_usernames
+from terpsearch.dynamodb.dynamodb_helpers import get_dynamodb_table
+
+"""
+Builds (or repairs) the BSKY_POST_TERMS keyword search index from the posts already stored in BSKY_POSTS.
+
+New posts are indexed at write time; this command is only needed for data written before the index existed, or to
+rebuild it after a failed index update. Each user's index is dropped and rebuilt from scratch, so the command is safe to
+run repeatedly. Keyword searches of a user return partial results while that user is being rebuilt, and posts written
+for the user during the rebuild may be indexed twice; run it again for that user if ingestion was active.
+
+Usage:
+    python -m terpsearch.dynamodb.backfill_terms [usernames ...]
+"""
+
+
+def backfill_terms(db_mode: str, bsky_usernames=None):
+    """
+    Rebuilds the keyword search index of the given users (default: every user in BSKY_USERS).
+
+    Returns:
+        Dict[str, Tuple[int, int]]: The number of posts indexed and segments written per user.
+    """
+    bsky_dynamodb = TerpSearchDb(db_mode=db_mode)
+    bsky_dynamodb.create_post_terms_table()
+    term_index = bsky_dynamodb.get_post_term_index()
+    posts_table = get_dynamodb_table(dynamodb_resource=bsky_dynamodb.dynamodb_resource,
+                                     table_name=DynamoDbConstants.BSKY_POSTS_TABLE_NAME)
+    if not bsky_usernames:
+        users_table = get_dynamodb_table(dynamodb_resource=bsky_dynamodb.dynamodb_resource,
+                                         table_name=DynamoDbConstants.BSKY_USERS_TABLE_NAME)
+        bsky_usernames = list_usernames(users_table)
+
+    results = {}
+    for bsky_username in bsky_usernames:
+        start_time = time.time()
+        results[bsky_username] = term_index.rebuild(posts_table=posts_table, bsky_username=bsky_username)
+        post_count, segment_count = results[bsky_username]
+        print(f'✅ ({bsky_username}) -> Indexed {post_count} posts in {segment_count} segments '
+              f'in {time.time() - start_time:.2f}s')
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the keyword search index for posts already in BSKY_POSTS.')
+    parser.add_argument('usernames', nargs='*', help='Bluesky usernames to backfill (default: every user)')
+    args = parser.parse_args()
+    backfill_terms(db_mode=DynamoDbConstants.DB_MODE, bsky_usernames=args.usernames)
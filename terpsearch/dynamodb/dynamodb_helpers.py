@@ -1,70 +1,42 @@
-import atproto
 import boto3
 import uuid
 import os
 from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
 from terpsearch.dynamodb.BskySessionEncryptor import BskySessionEncryptor
-from atproto.exceptions import AtProtocolError
-from atproto.exceptions import TokenExpiredSignatureError
+from terpsearch.dynamodb.DynamoDbRegistry import dynamodb_registry
+from terpsearch.dynamodb.schema_cache import describe_table_cached
 
 
 def get_dynamodb_resource(db_mode: str):
     """
-    Returns a boto3 DynamoDB resource configured for the given environment.
+    Returns the process-wide boto3 DynamoDB resource configured for the given environment.
 
     Args:
         db_mode (str): Deployment mode. Use 'PROD' for production; otherwise, development settings are used.
 
     Returns:
-        boto3.resources.factory.dynamodb.ServiceResource: A DynamoDB resource object.
+        boto3.resources.factory.dynamodb.ServiceResource: A DynamoDB resource object shared by the whole process.
     """
-    if db_mode.upper() == 'PROD':
-        return boto3.resource(
-            'dynamodb',
-            region_name=DynamoDbConstants.DYNAMODB_REGION,
-            aws_access_key_id=DynamoDbConstants.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=DynamoDbConstants.AWS_SECRET_ACCESS_KEY_ID
-        )
-    elif db_mode.upper() == 'DEV':
-        return boto3.resource(
-            'dynamodb',
-            region_name=DynamoDbConstants.DYNAMODB_REGION,
-            aws_access_key_id='dummy',
-            aws_secret_access_key='dummy',
-            endpoint_url=DynamoDbConstants.DYNAMODB_URL
-        )
+    return dynamodb_registry.resource(db_mode=db_mode)
 
 
 def get_dynamodb_client(db_mode: str):
     """
-    Returns a low-level boto3 DynamoDB client configured for the given environment.
+    Returns the process-wide low-level boto3 DynamoDB client configured for the given environment. It is the client
+    behind get_dynamodb_resource(), so both share one connection pool.
 
     Args:
         db_mode (str): Deployment mode. Use 'PROD' for production; otherwise, development settings are used.
 
     Returns:
-        botocore.client.DynamoDB: A DynamoDB client object.
+        botocore.client.DynamoDB: A DynamoDB client object shared by the whole process.
     """
-    if db_mode.upper() == 'PROD':
-        return boto3.client(
-            'dynamodb',
-            region_name=DynamoDbConstants.DYNAMODB_REGION,
-            aws_access_key_id=DynamoDbConstants.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=DynamoDbConstants.AWS_SECRET_ACCESS_KEY_ID
-        )
-    elif db_mode.upper() == 'DEV':
-        return boto3.client(
-            'dynamodb',
-            region_name=DynamoDbConstants.DYNAMODB_REGION,
-            aws_access_key_id='dummy',
-            aws_secret_access_key='dummy',
-            endpoint_url=DynamoDbConstants.DYNAMODB_URL
-        )
+    return dynamodb_registry.client(db_mode=db_mode)
 
 
 def get_dynamodb_table(dynamodb_resource: boto3.resource, table_name: str):
     """
-    Retrieves a reference to a DynamoDB table by name using a provided resource.
+    Retrieves a (cached) reference to a DynamoDB table by name using a provided resource.
 
     Args:
         dynamodb_resource (boto3.resource): The DynamoDB resource object.
@@ -73,13 +45,12 @@ def get_dynamodb_table(dynamodb_resource: boto3.resource, table_name: str):
     Returns:
         boto3.dynamodb.Table: The table object reference.
     """
-    table = dynamodb_resource.Table(table_name)
-    return table
+    return dynamodb_registry.table(dynamodb_resource=dynamodb_resource, table_name=table_name)
 
 
 def table_exists(client: boto3.client, table_name: str):
     """
-    Checks whether a DynamoDB table exists.
+    Checks whether a DynamoDB table exists with a (cached) describe_table call.
 
     Args:
         client (boto3.client): The DynamoDB client object.
@@ -88,13 +59,7 @@ def table_exists(client: boto3.client, table_name: str):
     Returns:
         bool: True if the table exists, False otherwise.
     """
-    exists = False
-    tables = client.list_tables()
-
-    if table_name in tables['TableNames']:
-        exists = True
-
-    return exists
+    return describe_table_cached(client=client, table_name=table_name) is not None
 
 
 def stable_hash(input: str):
@@ -114,21 +79,42 @@ def get_user_cursor(table, username):
     return
 
 
-def update_expired_client(bsky_client, table, bsky_username, bsky_password):
-    encryptor = BskySessionEncryptor()
-    bsky_client.login(bsky_username, bsky_password)
-    new_session_token = bsky_client.export_session_string()
+def store_session_token(table, bsky_username: str, encrypted_token: str, user_metadata=None):
+    """
+    Persists an encrypted session token immediately, so a new login is never lost when the ingestion that triggered
+    it stops early.
+
+    Args:
+        table (boto3.resources.factory.dynamodb.Table): The DynamoDB users table.
+        bsky_username (str): The user's Bluesky handle.
+        encrypted_token (str): The encrypted session string.
+        user_metadata (BskyUserMetadata): Optional metadata to write the token through, which keeps its in-memory view
+            of the row current.
+    """
+    if user_metadata is not None:
+        user_metadata.set('session_token', encrypted_token)
+        user_metadata.save(attributes=['session_token'])
+        return
+
     table.update_item(
         Key={'bskyUsername': bsky_username},
         UpdateExpression='SET session_token = :token',
         ExpressionAttributeValues={
-            ':token': encryptor.encrypt(new_session_token)
+            ':token': encrypted_token
         }
     )
+
+
+def update_expired_client(bsky_client, table, bsky_username, bsky_password, user_metadata=None):
+    encryptor = BskySessionEncryptor()
+    bsky_client.login(bsky_username, bsky_password)
+    new_session_token = bsky_client.export_session_string()
+    store_session_token(table=table, bsky_username=bsky_username, encrypted_token=encryptor.encrypt(new_session_token),
+                        user_metadata=user_metadata)
     return bsky_client
 
 
-def create_session(client: atproto.Client, bsky_username: str, bsky_password: str, table):
+def create_session(client: 'atproto.Client', bsky_username: str, bsky_password: str, table, user_metadata=None):
     """
     Authenticates a new Bluesky client session and stores the encrypted session token in DynamoDB.
 
@@ -140,10 +126,15 @@ def create_session(client: atproto.Client, bsky_username: str, bsky_password: st
         bsky_username (str): The user's Bluesky handle.
         bsky_password (str): The user's Bluesky app password.
         table (boto3.resources.factory.dynamodb.Table): The DynamoDB users table.
+        user_metadata (BskyUserMetadata): Optional metadata to write the token through (it is still written
+            immediately), which keeps its in-memory view of the row current.
 
     Returns:
         atproto.Client or None: The authenticated client if successful; None otherwise.
     """
+    # atproto is only needed once a session is created, so it is not loaded when the module is imported
+    from atproto.exceptions import AtProtocolError, TokenExpiredSignatureError
+
     encryptor = ''
     try:
         print(f'Creating new session for {bsky_username}')
@@ -153,13 +144,8 @@ def create_session(client: atproto.Client, bsky_username: str, bsky_password: st
         print(f'Added an active session token for {bsky_username}')
         print("Logged in successfully!")
         session_token = client.export_session_string()
-        table.update_item(
-            Key={'bskyUsername': bsky_username},
-            UpdateExpression='SET session_token = :token',
-            ExpressionAttributeValues={
-                ':token': encryptor.encrypt(session_token)
-            }
-        )
+        store_session_token(table=table, bsky_username=bsky_username, encrypted_token=encryptor.encrypt(session_token),
+                            user_metadata=user_metadata)
         return client
     except AtProtocolError as e:
         print("*** The existing token has expired! ***")
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import time
+from botocore.exceptions import ClientError
+
+"""
+Cached DynamoDB schema bootstrap.
+
+App and worker boots used to verify every table with an unpaginated `list_tables()` call (wrong past 100 tables and
+one round trip per check). Tables are now verified with one `describe_table` per required table, and the description
+of ACTIVE tables is cached:
+    - in-process, so repeated checks within a process are free;
+    - optionally in Redis (`SCHEMA_CACHE_REDIS_URL`, `SCHEMA_CACHE_TTL`), so every worker after the first skips the
+      round trip as well.
+Missing or not-yet-ACTIVE tables are never cached, so table creation always sees the live state.
+
+With `TRUSTED_SCHEMA=true` (deployments whose tables are provisioned out of band) verification is skipped entirely.
+"""
+
+SCHEMA_CACHE_PREFIX = 'schema:dynamodb'
+SCHEMA_CACHE_TTL = int(os.getenv('SCHEMA_CACHE_TTL', '3600'))
+
+_schema_cache = {}
+_schema_cache_lock = threading.Lock()
+_redis_client = None
+
+
+def is_trusted_schema() -> bool:
+    return os.getenv('TRUSTED_SCHEMA', 'false').lower() == 'true'
+
+
+def _get_redis_client():
+    global _redis_client
+    redis_url = os.getenv('SCHEMA_CACHE_REDIS_URL')
+    if not redis_url:
+        return None
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.from_url(redis_url)
+    return _redis_client
+
+
+def _cache_key(client, table_name: str) -> str:
+    # DEV and PROD tables share names, so the endpoint is part of the key
+    return f'{SCHEMA_CACHE_PREFIX}:{client.meta.endpoint_url}:{table_name}'
+
+
+def _summarize(table: dict) -> dict:
+    return {
+        'status': table['TableStatus'],
+        'key_schema': table.get('KeySchema', []),
+        'indexes': sorted(index['IndexName'] for index in table.get('GlobalSecondaryIndexes', []))
+    }
+
+
+def describe_table_cached(client, table_name: str):
+    """
+    Returns a summary of a table's schema and status, served from the in-process or Redis cache when possible.
+
+    Args:
+        client (boto3.client): The DynamoDB client object.
+        table_name (str): The name of the table.
+
+    Returns:
+        dict: The table's 'status', 'key_schema' and 'indexes', or None if the table does not exist.
+    """
+    key = _cache_key(client, table_name)
+    summary = _schema_cache.get(key)
+    if summary is not None:
+        return summary
+
+    redis_client = _get_redis_client()
+    if redis_client is not None:
+        try:
+            cached = redis_client.get(key)
+            if cached is not None:
+                summary = json.loads(cached)
+                with _schema_cache_lock:
+                    _schema_cache[key] = summary
+                return summary
+        except Exception as e:
+            print(f'⚠️ Schema cache unavailable, describing {table_name} directly: {e}')
+            redis_client = None
+
+    try:
+        summary = _summarize(client.describe_table(TableName=table_name)['Table'])
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ResourceNotFoundException':
+            return None
+        raise
+
+    if summary['status'] == 'ACTIVE':
+        with _schema_cache_lock:
+            _schema_cache[key] = summary
+        if redis_client is not None:
+            try:
+                redis_client.set(key, json.dumps(summary), ex=SCHEMA_CACHE_TTL)
+            except Exception as e:
+                print(f'⚠️ Could not share the {table_name} schema through Redis: {e}')
+    return summary
+
+
+def forget_table(client, table_name: str):
+    """
+    Drops a table from the in-process and Redis caches (e.g. after deleting or recreating it).
+    """
+    key = _cache_key(client, table_name)
+    with _schema_cache_lock:
+        _schema_cache.pop(key, None)
+    redis_client = _get_redis_client()
+    if redis_client is not None:
+        redis_client.delete(key)
+
+
+def bootstrap_tables(client, table_creators: dict, trusted: bool = None):
+    """
+    Makes sure every required table exists, creating the missing ones.
+
+    Args:
+        client (boto3.client): The DynamoDB client object.
+        table_creators (Dict[str, Callable]): Required table names mapped to the function that creates the table.
+        trusted (bool): Skip verification entirely (defaults to the TRUSTED_SCHEMA environment variable).
+
+    Returns:
+        dict: Seconds spent per table (empty in trusted-schema mode) and in total.
+    """
+    trusted = is_trusted_schema() if trusted is None else trusted
+    timings = {'tables': {}, 'total': 0.0, 'trusted': trusted}
+    if trusted:
+        print('Trusted schema mode: skipping DynamoDB table verification')
+        return timings
+
+    start_time = time.perf_counter()
+    for table_name, create_table in table_creators.items():
+        table_start = time.perf_counter()
+        if describe_table_cached(client, table_name) is None:
+            create_table()
+        timings['tables'][table_name] = time.perf_counter() - table_start
+    timings['total'] = time.perf_counter() - start_time
+    return timings
@@ -0,0 +1,76 @@
+from terpsearch.dynamodb.dynamodb_helpers import *
+from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+import botocore.exceptions
+
+
+class BskyCategoryRollupsTable:
+    """
+    Handles the dynamodb table schema used to create the BSKY_CATEGORY_ROLLUPS DynamoDB table.
+
+    This table stores per-day category counts of each user's timeline, so trends read one small item per day instead
+    of every post in the range.
+
+    Each item in the table includes:
+    - bskyUsername: The Bluesky username (partition key).
+    - day: The UTC day of the counted posts, e.g. '2025-04-03' (sort key).
+    - posts: The number of posts of that day.
+    - category:<name>: One counter per category (e.g. 'category:sports'), incremented with atomic ADD updates.
+    """
+
+    def __init__(self, db_mode: str):
+        """
+        Initializes a BskyCategoryRollupsTable instance by making the DynamoDB resource and client objects readily
+        available
+        """
+        self.dynamodb_resource = get_dynamodb_resource(db_mode=db_mode)
+        self.dynamodb_client = get_dynamodb_client(db_mode=db_mode)
+
+    def create_table(self):
+        """
+        Creates the BSKY_CATEGORY_ROLLUPS table with 'bskyUsername' as the partition key and 'day' as the sort key.
+
+        Returns:
+            None
+        """
+        try:
+            rollups_table_exists = table_exists(client=self.dynamodb_client,
+                                                table_name=DynamoDbConstants.BSKY_CATEGORY_ROLLUPS_TABLE_NAME)
+            if rollups_table_exists is True:
+                print(f'✅{DynamoDbConstants.BSKY_CATEGORY_ROLLUPS_TABLE_NAME} table already exists')
+                return
+            else:
+                print(f'🚧Creating {DynamoDbConstants.BSKY_CATEGORY_ROLLUPS_TABLE_NAME}...')
+                table = self.dynamodb_resource.create_table(
+                    TableName=DynamoDbConstants.BSKY_CATEGORY_ROLLUPS_TABLE_NAME,
+                    KeySchema=[
+                        {
+                            'AttributeName': 'bskyUsername',
+                            'KeyType': 'HASH'  # Partition key
+                        },
+                        {
+                            'AttributeName': 'day',
+                            'KeyType': 'RANGE'  # Sort key
+                        }
+                    ],
+                    AttributeDefinitions=[
+                        {
+                            'AttributeName': 'bskyUsername',
+                            'AttributeType': 'S'
+                        },
+                        {
+                            'AttributeName': 'day',
+                            'AttributeType': 'S'
+                        }
+                    ],
+                    BillingMode='PAY_PER_REQUEST'
+                )
+                table.wait_until_exists()
+                print(f"✅{DynamoDbConstants.BSKY_CATEGORY_ROLLUPS_TABLE_NAME} table created successfully.")
+
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceInUseException':
+                print(f"⚠️ {DynamoDbConstants.BSKY_CATEGORY_ROLLUPS_TABLE_NAME} is being created by another process. "
+                      f"Skipping.")
+            else:
+                print(f'🚨DynamoDB error when trying to create {DynamoDbConstants.BSKY_CATEGORY_ROLLUPS_TABLE_NAME} '
+                      f'table: {e}')
@@ -0,0 +1,79 @@
+from terpsearch.dynamodb.dynamodb_helpers import *
+from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+import botocore.exceptions
+
+
+class BskyPostTermsTable:
+    """
+    Handles the dynamodb table schema used to create the BSKY_POST_TERMS DynamoDB table.
+
+    This table stores the keyword search inverted index of each user's posts (see PostTermIndex), so a query reads only
+    the postings of its terms instead of every post.
+
+    Each item in the table includes:
+    - bskyUsername: The Bluesky username (partition key).
+    - segment: The item kind and position (sort key):
+        - 'stats': the number of indexed posts, their total length in terms, and the next free document number.
+        - 't#<term>#<first document>': the compressed postings of one term in one write batch.
+        - 'd#<first document>': the bskyPostHash of every document of one write batch.
+        - 'p#<bskyPostHash>': the claim marker of a post already counted in the category rollups and indexed, written
+          with a conditional put so concurrent writers never count a post twice.
+    """
+
+    def __init__(self, db_mode: str):
+        """
+        Initializes a BskyPostTermsTable instance by making the DynamoDB resource and client objects readily
+        available
+        """
+        self.dynamodb_resource = get_dynamodb_resource(db_mode=db_mode)
+        self.dynamodb_client = get_dynamodb_client(db_mode=db_mode)
+
+    def create_table(self):
+        """
+        Creates the BSKY_POST_TERMS table with 'bskyUsername' as the partition key and 'segment' as the sort key.
+
+        Returns:
+            None
+        """
+        try:
+            terms_table_exists = table_exists(client=self.dynamodb_client,
+                                             table_name=DynamoDbConstants.BSKY_POST_TERMS_TABLE_NAME)
+            if terms_table_exists is True:
+                print(f'✅{DynamoDbConstants.BSKY_POST_TERMS_TABLE_NAME} table already exists')
+                return
+            else:
+                print(f'🚧Creating {DynamoDbConstants.BSKY_POST_TERMS_TABLE_NAME}...')
+                table = self.dynamodb_resource.create_table(
+                    TableName=DynamoDbConstants.BSKY_POST_TERMS_TABLE_NAME,
+                    KeySchema=[
+                        {
+                            'AttributeName': 'bskyUsername',
+                            'KeyType': 'HASH'  # Partition key
+                        },
+                        {
+                            'AttributeName': 'segment',
+                            'KeyType': 'RANGE'  # Sort key
+                        }
+                    ],
+                    AttributeDefinitions=[
+                        {
+                            'AttributeName': 'bskyUsername',
+                            'AttributeType': 'S'
+                        },
+                        {
+                            'AttributeName': 'segment',
+                            'AttributeType': 'S'
+                        }
+                    ],
+                    BillingMode='PAY_PER_REQUEST'
+                )
+                table.wait_until_exists()
+                print(f"✅{DynamoDbConstants.BSKY_POST_TERMS_TABLE_NAME} table created successfully.")
+
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] == 'ResourceInUseException':
+                print(f"⚠️ {DynamoDbConstants.BSKY_POST_TERMS_TABLE_NAME} is being created by another process. "
+                      f"Skipping.")
+            else:
+                print(f'🚨DynamoDB error when trying to create {DynamoDbConstants.BSKY_POST_TERMS_TABLE_NAME} '
+                      f'table: {e}')
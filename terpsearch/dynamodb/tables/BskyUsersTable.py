@@ -16,6 +16,8 @@ class BskyUsersTable:
         API requests on behalf of the user.
     3) Last Sync Timestamp (cursor_last_checked): An ISO 8601 UTC timestamp (e.g., '2025-04-03T15:55:39.665Z')
         indicating when the user's Bluesky feed was last synced.
+    4) Partial Fetch Cursor (backfill_cursor / backfill_until): Present only when the last fetch ran out of budget.
+        The Bluesky pagination cursor to resume from, and the timestamp at which the resumed fetch should stop.
     """
 
     def __init__(self, db_mode: str):
@@ -0,0 +1,102 @@
+import json
+import os
+from datetime import date
+
+"""
+TrendsCache: Redis cache of computed trends charts, invalidated by ingestion.
+
+Entries are keyed on the normalized query (user, start date, end date) plus the user's current generation number:
+    trends:chart:{user}:{generation}:{start_date}:{end_date}:{view}
+The categorization worker bumps the user's generation (`trends:gen:{user}`) after it writes new posts, so every
+chart cached for that user becomes unreachable at once while other users' charts stay cached. Unreachable entries
+simply expire with the TTL.
+
+Redis errors never fail a trends request: a failed lookup is treated as a miss and a failed write is ignored.
+"""
+
+TRENDS_CACHE_PREFIX = 'trends'
+TRENDS_CACHE_TTL = int(os.getenv('TRENDS_CACHE_TTL', '600'))
+
+
+class TrendsCache:
+    def __init__(self, redis_client, ttl: int = TRENDS_CACHE_TTL):
+        """
+        Initializes a TrendsCache.
+
+        Args:
+            redis_client (redis.Redis): The Redis client.
+            ttl (int): Seconds a computed chart stays cached.
+        """
+        self.redis_client = redis_client
+        self.ttl = ttl
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds a TrendsCache from TRENDS_CACHE_ENABLED / REDIS_URL / TRENDS_CACHE_TTL, or returns None if disabled.
+        """
+        if os.getenv('TRENDS_CACHE_ENABLED', 'true').lower() != 'true':
+            return None
+        import redis
+        return cls(redis_client=redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0')))
+
+    @staticmethod
+    def normalize_user(bsky_username: str) -> str:
+        return bsky_username.strip().lower()
+
+    @staticmethod
+    def generation_key(bsky_username: str) -> str:
+        return f'{TRENDS_CACHE_PREFIX}:gen:{TrendsCache.normalize_user(bsky_username)}'
+
+    def key_for(self, bsky_username: str, start_date: str, end_date: str, view: str = 'totals'):
+        """
+        Returns the cache key of a trends query at the user's current generation.
+
+        Args:
+            bsky_username (str): The Bluesky username.
+            start_date (str): Start day ('YYYY-MM-DD').
+            end_date (str): End day ('YYYY-MM-DD').
+            view (str): The chart type ('totals', or a time-series granularity such as 'week').
+
+        Returns:
+            str: The cache key, or None if Redis is unavailable or the dates are not valid.
+        """
+        try:
+            generation = int(self.redis_client.get(TrendsCache.generation_key(bsky_username)) or 0)
+        except Exception as e:
+            print(f'⚠️ Trends cache unavailable: {e}')
+            return None
+        try:
+            start_date = date.fromisoformat(start_date).isoformat()
+            end_date = date.fromisoformat(end_date).isoformat()
+        except ValueError:
+            return None
+        return (f'{TRENDS_CACHE_PREFIX}:chart:{TrendsCache.normalize_user(bsky_username)}:{generation}:'
+                f'{start_date}:{end_date}:{view}')
+
+    def get(self, key: str):
+        if key is None:
+            return None
+        try:
+            cached = self.redis_client.get(key)
+        except Exception as e:
+            print(f'⚠️ Trends cache lookup failed: {e}')
+            return None
+        return json.loads(cached) if cached is not None else None
+
+    def set(self, key: str, value: dict):
+        if key is None:
+            return
+        try:
+            self.redis_client.set(key, json.dumps(value), ex=self.ttl)
+        except Exception as e:
+            print(f'⚠️ Could not cache trends result: {e}')
+
+    def bump_generation(self, bsky_username: str) -> int:
+        """
+        Invalidates every cached chart of a user by moving the user to a new generation.
+
+        Returns:
+            int: The user's new generation.
+        """
+        return self.redis_client.incr(TrendsCache.generation_key(bsky_username))
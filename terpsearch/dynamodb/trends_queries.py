@@ -0,0 +1,116 @@
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from boto3.dynamodb.conditions import Key
+
+"""
+Trends data path over the BSKY_POSTS `UserTimestampIndex`.
+
+A user's posts in a date range are read with fully paginated queries (following `LastEvaluatedKey`) that project only
+the attributes trends need. Wide ranges are split into sub-ranges that are queried concurrently from a thread pool,
+and every page is handed to a callback as soon as it arrives, so no query result is ever buffered as a whole.
+
+Sub-ranges are split on bare dates (e.g. '2025-01-05'). Stored timestamps always carry a time component, so no item
+ever equals a boundary and the inclusive `between` conditions of neighbouring sub-ranges never overlap.
+"""
+
+USER_TIMESTAMP_INDEX = 'UserTimestampIndex'
+TRENDS_PROJECTION = ['category', 'timestamp']
+TRENDS_QUERY_WORKERS = int(os.getenv('TRENDS_QUERY_WORKERS', '8'))
+TRENDS_DAYS_PER_SEGMENT = int(os.getenv('TRENDS_DAYS_PER_SEGMENT', '30'))
+
+
+def split_date_range(start_iso: str, end_iso: str, days_per_segment: int = TRENDS_DAYS_PER_SEGMENT,
+                     max_segments: int = TRENDS_QUERY_WORKERS):
+    """
+    Splits an ISO 8601 timestamp range into contiguous, non-overlapping sub-ranges of whole days.
+
+    Args:
+        start_iso (str): Inclusive start timestamp (e.g. '2025-01-01T00:00:00Z').
+        end_iso (str): Inclusive end timestamp (e.g. '2025-03-31T23:59:59Z').
+        days_per_segment (int): Minimum number of days per sub-range.
+        max_segments (int): Maximum number of sub-ranges.
+
+    Returns:
+        List[Tuple[str, str]]: (start, end) bounds for `Key('timestamp').between()`, in chronological order.
+    """
+    first_day = date.fromisoformat(start_iso[:10])
+    last_day = date.fromisoformat(end_iso[:10])
+    total_days = (last_day - first_day).days + 1
+    segments = max(1, min(max_segments, total_days // max(days_per_segment, 1)))
+    if segments == 1:
+        return [(start_iso, end_iso)]
+
+    step = -(-total_days // segments)
+    boundaries = [(first_day + timedelta(days=step * i)).isoformat() for i in range(1, segments)
+                  if step * i < total_days]
+    lower_bounds = [start_iso] + boundaries
+    upper_bounds = boundaries + [end_iso]
+    return list(zip(lower_bounds, upper_bounds))
+
+
+def query_user_posts(posts_table, bsky_username: str, start_iso: str, end_iso: str, on_page,
+                     projection=TRENDS_PROJECTION, max_workers: int = TRENDS_QUERY_WORKERS,
+                     days_per_segment: int = TRENDS_DAYS_PER_SEGMENT):
+    """
+    Reads every post of a user between two timestamps and passes each page of items to `on_page`.
+
+    Args:
+        posts_table (boto3.dynamodb.Table): The BSKY_POSTS table.
+        bsky_username (str): The Bluesky username.
+        start_iso (str): Inclusive start timestamp.
+        end_iso (str): Inclusive end timestamp.
+        on_page (Callable[[List[dict]], None]): Called once per page. Calls are serialized, so it does not need to be
+            thread-safe.
+        projection (List[str]): Attributes to fetch.
+        max_workers (int): Maximum number of sub-ranges queried concurrently.
+        days_per_segment (int): Minimum number of days per sub-range.
+
+    Returns:
+        int: The number of items read.
+    """
+    names = {f'#p{i}': attribute for i, attribute in enumerate(projection)}
+    page_lock = threading.Lock()
+
+    def query_segment(bounds):
+        query_kwargs = {
+            'IndexName': USER_TIMESTAMP_INDEX,
+            'KeyConditionExpression': Key('bskyUsername').eq(bsky_username) & Key('timestamp').between(*bounds),
+            'ProjectionExpression': ', '.join(names),
+            'ExpressionAttributeNames': names
+        }
+        item_count = 0
+        while True:
+            response = posts_table.query(**query_kwargs)
+            items = response.get('Items', [])
+            item_count += len(items)
+            with page_lock:
+                on_page(items)
+            if 'LastEvaluatedKey' not in response:
+                return item_count
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    segments = split_date_range(start_iso, end_iso, days_per_segment=days_per_segment, max_segments=max_workers)
+    if len(segments) == 1:
+        return query_segment(segments[0])
+    with ThreadPoolExecutor(max_workers=len(segments), thread_name_prefix='trends-query') as executor:
+        return sum(executor.map(query_segment, segments))
+
+
+def count_categories(posts_table, bsky_username: str, start_iso: str, end_iso: str, **query_kwargs):
+    """
+    Counts a user's posts per category between two timestamps.
+
+    Returns:
+        Tuple[Counter, int]: The per-category counts and the number of posts read.
+    """
+    category_counter = Counter()
+
+    def count_page(items):
+        for item in items:
+            category_counter.update(item.get('category', []))
+
+    post_count = query_user_posts(posts_table, bsky_username, start_iso, end_iso, on_page=count_page, **query_kwargs)
+    return category_counter, post_count
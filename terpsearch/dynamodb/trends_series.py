@@ -0,0 +1,206 @@
+import numpy as np
+from terpsearch.dynamodb.CategoryRollups import CategoryRollups
+from terpsearch.dynamodb.trends_queries import query_user_posts
+
+"""
+Vectorized category time series for trends.
+
+Posts (and per-day rollups, for the days they cover) are loaded into NumPy arrays of days, category codes and counts, then binned
+by day, ISO week (starting on Monday) or calendar month with a single `np.bincount` over (bin, category) pairs instead
+of Python loops over every post. Empty bins inside the requested range are kept so the series line up on one axis.
+"""
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def bin_starts(days, granularity: str):
+    """
+    Maps datetime64[D] days to the first day of their bin.
+
+    Args:
+        days (np.ndarray): Days as datetime64[D].
+        granularity (str): 'day', 'week' or 'month'.
+
+    Returns:
+        np.ndarray: The first day of each day's bin, as datetime64[D].
+    """
+    if granularity == 'day':
+        return days
+    if granularity == 'week':
+        # 1970-01-01 (day 0) was a Thursday, so Monday-based weekdays are (day + 3) % 7
+        return days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    if granularity == 'month':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f'Unknown granularity {granularity!r}; expected one of {GRANULARITIES}')
+
+
+def parse_days(day_values):
+    """
+    Converts 'YYYY-MM-DD...' strings to datetime64[D] by slicing the digits out of a fixed-width byte array, which is
+    much faster than letting NumPy parse every string.
+    """
+    if isinstance(day_values, np.ndarray) and np.issubdtype(day_values.dtype, np.datetime64):
+        return day_values.astype('datetime64[D]')
+    if len(day_values) == 0:
+        return np.array([], dtype='datetime64[D]')
+    digits = (np.asarray(day_values, dtype='S10').view(np.uint8).reshape(-1, 10) - ord('0')).astype(np.int64)
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    return months.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')
+
+
+def encode_categories(categories):
+    """
+    Returns (labels, codes) for a sequence of category names, with codes in first-seen order.
+    """
+    index = {}
+    codes = np.fromiter((index.setdefault(category, len(index)) for category in categories), dtype=np.int64,
+                        count=len(categories))
+    return np.array(list(index), dtype=str), codes
+
+
+def bin_axis(start_date: str, end_date: str, granularity: str):
+    """
+    Returns the first day of every bin between two dates (inclusive), as datetime64[D].
+    """
+    first, last = bin_starts(np.array([start_date, end_date], dtype='datetime64[D]'), granularity)
+    if granularity == 'month':
+        return np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + 1).astype('datetime64[D]')
+    step = 7 if granularity == 'week' else 1
+    return np.arange(first, last + 1, step)
+
+
+def build_series(days, categories, counts, post_days, post_counts, granularity: str, start_date: str,
+                 end_date: str):
+    """
+    Bins category counts into a time series.
+
+    Args:
+        days (Sequence[str] or np.ndarray): The day ('YYYY-MM-DD' or datetime64) of every (day, category) observation.
+        categories (Sequence[str]): The category of every observation.
+        counts (Sequence[int]): How many posts every observation stands for (1 per post label, N per rollup counter).
+        post_days (Sequence[str]): The day of every post count in `post_counts`.
+        post_counts (Sequence[int]): Number of posts per entry of `post_days`.
+        granularity (str): 'day', 'week' or 'month'.
+        start_date (str): First day of the range ('YYYY-MM-DD').
+        end_date (str): Last day of the range ('YYYY-MM-DD').
+
+    Returns:
+        dict: 'granularity', 'bins' (ISO first day of each bin), 'categories' (sorted by total), 'counts' and 'shares'
+            (one list per category, aligned with 'bins') and 'posts' (posts per bin).
+    """
+    axis = bin_axis(start_date, end_date, granularity)
+    n_bins = len(axis)
+
+    def bin_indices(day_values):
+        # Observations outside the axis (which range queries should never return) are dropped
+        starts = bin_starts(parse_days(day_values), granularity)
+        indices = np.searchsorted(axis, starts)
+        in_range = (indices < n_bins) & (starts >= axis[0])
+        return indices, in_range
+
+    labels, category_codes = encode_categories(categories)
+    n_categories = len(labels)
+
+    matrix = np.zeros((n_categories, n_bins), dtype=np.int64)
+    if n_categories:
+        indices, in_range = bin_indices(days)
+        flat = category_codes[in_range] * n_bins + indices[in_range]
+        weights = np.asarray(counts, dtype=np.int64)[in_range]
+        matrix = np.bincount(flat, weights=weights, minlength=n_categories * n_bins).astype(np.int64)
+        matrix = matrix.reshape(n_categories, n_bins)
+
+    posts = np.zeros(n_bins, dtype=np.int64)
+    if len(post_days):
+        indices, in_range = bin_indices(post_days)
+        posts = np.bincount(indices[in_range], weights=np.asarray(post_counts, dtype=np.int64)[in_range],
+                            minlength=n_bins).astype(np.int64)
+
+    totals = matrix.sum(axis=0)
+    shares = np.divide(matrix, totals, out=np.zeros(matrix.shape, dtype=np.float64), where=totals > 0)
+    # Largest categories first, ties by name
+    order = np.lexsort((labels, -matrix.sum(axis=1))) if n_categories else np.array([], dtype=np.int64)
+
+    return {
+        'granularity': granularity,
+        'bins': [str(day) for day in axis],
+        'categories': labels[order].tolist(),
+        'counts': matrix[order].tolist(),
+        'shares': np.round(shares[order], 4).tolist(),
+        'posts': posts.tolist()
+    }
+
+
+def post_observations(posts):
+    """
+    Returns build_series() observations (days, categories, counts, post_days, post_counts) of posts with a 'timestamp'
+    and a 'category' list.
+    """
+    post_days = parse_days([post['timestamp'] for post in posts])
+    labels_per_post = np.fromiter((len(post.get('category', [])) for post in posts), dtype=np.int64, count=len(posts))
+    categories = [category for post in posts for category in post.get('category', [])]
+    days = np.repeat(post_days, labels_per_post)
+    return days, categories, np.ones(len(days), dtype=np.int64), post_days, np.ones(len(post_days), dtype=np.int64)
+
+
+def rollup_observations(rollup_items):
+    """
+    Returns build_series() observations (days, categories, counts, post_days, post_counts) of BSKY_CATEGORY_ROLLUPS
+    items (one per day).
+    """
+    days, categories, counts, post_days, post_counts = [], [], [], [], []
+    for item in rollup_items:
+        post_days.append(item['day'])
+        post_counts.append(int(item.get(CategoryRollups.POSTS, 0)))
+        for category, count in CategoryRollups.category_counts(item).items():
+            days.append(item['day'])
+            categories.append(category)
+            counts.append(count)
+    return parse_days(days), categories, np.asarray(counts, dtype=np.int64), parse_days(post_days), \
+        np.asarray(post_counts, dtype=np.int64)
+
+
+def series_from_posts(posts, granularity: str, start_date: str, end_date: str):
+    """
+    Builds a category time series from posts with a 'timestamp' and a 'category' list.
+    """
+    return build_series(*post_observations(posts), granularity=granularity, start_date=start_date, end_date=end_date)
+
+
+def series_from_rollups(rollup_items, granularity: str, start_date: str, end_date: str):
+    """
+    Builds a category time series from BSKY_CATEGORY_ROLLUPS items (one per day).
+    """
+    return build_series(*rollup_observations(rollup_items), granularity=granularity, start_date=start_date,
+                        end_date=end_date)
+
+
+def category_series(posts_table, rollups: CategoryRollups, bsky_username: str, granularity: str, start_date: str,
+                    end_date: str):
+    """
+    Returns a user's category time series between two dates. Days the user's rollups are complete for are read from the
+    daily rollups, earlier days (stored before rollups were enabled and not backfilled yet) from the posts.
+
+    Returns:
+        Tuple[dict, str]: The build_series() result and its source ('rollups', 'posts' or 'rollups+posts').
+    """
+    posts_range, rollups_range = rollups.split_range(bsky_username, start_date, end_date)
+    observations, sources = [], []
+    if rollups_range:
+        observations.append(rollup_observations(rollups.iter_days(bsky_username, *rollups_range)))
+        sources.append('rollups')
+    if posts_range:
+        posts = []
+        query_user_posts(posts_table, bsky_username, f'{posts_range[0]}T00:00:00Z', f'{posts_range[1]}T23:59:59Z',
+                         on_page=posts.extend)
+        observations.append(post_observations(posts))
+        sources.append('posts')
+
+    days, categories, counts, post_days, post_counts = zip(*observations)
+    series = build_series(days=np.concatenate(days), categories=[category for part in categories for category in part],
+                          counts=np.concatenate(counts), post_days=np.concatenate(post_days),
+                          post_counts=np.concatenate(post_counts), granularity=granularity, start_date=start_date,
+                          end_date=end_date)
+    return series, '+'.join(sources)
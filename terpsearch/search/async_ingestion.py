@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import time
+import httpx
+from atproto import AsyncClient, SessionEvent
+from atproto_client.request import AsyncRequest
+from atproto.exceptions import AtProtocolError
+from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+from terpsearch.dynamodb.BskySessionEncryptor import BskySessionEncryptor
+from terpsearch.dynamodb.BskyUserMetadata import BskyUserMetadata
+from terpsearch.dynamodb.dynamodb_helpers import get_dynamodb_resource, get_dynamodb_table
+from terpsearch.search.bskySearch import TerpSearch, FETCH_DEADLINE_SECONDS
+
+"""
+AsyncTimelineIngestor: Refreshes the timelines of many linked Bluesky users concurrently.
+
+Every user is ingested by its own coroutine that walks the user's timeline cursor sequentially (page N+1 needs the
+cursor of page N), while many users progress at the same time:
+    - A global semaphore caps the number of Bluesky requests in flight.
+    - All atproto clients share a single httpx.AsyncClient, so keep-alive connections are pooled per host across users.
+    - Sessions are restored from the encrypted `session_token` in BSKY_USERS and refreshed sessions are written back
+      as soon as they change.
+    - Fetching follows TerpSearch.iter_timeline_posts(): it stops at the stored `cursor_last_checked`, is budgeted by
+      `max_posts` and a per-user deadline, and a gap left by an exhausted budget is persisted as
+      `backfill_cursor`/`backfill_until` and finished first on the next run.
+
+Background refreshes do not have the user's password, so users whose stored session can no longer be refreshed are
+reported as failed and picked up again the next time they ingest from the website.
+"""
+
+
+class SharedPoolAsyncRequest(AsyncRequest):
+    """
+    An atproto AsyncRequest that sends through a shared httpx.AsyncClient instead of opening its own connection pool.
+    Auth headers remain per request object (and therefore per user).
+    """
+
+    def __init__(self, http_client: httpx.AsyncClient):
+        super(AsyncRequest, self).__init__()
+        self._client_kwargs = {}
+        self._client = http_client
+
+    def _new_instance(self):
+        return type(self)(self._client)
+
+    async def close(self):
+        # The shared pool is owned and closed by AsyncTimelineIngestor
+        return
+
+
+class AsyncTimelineIngestor:
+    def __init__(self, db_mode: str, fastapi_url: str = DynamoDbConstants.FASTAPI_URL, max_concurrency: int = 16,
+                 max_connections: int = 64, max_keepalive_connections: int = 32, page_limit: int = 100,
+                 max_posts: int = 5000, deadline_seconds: float = FETCH_DEADLINE_SECONDS):
+        """
+        Initializes an AsyncTimelineIngestor.
+
+        Args:
+            db_mode (str): Deployment mode used to reach DynamoDB ('PROD' or 'DEV').
+            fastapi_url (str): Base URL of the FastAPI categorizer service.
+            max_concurrency (int): Global cap on concurrent Bluesky timeline requests.
+            max_connections (int): Maximum number of pooled HTTP connections.
+            max_keepalive_connections (int): Maximum number of idle keep-alive connections kept in the pool.
+            page_limit (int): Number of posts requested per timeline page.
+            max_posts (int): Maximum number of posts ingested per user per run.
+            deadline_seconds (float): Per-user wall-clock budget, counted from the user's first timeline request so
+                that waiting on the concurrency limit does not use it up; None disables the deadline.
+        """
+        self.db_mode = db_mode
+        self.fastapi_url = fastapi_url
+        self.max_concurrency = max_concurrency
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections)
+        self.page_limit = page_limit
+        self.max_posts = max_posts
+        self.deadline_seconds = deadline_seconds
+        self.encryptor = BskySessionEncryptor()
+        self.dynamodb_resource = get_dynamodb_resource(db_mode=db_mode)
+        self.bsky_users_table = get_dynamodb_table(dynamodb_resource=self.dynamodb_resource,
+                                                   table_name=DynamoDbConstants.BSKY_USERS_TABLE_NAME)
+
+    async def _run_blocking(self, fn, *args, **kwargs):
+        # boto3 is synchronous; keep DynamoDB calls off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+
+    async def _restore_client(self, http_client: httpx.AsyncClient, user_metadata: BskyUserMetadata):
+        client = AsyncClient(request=SharedPoolAsyncRequest(http_client))
+        session_token = user_metadata.get(TerpSearch.SESSION_TOKEN)
+        if not session_token:
+            raise AtProtocolError(f'{user_metadata.bsky_username} does not have a stored session')
+
+        async def persist_session(event, session):
+            # Written right away, so a refreshed session survives a failure later in the run
+            if event != SessionEvent.IMPORT:
+                user_metadata.set(TerpSearch.SESSION_TOKEN, self.encryptor.encrypt(session.export()))
+                await self._run_blocking(user_metadata.save, attributes=[TerpSearch.SESSION_TOKEN])
+
+        client.on_session_change(persist_session)
+        await client._import_session_string(self.encryptor.decrypt(session_token))
+        return client
+
+    @staticmethod
+    def _has_budget(budget):
+        if budget['posts'] <= 0:
+            return False
+        return budget['deadline'] is None or time.monotonic() < budget['deadline']
+
+    async def _fetch_segment(self, client: AsyncClient, semaphore: asyncio.Semaphore, start_cursor,
+                             cursor_last_checked: str, budget, posts):
+        """
+        Appends timeline pages starting at `start_cursor` to `posts` until a post that is not newer than
+        `cursor_last_checked` is reached, the timeline ends, or the budget runs out (see
+        TerpSearch.__iter_timeline_segment).
+
+        Returns:
+            dict: 'completed' (False if the budget or an error cut the segment short), 'cursor' (where to resume) and
+                'newest' (timestamp of the newest fetched post).
+        """
+        cursor = start_cursor
+        newest = None
+        while True:
+            if not AsyncTimelineIngestor._has_budget(budget):
+                return {'completed': False, 'cursor': cursor, 'newest': newest}
+            try:
+                async with semaphore:
+                    if budget['deadline'] is None and budget['seconds']:
+                        budget['deadline'] = time.monotonic() + budget['seconds']
+                    # Never request more than the remaining budget so a page is never truncated
+                    timeline = await client.get_timeline(algorithm='reverse-chronological', cursor=cursor,
+                                                         limit=min(self.page_limit, budget['posts']))
+            except Exception as e:
+                print(f'Error fetching posts: {e}')
+                return {'completed': False, 'cursor': cursor, 'newest': newest}
+            if not timeline.feed:
+                break
+
+            page, reached_seen_posts = TerpSearch.parse_timeline_page(feed=timeline.feed,
+                                                                      cursor_last_checked=cursor_last_checked)
+            if page:
+                newest = newest or page[0]['timestamp']
+                posts.extend(page)
+                budget['posts'] -= len(page)
+            next_cursor = getattr(timeline, 'cursor', None)
+            if reached_seen_posts or not next_cursor:
+                break
+            cursor = next_cursor
+        return {'completed': True, 'cursor': None, 'newest': newest}
+
+    async def ingest_user(self, http_client: httpx.AsyncClient, semaphore: asyncio.Semaphore, bsky_username: str,
+                          user_metadata: BskyUserMetadata = None):
+        """
+        Fetches one user's new timeline posts page by page and dispatches them for categorization. The cursors are
+        only saved once the posts were accepted by the categorizer.
+
+        Args:
+            http_client (httpx.AsyncClient): The shared connection pool.
+            semaphore (asyncio.Semaphore): The global concurrency limit.
+            bsky_username (str): The Bluesky username to ingest.
+            user_metadata (BskyUserMetadata): The user's preloaded BSKY_USERS row (loaded on demand if omitted).
+
+        Returns:
+            dict: The username, number of new posts, categorization task id and error (if any).
+        """
+        start_time = time.time()
+        try:
+            if user_metadata is None:
+                user_metadata = await self._run_blocking(BskyUserMetadata.load, users_table=self.bsky_users_table,
+                                                         bsky_username=bsky_username)
+            cursor_last_checked = user_metadata.get(TerpSearch.CURSOR_LAST_CHECKED, '')
+            backfill_cursor = user_metadata.get(TerpSearch.BACKFILL_CURSOR)
+            client = await self._restore_client(http_client, user_metadata)
+
+            budget = {'posts': self.max_posts, 'seconds': self.deadline_seconds, 'deadline': None}
+            posts = []
+
+            # Finish the gap left by a previous run whose budget ran out before starting on newer posts
+            if backfill_cursor:
+                backfill = await self._fetch_segment(client, semaphore, start_cursor=backfill_cursor,
+                                                     cursor_last_checked=user_metadata.get(TerpSearch.BACKFILL_UNTIL,
+                                                                                           ''),
+                                                     budget=budget, posts=posts)
+                if backfill['completed']:
+                    user_metadata.remove(TerpSearch.BACKFILL_CURSOR)
+                    user_metadata.remove(TerpSearch.BACKFILL_UNTIL)
+                    backfill_cursor = None
+                else:
+                    user_metadata.set(TerpSearch.BACKFILL_CURSOR, backfill['cursor'])
+
+            if not backfill_cursor and AsyncTimelineIngestor._has_budget(budget):
+                latest = await self._fetch_segment(client, semaphore, start_cursor=None,
+                                                   cursor_last_checked=cursor_last_checked, budget=budget, posts=posts)
+                if not latest['completed'] and latest['cursor']:
+                    print(f'⏳ ({bsky_username}) -> Fetch budget exhausted; the rest will be fetched on the next run')
+                    user_metadata.set(TerpSearch.BACKFILL_CURSOR, latest['cursor'])
+                    user_metadata.set(TerpSearch.BACKFILL_UNTIL, cursor_last_checked or '')
+                if latest['newest'] is not None:
+                    cursor_last_checked = latest['newest']
+
+            task_id = None
+            if posts:
+                dispatch = await http_client.post(f'{self.fastapi_url}/categorize/',
+                                                  json={'bsky_posts': posts, 'bsky_username': bsky_username})
+                dispatch.raise_for_status()
+                task_id = dispatch.json().get('task_id')
+
+            user_metadata.set(TerpSearch.CURSOR_LAST_CHECKED, cursor_last_checked)
+            await self._run_blocking(user_metadata.save)
+
+            print(f'✅ ({bsky_username}) -> {len(posts)} new posts in {time.time() - start_time:.2f}s')
+            return {'bsky_username': bsky_username, 'posts': len(posts), 'task_id': task_id, 'error': None}
+        except Exception as e:
+            print(f'🚨 ({bsky_username}) -> Async ingestion failed: {e}')
+            return {'bsky_username': bsky_username, 'posts': 0, 'task_id': None, 'error': str(e)}
+
+    async def ingest_users(self, bsky_usernames):
+        """
+        Ingests many users' timelines concurrently.
+
+        Args:
+            bsky_usernames (List[str]): The Bluesky usernames to refresh.
+
+        Returns:
+            List[dict]: One ingest_user() summary per user, in the same order.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        metadata = await self._run_blocking(BskyUserMetadata.load_many, dynamodb_resource=self.dynamodb_resource,
+                                            users_table=self.bsky_users_table, bsky_usernames=bsky_usernames)
+        async with httpx.AsyncClient(follow_redirects=True, limits=self.limits, timeout=30) as http_client:
+            return await asyncio.gather(*(self.ingest_user(http_client, semaphore, bsky_username,
+                                                           user_metadata=metadata[bsky_username])
+                                          for bsky_username in bsky_usernames))
+
+    def list_linked_users(self):
+        """
+        Returns every Bluesky username in BSKY_USERS that has a stored session.
+        """
+        usernames = []
+        scan_kwargs = {'ProjectionExpression': 'bskyUsername, session_token'}
+        while True:
+            response = self.bsky_users_table.scan(**scan_kwargs)
+            usernames.extend(item['bskyUsername'] for item in response.get('Items', [])
+                             if item.get(TerpSearch.SESSION_TOKEN))
+            if 'LastEvaluatedKey' not in response:
+                return usernames
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def run(self, bsky_usernames=None):
+        bsky_usernames = bsky_usernames or self.list_linked_users()
+        start_time = time.time()
+        results = asyncio.run(self.ingest_users(bsky_usernames))
+        total_posts = sum(result['posts'] for result in results)
+        failed = sum(1 for result in results if result['error'])
+        print(f'Refreshed {len(results) - failed}/{len(results)} users ({total_posts} posts) '
+              f'in {time.time() - start_time:.2f}s')
+        return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Refresh the timelines of linked Bluesky users concurrently.')
+    parser.add_argument('usernames', nargs='*', help='Bluesky usernames to refresh (default: every linked user)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+    AsyncTimelineIngestor(db_mode=DynamoDbConstants.DB_MODE, max_concurrency=args.concurrency).run(args.usernames)
@@ -3,9 +3,13 @@ from atproto import Client
 from dateutil.parser import isoparse
 from terpsearch.dynamodb.dynamodb_helpers import *
 from terpsearch.dynamodb.BskySessionEncryptor import BskySessionEncryptor
+from terpsearch.dynamodb.BskyUserMetadata import BskyUserMetadata
+from terpsearch.search.client_pool import bsky_client_pool
 from atproto.exceptions import AtProtocolError
 from boto3.dynamodb.conditions import Key, Attr
 from datetime import datetime, timezone
+import os
+import time
 
 """
 TerpSearch: Class used to manage Bluesky data ingestion and user session tracking required for backend bluesky API
@@ -19,9 +23,16 @@ This class is responsible for:
 """
 
 
+PAGE_LIMIT = 100
+FETCH_DEADLINE_SECONDS = float(os.getenv('TIMELINE_FETCH_DEADLINE_SECONDS', '20'))
+
+
 class TerpSearch:
     SESSION_TOKEN = 'session_token'
     CURSOR_LAST_CHECKED = 'cursor_last_checked'
+    BACKFILL_CURSOR = 'backfill_cursor'
+    BACKFILL_UNTIL = 'backfill_until'
+    CURSOR_ATTRIBUTES = (CURSOR_LAST_CHECKED, BACKFILL_CURSOR, BACKFILL_UNTIL)
 
     def __init__(self, bsky_client: atproto.Client, username: str, password: str, db_mode: str):
         """
@@ -35,15 +46,19 @@ class TerpSearch:
         self.db_mode = db_mode
         self.bsky_username = username
         self.bsky_password = password
+        dynamodb_resource = get_dynamodb_resource(db_mode=self.db_mode)
         self.posts_table = get_dynamodb_table(
-            dynamodb_resource=get_dynamodb_resource(db_mode=self.db_mode),
+            dynamodb_resource=dynamodb_resource,
             table_name=DynamoDbConstants.BSKY_POSTS_TABLE_NAME
         )
         self.bsky_users_table = get_dynamodb_table(
-            dynamodb_resource=get_dynamodb_resource(db_mode=self.db_mode),
+            dynamodb_resource=dynamodb_resource,
             table_name=DynamoDbConstants.BSKY_USERS_TABLE_NAME
         )
+        # One consistent read of the user's row serves both the session token and the cursor
+        self.user_metadata = BskyUserMetadata.load(users_table=self.bsky_users_table, bsky_username=self.bsky_username)
         self.bsky_client = self.__get_bsky_client(bsky_client, username=self.bsky_username, password=self.bsky_password)
+        self.cursor_last_checked = None
 
     def __get_existing_user_session(self, bsky_username):
         """
@@ -58,18 +73,16 @@ class TerpSearch:
         Raises:
             KeyError: If the session token is not found in the DynamoDB item.
         """
-        response = self.bsky_users_table.query(
-            KeyConditionExpression=Key('bskyUsername').eq(bsky_username)
-        )
-        session_token = response['Items'][0][TerpSearch.SESSION_TOKEN]
+        session_token = self.user_metadata.item[TerpSearch.SESSION_TOKEN]
         return session_token
 
     def __get_bsky_client(self, client: atproto.Client, username: str, password: str):
         """
-        Attempts to restore a Bluesky session using a stored encrypted token.
+        Attempts to restore a Bluesky session from the per-process client pool, then from a stored encrypted token.
 
         If a session does not exist, creates a new session using the provided credentials
-        and persists it securely into the BSKY_USERS table.
+        and persists it securely into the BSKY_USERS table. The authenticated client is added to the pool so repeat
+        ingestions skip decrypting and importing the session.
 
         Args:
             client (atproto.Client): An instance of the Bluesky client.
@@ -79,28 +92,30 @@ class TerpSearch:
         Returns:
             atproto.Client: An authenticated Bluesky client.
         """
+        pooled_client = bsky_client_pool.get(username, user_metadata=self.user_metadata)
+        if pooled_client is not None:
+            print(f'{username} has a pooled bluesky session')
+            return pooled_client
+
         try:
             encryptor = BskySessionEncryptor()
             session_token = self.__get_existing_user_session(bsky_username=username)
             client._import_session_string(encryptor.decrypt(session_token))
             print(f'{username} has an active bluesky session')
-            return client
         except AtProtocolError as e:
             print('Removing expired session token...')
-            self.bsky_users_table.update_item(
-                Key={
-                    'bskyUsername': username  # your partition key
-                },
-                UpdateExpression="REMOVE session_token"
-            )
-            client = create_session(client=client, bsky_username=username,
-                                    bsky_password=password, table=self.bsky_users_table)
-            return client
+            # Persisted before logging in again, since create_session() re-raises when the new login fails
+            self.user_metadata.remove(TerpSearch.SESSION_TOKEN)
+            self.user_metadata.save(attributes=[TerpSearch.SESSION_TOKEN])
+            client = create_session(client=client, bsky_username=username, bsky_password=password,
+                                    table=self.bsky_users_table, user_metadata=self.user_metadata)
         except:
             print(f'An active session does not currently exist for {username}')
-            client = create_session(client=client, bsky_username=username,
-                                    bsky_password=password, table=self.bsky_users_table)
-            return client
+            client = create_session(client=client, bsky_username=username, bsky_password=password,
+                                    table=self.bsky_users_table, user_metadata=self.user_metadata)
+
+        bsky_client_pool.put(username, client, users_table=self.bsky_users_table, user_metadata=self.user_metadata)
+        return client
 
     def __check_for_existing_cursor(self, bsky_username):
         """
@@ -112,10 +127,7 @@ class TerpSearch:
         Returns:
             bool: True if a cursor exists, False otherwise.
         """
-        response = self.bsky_users_table.query(
-            KeyConditionExpression=Key('bskyUsername').eq(bsky_username)
-        )
-        return True if TerpSearch.CURSOR_LAST_CHECKED in response['Items'][0] else False
+        return True if TerpSearch.CURSOR_LAST_CHECKED in self.user_metadata.item else False
 
     def __get_user_cursor(self, bsky_username):
         """
@@ -131,109 +143,220 @@ class TerpSearch:
         stored_user_cursor_last_checked = self.__check_for_existing_cursor(bsky_username=bsky_username)
 
         if stored_user_cursor_last_checked:
-            response = self.bsky_users_table.query(
-                KeyConditionExpression=Key('bskyUsername').eq(bsky_username)
-            )
-            return response['Items'][0][TerpSearch.CURSOR_LAST_CHECKED]
+            return self.user_metadata.get(TerpSearch.CURSOR_LAST_CHECKED)
         else:
             return ''
 
-    def get_timeline_posts(self, bsky_username: str, max_posts=5000):
+    def get_timeline_posts(self, bsky_username: str, max_posts=5000, page_limit=PAGE_LIMIT,
+                           deadline_seconds=FETCH_DEADLINE_SECONDS):
         all_posts = []
-        cursor = None
+        for page in self.iter_timeline_posts(bsky_username=bsky_username, max_posts=max_posts, page_limit=page_limit,
+                                             deadline_seconds=deadline_seconds):
+            all_posts.extend(page)
+
+        response = {'posts': all_posts, TerpSearch.CURSOR_LAST_CHECKED: self.cursor_last_checked}
+        return response
+
+    def iter_timeline_posts(self, bsky_username: str, max_posts=5000, page_limit=PAGE_LIMIT,
+                            deadline_seconds=FETCH_DEADLINE_SECONDS, persist=True):
+        """
+        Pages through a user's reverse-chronological timeline and yields each page of new posts as soon as it has been
+        fetched, so callers can start processing early pages while later ones are still being downloaded.
+
+        Fetching is budgeted: at most `max_posts` posts are fetched, `page_limit` posts per request, and no new page
+        is requested once `deadline_seconds` have passed. When the budget runs out before reaching the posts that were
+        already ingested, the Bluesky pagination cursor is persisted as `backfill_cursor` (together with the
+        `backfill_until` timestamp that bounds the gap), and the next run resumes from there before fetching newer
+        posts, instead of starting over.
+
+        The timestamp of the newest fetched post is persisted as the new `cursor_last_checked` (and exposed as
+        `self.cursor_last_checked`) once the generator is exhausted. If the caller stops iterating early, the stored
+        cursors are left untouched so the remaining posts are fetched again next time. With `persist=False` the cursors
+        are only staged, for callers that still have to hand the fetched posts off: they call save_cursors() once every
+        post was handed off.
+
+        Args:
+            bsky_username (str): The Bluesky username whose timeline is fetched.
+            max_posts (int): Maximum number of posts to fetch in this run.
+            page_limit (int): Number of posts requested per timeline page (Bluesky allows up to 100).
+            deadline_seconds (float): Wall-clock budget for this run; None disables the deadline.
+            persist (bool): Whether to store the cursors when the generator is exhausted.
+
+        Yields:
+            List[Dict]: A page of posts (author, handle, text, action, timestamp), newest first.
+        """
+        budget = {
+            'posts': max_posts,
+            'deadline': time.monotonic() + deadline_seconds if deadline_seconds else None
+        }
         cursor_last_checked = self.__get_user_cursor(bsky_username=bsky_username)  # stored timestamp
+        backfill_cursor = self.user_metadata.get(TerpSearch.BACKFILL_CURSOR)
+        posts_fetched = 0
+
+        # Finish the gap left by a previous run whose budget ran out before starting on newer posts
+        if backfill_cursor:
+            backfill_until = self.user_metadata.get(TerpSearch.BACKFILL_UNTIL, '')
+            print(f'Resuming partial timeline fetch for {bsky_username} (until {backfill_until or "the beginning"})')
+            backfill = yield from self.__iter_timeline_segment(start_cursor=backfill_cursor,
+                                                               cursor_last_checked=backfill_until,
+                                                               page_limit=page_limit, budget=budget)
+            posts_fetched += backfill['posts']
+            if backfill['completed']:
+                self.user_metadata.remove(TerpSearch.BACKFILL_CURSOR)
+                self.user_metadata.remove(TerpSearch.BACKFILL_UNTIL)
+                backfill_cursor = None
+            else:
+                self.user_metadata.set(TerpSearch.BACKFILL_CURSOR, backfill['cursor'])
+
+        if not backfill_cursor and TerpSearch.__has_budget(budget):
+            latest = yield from self.__iter_timeline_segment(start_cursor=None, cursor_last_checked=cursor_last_checked,
+                                                             page_limit=page_limit, budget=budget)
+            posts_fetched += latest['posts']
+            # A segment cut short before its first page has no cursor to resume from; the next run simply starts over
+            if not latest['completed'] and latest['cursor']:
+                print(f'⏳ Fetch budget exhausted for {bsky_username}; the rest will be fetched on the next run')
+                self.user_metadata.set(TerpSearch.BACKFILL_CURSOR, latest['cursor'])
+                self.user_metadata.set(TerpSearch.BACKFILL_UNTIL, cursor_last_checked or '')
+
+            # Use timestamp of the newest post as new cursor_last_checked
+            if latest['newest'] is not None:
+                cursor_last_checked = latest['newest']
+
+        print(f"✅ Fetched {posts_fetched} posts")
+        print(f'Updated cursor_last_checked: {cursor_last_checked}')
+
+        self.cursor_last_checked = cursor_last_checked
+        self.user_metadata.set(TerpSearch.CURSOR_LAST_CHECKED, cursor_last_checked)
+        if persist:
+            self.save_cursors()
+
+    def save_cursors(self):
+        """
+        Stores the cursors staged by iter_timeline_posts() in the users table with a single update (session tokens are
+        written as they change).
+        """
+        self.user_metadata.save(attributes=TerpSearch.CURSOR_ATTRIBUTES)
+
+    @staticmethod
+    def __has_budget(budget):
+        if budget['posts'] <= 0:
+            return False
+        return budget['deadline'] is None or time.monotonic() < budget['deadline']
+
+    def __iter_timeline_segment(self, start_cursor, cursor_last_checked, page_limit, budget):
+        """
+        Yields pages of the timeline starting at `start_cursor` until a post that is not newer than
+        `cursor_last_checked` is reached, the timeline ends, or the budget runs out.
+
+        Returns:
+            dict: 'completed' (False if the budget or an error cut the segment short), 'cursor' (where to resume),
+                'newest' (timestamp of the newest fetched post) and 'posts' (number of posts fetched).
+        """
+        cursor = start_cursor
         posts_fetched = 0
         first_post_time = None
         last_post_time = None
 
-        # Flag to control loop
-        timeline_exists = True
-
-        while timeline_exists:
-            # print(f'Cursor: {cursor}')
-            # print(f'Last checked: {cursor_last_checked}')
+        while True:
+            if not TerpSearch.__has_budget(budget):
+                return {'completed': False, 'cursor': cursor, 'newest': first_post_time, 'posts': posts_fetched}
 
+            # Never request more than the remaining budget so a page is never truncated
+            limit = min(page_limit, budget['posts'])
             try:
                 timeline = None
                 try:
                     timeline = self.bsky_client.get_timeline(
                         algorithm='reverse-chronological',
-                        cursor=cursor
+                        cursor=cursor,
+                        limit=limit
                     )
                 except Exception as e:
                     if 'ExpiredToken' in str(e) or 'InvalidToken' in str(e):
                         print("⚠️ Token expired. Re-authenticating...")
+                        bsky_client_pool.invalidate(self.bsky_username)
                         new_bsky_client = Client()
                         update_expired_client(bsky_client=new_bsky_client, table=self.bsky_users_table,
-                                              bsky_username=self.bsky_username, bsky_password=self.bsky_password)
+                                              bsky_username=self.bsky_username, bsky_password=self.bsky_password,
+                                              user_metadata=self.user_metadata)
                         print('>>> Updated expired session token')
                         self.bsky_client = new_bsky_client
+                        bsky_client_pool.put(self.bsky_username, new_bsky_client, users_table=self.bsky_users_table,
+                                             user_metadata=self.user_metadata)
                     timeline = self.bsky_client.get_timeline(
                         algorithm='reverse-chronological',
-                        cursor=cursor
+                        cursor=cursor,
+                        limit=limit
                     )
 
                 if not timeline.feed:
                     break
 
-                for feed_view in timeline.feed:
-                    post = feed_view.post.record
-                    author = feed_view.post.author
-                    action = "New Post"
-
-                    if feed_view.reason:
-                        action_by = feed_view.reason.by.handle
-                        action = f"Reposted by @{action_by}"
-
-                    post_time = post.created_at if hasattr(post, 'created_at') else None
-                    if post_time is None:
-                        continue
-
-                    # Stop fetching when we've hit already-seen posts
-                    if cursor_last_checked and isoparse(post_time) <= isoparse(cursor_last_checked):
-                        timeline_exists = False
-                        break
-
-                    # Track range of post times
-                    if first_post_time is None:
-                        first_post_time = post_time
-                    last_post_time = post_time
-
-                    all_posts.append({
-                        "author": author.display_name,
-                        "handle": author.handle,
-                        "text": post.text,
-                        "action": action,
-                        "timestamp": post_time
-                    })
-                    posts_fetched += 1
-
-                # Set the next cursor
-                cursor = getattr(timeline, "cursor", None)
-                if not cursor:
-                    break
-
+                page, reached_seen_posts = TerpSearch.parse_timeline_page(feed=timeline.feed,
+                                                                          cursor_last_checked=cursor_last_checked)
+                next_cursor = getattr(timeline, "cursor", None)
             except Exception as e:
                 print(f"Error fetching posts: {e}")
+                return {'completed': False, 'cursor': cursor, 'newest': first_post_time, 'posts': posts_fetched}
+
+            # Track range of post times
+            if page:
+                if first_post_time is None:
+                    first_post_time = page[0]['timestamp']
+                last_post_time = page[-1]['timestamp']
+                posts_fetched += len(page)
+                budget['posts'] -= len(page)
+                yield page
+
+            # Stop fetching when we've hit already-seen posts or the end of the timeline
+            if reached_seen_posts or not next_cursor:
                 break
+            cursor = next_cursor
 
-        # Use timestamp of the newest post as new cursor_last_checked
-        if all_posts:
-            cursor_last_checked = all_posts[0]['timestamp']
+        print(f"Fetched {posts_fetched} posts from {first_post_time} to {last_post_time}")
+        return {'completed': True, 'cursor': None, 'newest': first_post_time, 'posts': posts_fetched}
 
-        print(f"✅ Fetched {posts_fetched} posts from {first_post_time} to {last_post_time}")
-        print(f'Updated cursor_last_checked: {cursor_last_checked}')
+    @staticmethod
+    def parse_timeline_page(feed, cursor_last_checked: str = ''):
+        """
+        Converts one page of timeline feed views into TerpSearch post dictionaries.
 
-        # Store cursor in users table
-        response = {'posts': all_posts, TerpSearch.CURSOR_LAST_CHECKED: cursor_last_checked}
-        self.bsky_users_table.update_item(
-            Key={'bskyUsername': bsky_username},
-            UpdateExpression='SET cursor_last_checked = :cursor',
-            ExpressionAttributeValues={
-                ':cursor': cursor_last_checked
-            }
-        )
-        return response
+        Posts without a creation time are skipped. Parsing stops at the first post that is not newer than
+        `cursor_last_checked`, since everything after it has already been ingested.
+
+        Args:
+            feed (List[FeedViewPost]): The `feed` of an app.bsky.feed.getTimeline response.
+            cursor_last_checked (str): ISO 8601 timestamp of the newest previously ingested post ('' if none).
+
+        Returns:
+            Tuple[List[Dict], bool]: The parsed posts (newest first) and whether an already-seen post was reached.
+        """
+        last_checked = isoparse(cursor_last_checked) if cursor_last_checked else None
+        page = []
+        for feed_view in feed:
+            post = feed_view.post.record
+            author = feed_view.post.author
+            action = "New Post"
+
+            if feed_view.reason:
+                action_by = feed_view.reason.by.handle
+                action = f"Reposted by @{action_by}"
+
+            post_time = post.created_at if hasattr(post, 'created_at') else None
+            if post_time is None:
+                continue
+
+            if last_checked and isoparse(post_time) <= last_checked:
+                return page, True
+
+            page.append({
+                "author": author.display_name,
+                "handle": author.handle,
+                "text": post.text,
+                "action": action,
+                "timestamp": post_time
+            })
+        return page, False
 
     def get_discover_feed_posts(self):
         feed_view = self.bsky_client.app.bsky.feed.get_feed(
@@ -246,5 +369,16 @@ class TerpSearch:
 
         return
 
-    def get_topic_posts(self):
-        return
+    def get_topic_posts(self, query: str, k: int = 10):
+        """
+        Finds this user's stored posts closest in meaning to a query (see terpsearch.search.topic_search).
+
+        Args:
+            query (str): Free-text query.
+            k (int): Number of posts to return.
+
+        Returns:
+            List[Dict]: Posts with a cosine similarity 'score', best first.
+        """
+        from terpsearch.search.topic_search import search_topic_posts
+        return search_topic_posts(bsky_username=self.bsky_username, query=query, k=k)['results']
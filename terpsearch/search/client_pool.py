@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import atproto
+from terpsearch.dynamodb.BskySessionEncryptor import BskySessionEncryptor
+from terpsearch.dynamodb.dynamodb_helpers import store_session_token
+
+"""
+BskyClientPool: A per-process LRU/TTL pool of authenticated atproto Clients keyed by Bluesky handle.
+
+Repeat ingestions for the same user reuse the pooled client instead of reading the session token from DynamoDB,
+decrypting it and importing (or re-creating) the session:
+    - Entries expire after `ttl_seconds` and the least recently used entry is evicted once `max_size` is reached.
+      Hits, misses and evictions are counted under the pool lock, so stats() is a consistent snapshot.
+    - Access JWTs that are about to expire are refreshed proactively when a client is checked out, and every refreshed
+      session is written back (encrypted) to BSKY_USERS so other processes keep a valid refresh token.
+    - Callers invalidate an entry when Bluesky rejects its token (ExpiredToken / InvalidToken).
+"""
+
+
+class BskyClientPool:
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 3600):
+        """
+        Initializes an empty BskyClientPool.
+
+        Args:
+            max_size (int): Maximum number of pooled clients.
+            ttl_seconds (float): Maximum time a client stays in the pool.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        # Counters are only updated under _lock, together with the client map they describe
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, bsky_username: str, user_metadata=None):
+        """
+        Checks out the pooled client of a user, refreshing its session first if the access JWT is about to expire.
+
+        Args:
+            bsky_username (str): The Bluesky handle.
+            user_metadata (BskyUserMetadata): The caller's view of the user's row. Sessions refreshed while the client
+                is checked out are also staged on it, so saving it never writes back an older token.
+
+        Returns:
+            atproto.Client or None: The authenticated client, or None if the user has no usable pooled client.
+        """
+        with self._lock:
+            entry = self._clients.get(bsky_username)
+            if entry is None or time.monotonic() - entry['created_at'] > self.ttl_seconds:
+                if entry is not None:
+                    del self._clients[bsky_username]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self._clients.move_to_end(bsky_username)
+            entry['user_metadata'] = user_metadata
+
+        client = entry['client']
+        try:
+            if client._should_refresh_session():
+                print(f'🔄 Proactively refreshing the Bluesky session of {bsky_username}')
+                client._refresh_and_set_session()
+        except Exception as e:
+            print(f'⚠️ Pooled session of {bsky_username} could not be refreshed: {e}')
+            with self._lock:
+                if self._clients.get(bsky_username) is entry:
+                    del self._clients[bsky_username]
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return client
+
+    def put(self, bsky_username: str, client: atproto.Client, users_table, user_metadata=None):
+        """
+        Adds an authenticated client to the pool.
+
+        Args:
+            bsky_username (str): The Bluesky handle.
+            client (atproto.Client): The authenticated client, or None after a failed login (ignored).
+            users_table (boto3.dynamodb.Table): The BSKY_USERS table refreshed sessions are persisted to.
+            user_metadata (BskyUserMetadata): The caller's view of the user's row (see get()).
+        """
+        if client is None:
+            # create_session() failed to log in, so there is nothing to reuse
+            return
+        entry = {'client': client, 'created_at': time.monotonic(), 'user_metadata': user_metadata}
+        encryptor = BskySessionEncryptor()
+
+        def persist_session(event, session):
+            if event == atproto.SessionEvent.IMPORT or self._clients.get(bsky_username) is not entry:
+                return
+            encrypted_token = encryptor.encrypt(session.export())
+            store_session_token(table=users_table, bsky_username=bsky_username, encrypted_token=encrypted_token,
+                                user_metadata=entry['user_metadata'])
+
+        client.on_session_change(persist_session)
+
+        with self._lock:
+            self._clients[bsky_username] = entry
+            self._clients.move_to_end(bsky_username)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, bsky_username: str):
+        with self._lock:
+            self._clients.pop(bsky_username, None)
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._clients), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
+
+
+# One pool per process
+bsky_client_pool = BskyClientPool(max_size=int(os.getenv('BSKY_CLIENT_POOL_SIZE', '256')),
+                                  ttl_seconds=float(os.getenv('BSKY_CLIENT_POOL_TTL', '3600')))
@@ -0,0 +1,129 @@
+import queue
+import threading
+import requests
+from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+
+"""
+IngestionPipeline: Overlaps timeline fetching with categorization.
+
+A fetch thread walks TerpSearch.iter_timeline_posts() and pushes every page into a bounded queue while the calling
+thread drains the queue and dispatches batches of posts to the FastAPI categorizer as soon as they are available.
+The bounded queue provides backpressure: if categorization dispatch falls behind, the fetch thread blocks instead of
+buffering the whole timeline in memory. The fetch thread only stages the cursors; they are stored once every fetched
+post has been dispatched, so a failed dispatch (including the last batch) leaves the stored cursors untouched and the
+posts are fetched again next time. If dispatching fails, the fetch thread is told to stop and closes the timeline
+generator, and a fetch failure is re-raised once the fetched posts have been dispatched.
+"""
+
+
+class IngestionPipeline:
+    _DONE = object()
+
+    def __init__(self, bsky_search, fastapi_url: str = DynamoDbConstants.FASTAPI_URL, batch_size: int = 500,
+                 max_pending_pages: int = 4):
+        """
+        Initializes an IngestionPipeline.
+
+        Args:
+            bsky_search (TerpSearch): An authenticated TerpSearch instance.
+            fastapi_url (str): Base URL of the FastAPI categorizer service.
+            batch_size (int): Number of posts sent per /categorize/ request.
+            max_pending_pages (int): Maximum number of fetched pages waiting to be dispatched (backpressure bound).
+        """
+        self.bsky_search = bsky_search
+        self.fastapi_url = fastapi_url
+        self.batch_size = batch_size
+        self.pages = queue.Queue(maxsize=max_pending_pages)
+        self.fetch_error = None
+        self._stop = threading.Event()
+
+    def _put(self, item) -> bool:
+        # Blocks while the queue is full, but gives up once the consumer has stopped
+        while not self._stop.is_set():
+            try:
+                self.pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch(self, bsky_username: str, max_posts: int):
+        pages = self.bsky_search.iter_timeline_posts(bsky_username=bsky_username, max_posts=max_posts, persist=False)
+        try:
+            for page in pages:
+                if not self._put(page):
+                    print(f'⚠️ ({bsky_username}) -> Dispatch stopped, abandoning the timeline fetch')
+                    return
+        except Exception as e:
+            self.fetch_error = e
+            print(f'🚨 ({bsky_username}) -> Timeline fetch stage failed: {e}')
+        finally:
+            pages.close()
+            self._put(IngestionPipeline._DONE)
+
+    def _dispatch(self, posts: list, bsky_username: str):
+        response = requests.post(url=f'{self.fastapi_url}/categorize/',
+                                 json={'bsky_posts': posts, 'bsky_username': bsky_username})
+        response.raise_for_status()
+        task_id = response.json().get('task_id')
+        print(f'({bsky_username}) -> Dispatched {len(posts)} posts for categorization (task_id={task_id})')
+        return task_id
+
+    def run(self, bsky_username: str, max_posts: int = 5000):
+        """
+        Fetches a user's new timeline posts and dispatches them for categorization while fetching continues.
+
+        Args:
+            bsky_username (str): The Bluesky username to ingest.
+            max_posts (int): Maximum number of posts to fetch.
+
+        Returns:
+            dict: The dispatched task ids, the number of posts ingested and the updated cursor_last_checked.
+
+        Raises:
+            requests.HTTPError: If the categorizer rejects a batch.
+            Exception: Whatever stopped the timeline fetch, after the posts fetched before it were dispatched.
+        """
+        self.fetch_error = None
+        self._stop.clear()
+        fetcher = threading.Thread(target=self._fetch, args=(bsky_username, max_posts),
+                                   name=f'timeline-fetch-{bsky_username}', daemon=True)
+        fetcher.start()
+
+        task_ids = []
+        pending = []
+        total_posts = 0
+        try:
+            while True:
+                page = self.pages.get()
+                if page is IngestionPipeline._DONE:
+                    break
+                pending.extend(page)
+                total_posts += len(page)
+                if len(pending) >= self.batch_size:
+                    task_ids.append(self._dispatch(pending, bsky_username))
+                    pending = []
+
+            if pending:
+                task_ids.append(self._dispatch(pending, bsky_username))
+        finally:
+            # Unblocks the fetch thread if dispatching failed, and drops the pages it will never be asked for
+            self._stop.set()
+            while fetcher.is_alive() or not self.pages.empty():
+                try:
+                    self.pages.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            fetcher.join()
+
+        if self.fetch_error is not None:
+            raise self.fetch_error
+
+        # Every fetched post was dispatched, so the next run can start after them
+        self.bsky_search.save_cursors()
+        print(f"({bsky_username}) -> Ingested {total_posts} posts in {len(task_ids)} categorization batches")
+        return {
+            'task_ids': [task_id for task_id in task_ids if task_id],
+            'posts': total_posts,
+            'cursor_last_checked': self.bsky_search.cursor_last_checked
+        }
@@ -0,0 +1,35 @@
+import os
+import requests
+from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
+
+"""
+Client of the categorizer service's semantic search endpoint (`POST /search`), which embeds the query with the same
+model that embedded the stored posts and scans the user's vector index.
+"""
+
+SEARCH_TIMEOUT_SECONDS = float(os.getenv('SEARCH_TIMEOUT_SECONDS', '10'))
+
+
+def search_topic_posts(bsky_username: str, query: str, k: int = 10, fastapi_url: str = DynamoDbConstants.FASTAPI_URL,
+                       timeout: float = SEARCH_TIMEOUT_SECONDS):
+    """
+    Finds a user's stored posts closest in meaning to a query.
+
+    Args:
+        bsky_username (str): The Bluesky username whose posts are searched.
+        query (str): Free-text query, e.g. 'playoff games' or 'interest rates'.
+        k (int): Number of posts to return.
+        fastapi_url (str): Base URL of the categorizer service.
+        timeout (float): Request timeout in seconds.
+
+    Returns:
+        dict: The search response: 'results' (posts with a 'score', best first), 'index', 'indexed_posts' and
+            'timings_ms'.
+
+    Raises:
+        requests.RequestException: If the service is unreachable or rejects the query.
+    """
+    response = requests.post(url=f'{fastapi_url}/search',
+                             json={'bsky_username': bsky_username, 'query': query, 'k': k}, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
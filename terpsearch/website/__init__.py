@@ -1,12 +1,12 @@
 import boto3
 import os
+import time
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, current_user
 from flask_session import Session
 from terpsearch.dynamodb.TerpSearchDb import TerpSearchDb
-from terpsearch.dynamodb.dynamodb_helpers import (table_exists, DynamoDbConstants, get_dynamodb_resource,
-                                                  get_dynamodb_client, get_dynamodb_table)
+from terpsearch.dynamodb.dynamodb_helpers import (DynamoDbConstants, get_dynamodb_resource, get_dynamodb_client,
+                                                  get_dynamodb_table)
 import redis
 
 # db = SQLAlchemy()
@@ -16,6 +16,7 @@ db_client = get_dynamodb_client(db_mode=DynamoDbConstants.DB_MODE)
 
 
 def create_app():
+    start_time = time.perf_counter()
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'final_terpsearch'
 
@@ -42,10 +43,7 @@ def create_app():
     # create_database(app=app, db=db)
     bsky_dynamodb = TerpSearchDb(db_mode=DynamoDbConstants.DB_MODE)
     print('Initializing Terpsearch Database...')
-
-    login_table_exists = table_exists(client=db_client, table_name=DynamoDbConstants.TERPSEARCH_LOGIN_TABLE_NAME)
-    if login_table_exists is False:
-        bsky_dynamodb.create_login_table()
+    schema_timings = bsky_dynamodb.bootstrap_schema()
 
     login_manager = LoginManager()
     login_manager.login_view = 'auth.login'
@@ -63,19 +61,15 @@ def create_app():
                         first_name=item['firstName'], password_hash=item['password'])
         return None
 
-    posts_table_exists = table_exists(client=bsky_dynamodb.client, table_name=DynamoDbConstants.BSKY_POSTS_TABLE_NAME)
-    if posts_table_exists is False:
-        bsky_dynamodb.create_bsky_posts_table()
-
-    users_table_exists = table_exists(client=bsky_dynamodb.client, table_name=DynamoDbConstants.BSKY_USERS_TABLE_NAME)
-    if users_table_exists is False:
-        bsky_dynamodb.create_users_table()
-
     @app.context_processor
     def inject_user():
         from flask_login import current_user
         return dict(user=current_user)
 
+    app.config['STARTUP_TIMINGS'] = {'schema_bootstrap': schema_timings['total'],
+                                     'create_app': time.perf_counter() - start_time}
+    print(f"⏱️ create_app() finished in {app.config['STARTUP_TIMINGS']['create_app']:.3f}s "
+          f"(schema bootstrap {schema_timings['total']:.3f}s)")
     return app
 
 
@@ -1,6 +1,5 @@
 # from . import db
 from flask_login import UserMixin
-from sqlalchemy.sql import func
 
 
 # class User(db.Model, UserMixin):
@@ -0,0 +1,33 @@
+import os
+from functools import lru_cache
+
+"""
+Read-only access to categorization task results for the web tier.
+
+The Flask process only needs task states, so instead of importing fastapi_categorizer.celery_worker (which forces the
+"spawn" multiprocessing start method and drags in the categorizer stack) it lazily builds a bare Celery client that
+points at the same Redis result backend the first time a state is requested.
+"""
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+@lru_cache(maxsize=1)
+def get_celery_client():
+    from celery import Celery
+    return Celery("worker", broker=REDIS_URL, backend=REDIS_URL)
+
+
+def get_task_states(task_ids):
+    """
+    Returns the Celery state of every task id (e.g. 'PENDING', 'SUCCESS', 'FAILURE').
+
+    Args:
+        task_ids (List[str]): The categorization task ids.
+
+    Returns:
+        List[str]: The state of each task, in the same order.
+    """
+    from celery.result import AsyncResult
+    celery_client = get_celery_client()
+    return [AsyncResult(task_id, app=celery_client).state for task_id in task_ids]
@@ -1,9 +1,11 @@
 from flask import Blueprint, render_template, request, flash, session, redirect, url_for
 from flask_login import login_required, current_user
-from terpsearch.search.bskySearch import TerpSearch
 from terpsearch.dynamodb.TerpSearchDb import TerpSearchDb
 from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
 from terpsearch.dynamodb.dynamodb_helpers import *
+from terpsearch.dynamodb.trends_queries import count_categories
+from terpsearch.dynamodb.trends_cache import TrendsCache
+from terpsearch.dynamodb.trends_series import GRANULARITIES, category_series
 from boto3.dynamodb.conditions import Key, Attr
 from collections import Counter
 import random
@@ -13,6 +15,7 @@ trends = Blueprint('trends', __name__)
 
 bsky_dynamodb = TerpSearchDb(db_mode=DynamoDbConstants.DB_MODE)
 FASTAPI_URL = DynamoDbConstants.FASTAPI_URL
+trends_cache = TrendsCache.from_env()
 
 
 def get_category_counts(posts):
@@ -36,6 +39,39 @@ def generate_color_palette(n):
     return [random.choice(base_colors) for _ in range(n)]
 
 
+def compute_category_chart(posts_table, bsky_username, start_date, end_date, start_iso, end_iso):
+    # Read at most one rollup item per day for the days the user's rollups are complete for; earlier days (stored
+    # before rollups were enabled and not backfilled yet) are counted from the posts
+    rollups = bsky_dynamodb.get_category_rollups()
+    posts_range, rollups_range = rollups.split_range(bsky_username=bsky_username, start_date=start_date,
+                                                     end_date=end_date)
+    counts, post_count, days_read = Counter(), 0, 0
+    if rollups_range:
+        counts, post_count, days_read = rollups.read(bsky_username=bsky_username, start_date=rollups_range[0],
+                                                     end_date=rollups_range[1])
+    if posts_range:
+        # Paginated, projected and (for wide ranges) parallel query over UserTimestampIndex
+        posts_end_iso = end_iso if posts_range[1] == end_date else f'{posts_range[1]}T23:59:59Z'
+        posts_counts, posts_count = count_categories(posts_table=posts_table, bsky_username=bsky_username,
+                                                     start_iso=start_iso, end_iso=posts_end_iso)
+        counts.update(posts_counts)
+        post_count += posts_count
+    print(f'({bsky_username}) -> Counted categories of {post_count} posts from {start_date} to {end_date} '
+          f'({days_read} daily rollups read, posts queried for {posts_range or "no days"})')
+
+    # Prepare chart data
+    return {'labels': list(counts.keys()), 'values': list(counts.values()), 'posts': post_count}
+
+
+def compute_series_chart(posts_table, bsky_username, start_date, end_date, granularity):
+    series, source = category_series(posts_table=posts_table, rollups=bsky_dynamodb.get_category_rollups(),
+                                     bsky_username=bsky_username, granularity=granularity, start_date=start_date,
+                                     end_date=end_date)
+    print(f'({bsky_username}) -> Built {granularity} category series with {len(series["bins"])} bins from {source}')
+    return {'labels': series['categories'], 'values': [sum(counts) for counts in series['counts']],
+            'posts': sum(series['posts']), 'series': series}
+
+
 @trends.route('/trends', methods=['GET', 'POST'])
 @login_required
 def timeline_trends():
@@ -46,6 +82,8 @@ def timeline_trends():
     bsky_username = request.form.get('bsky_username')
     start_date = request.form.get('start_date')
     end_date = request.form.get('end_date')
+    granularity = request.form.get('granularity', '')
+    view = granularity if granularity in GRANULARITIES else 'totals'
 
     # If user hasn't submitted the form yet
     if not (bsky_username and start_date and end_date):
@@ -56,17 +94,21 @@ def timeline_trends():
     start_iso = f"{start_date}T00:00:00Z"
     end_iso = f"{end_date}T23:59:59Z"
 
-    response = posts_table.query(
-        IndexName='UserTimestampIndex',
-        KeyConditionExpression=Key('bskyUsername').eq(bsky_username) & Key('timestamp').between(start_iso, end_iso)
-    )
-
-    posts = response['Items']
-
-    # Prepare chart data
-    counts = get_category_counts(posts)
-    labels = list(counts.keys())
-    values = list(counts.values())
+    # Repeated views are served from Redis until new posts of this user are categorized
+    cache_key = trends_cache.key_for(bsky_username, start_date, end_date, view=view) if trends_cache else None
+    chart = trends_cache.get(cache_key) if trends_cache else None
+    if chart is None:
+        if view == 'totals':
+            chart = compute_category_chart(posts_table=posts_table, bsky_username=bsky_username,
+                                           start_date=start_date, end_date=end_date, start_iso=start_iso,
+                                           end_iso=end_iso)
+        else:
+            chart = compute_series_chart(posts_table=posts_table, bsky_username=bsky_username, start_date=start_date,
+                                         end_date=end_date, granularity=granularity)
+        if trends_cache:
+            trends_cache.set(cache_key, chart)
+    labels = chart['labels']
+    values = chart['values']
 
     colors = generate_color_palette(n=len(labels))
 
@@ -75,6 +117,7 @@ def timeline_trends():
                            chart_labels=labels,
                            chart_values=values,
                            chart_colors=colors,
+                           series=chart.get('series'),
                            start_date=start_date,
                            end_date=end_date
                            )
@@ -1,19 +1,17 @@
 from flask import Blueprint, render_template, request, flash, jsonify, redirect, url_for, session
 from flask_login import login_required, current_user
-from terpsearch.search.bskySearch import TerpSearch
 from terpsearch.dynamodb.TerpSearchDb import TerpSearchDb
-from celery.result import AsyncResult
-from fastapi_categorizer.celery_worker import celery_app
 from terpsearch.constants.DynamoDbConstants import DynamoDbConstants
 from terpsearch.dynamodb.dynamodb_helpers import *
+from terpsearch.website.task_results import get_task_states
 from boto3.dynamodb.conditions import Key
-import requests
 import time
 # from .models import Note
 # from . import db
 import json
-from atproto import Client
-from atproto.exceptions import BadRequestError
+
+# atproto, the ingestion pipeline and Celery are imported inside the views that use them, so they do not slow down
+# Flask worker boot (see benchmarks/import_budget.py)
 
 views = Blueprint('views', __name__)
 
@@ -25,6 +23,10 @@ FASTAPI_URL = DynamoDbConstants.FASTAPI_URL
 @login_required
 def home():
     if request.method == 'POST':
+        from atproto import Client
+        from terpsearch.search.bskySearch import TerpSearch
+        from terpsearch.search.ingestion_pipeline import IngestionPipeline
+
         bsky_email = request.form.get('blueskyUsername')
         bsky_password = request.form.get('blueskyPassword')
 
@@ -32,14 +34,12 @@ def home():
         try:
             bsky_search = TerpSearch(bsky_client=client, username=bsky_email, password=bsky_password,
                                      db_mode=DynamoDbConstants.DB_MODE)
-            results = bsky_search.get_timeline_posts(bsky_username=bsky_email)
-
-            print(f"({bsky_email}) -> Ingesting {len(results['posts'])} posts")
-
-            response = requests.post(url=f'{FASTAPI_URL}/categorize/',
-                                     json={'bsky_posts': results['posts'], 'bsky_username': bsky_email}
-                                     )
-            task_id = response.json()["task_id"]
+            pipeline = IngestionPipeline(bsky_search=bsky_search, fastapi_url=FASTAPI_URL)
+            results = pipeline.run(bsky_username=bsky_email)
+            task_id = ','.join(results['task_ids'])
+            if not task_id:
+                flash("No new posts to classify.", category='success')
+                return redirect(url_for("views.home"))
             flash("Posts submitted for classification! Please check back shortly.", category='success')
             # return redirect(url_for("views.home"))
             return redirect(url_for("views.task_status_page", task_id=task_id))
@@ -61,16 +61,17 @@ def task_status_page(task_id):
 @views.route('/check_task/<task_id>', methods=['GET'])
 @login_required
 def check_task(task_id):
-    task_result = AsyncResult(task_id, app=celery_app)
+    # Pipelined ingestion dispatches several categorization batches; their ids are joined with commas
+    states = get_task_states(task_id.split(','))
 
-    if task_result.state == 'PENDING':
-        status = 'pending'
-    elif task_result.state == 'SUCCESS':
-        status = 'success'
-    elif task_result.state == 'FAILURE':
+    if 'FAILURE' in states:
         status = 'failure'
+    elif all(state == 'SUCCESS' for state in states):
+        status = 'success'
+    elif all(state == 'PENDING' for state in states):
+        status = 'pending'
     else:
-        status = task_result.state.lower()
+        status = next(state for state in states if state != 'SUCCESS').lower()
 
     return jsonify({'status': status})
 
@@ -79,6 +80,9 @@ def check_task(task_id):
 @login_required
 def bsky_link():
     if request.method == 'POST':
+        from atproto import Client
+        from terpsearch.search.bskySearch import TerpSearch
+
         bsky_email = request.form.get('new_bsky_email')
         bsky_password = request.form.get('bsky_password1')
 
@@ -98,6 +102,35 @@ def bsky_link():
     return render_template("link_bluesky.html")
 
 
+@views.route('/search', methods=['GET'])
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    mode = 'keyword' if request.args.get('mode') == 'keyword' else 'topic'
+    k = min(max(request.args.get('k', 10, type=int), 1), 50)
+    response = None
+    if query and mode == 'keyword':
+        from botocore.exceptions import ClientError
+
+        try:
+            response = bsky_dynamodb.keyword_search(user=current_user.bsky_email, query=query, k=k)
+        except (ClientError, RuntimeError) as e:
+            print(f'🚨 Keyword search failed for {current_user.bsky_email}: {e}')
+            flash('Search is unavailable right now, please try again shortly.', category='error')
+    elif query:
+        import requests
+        from terpsearch.search.topic_search import search_topic_posts
+
+        try:
+            response = search_topic_posts(bsky_username=current_user.bsky_email, query=query, k=k,
+                                          fastapi_url=FASTAPI_URL)
+        except requests.RequestException as e:
+            print(f'🚨 Semantic search failed for {current_user.bsky_email}: {e}')
+            flash('Search is unavailable right now, please try again shortly.', category='error')
+
+    return render_template('search_results.html', query=query, mode=mode, response=response)
+
+
 @views.route('/health', methods=['GET'])
 def health():
     return "Healthy!", 200